@@ -0,0 +1,203 @@
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import Blueprint, Response, jsonify, request
+import gameBall, pushBall, timelineBall
+
+# Read-only data API over the processed game state the dashboard already keeps, for other tools:
+#   /api/games/<game_pk>            teams, feed version and the last pitch number
+#   /api/games/<game_pk>/matchup    current batter and pitcher, last result, strike zone
+#   /api/games/<game_pk>/runners    base runners and defenders
+#   /api/games/<game_pk>/pitches    pitch log, one row per pitch from the game's timeline
+#   /api/games/<game_pk>/wpa        home and away win probability going into every pitch
+#   /api/games/<game_pk>/events     pitching events, newest first, as the events table shows them
+# A request makes sure the game's poller is running and reads whatever it last published (see pushBall), so any
+# number of consumers share one upstream fetch per poll. The tables accept since=<pitch #> to return only the pitches
+# after it and are served as JSON or, with format=arrow or an Accept of ARROW_MIMETYPE, as an Arrow IPC stream.
+# Responses carry an ETag made of the feed version, so polling an unchanged game is answered with a bodiless 304,
+# and an X-Last-Pitch header with the since of the next delta.
+
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+TABLE_RESOURCES = ('pitches', 'wpa', 'events')
+
+# Encoded bodies keyed by (feed version, resource, since, format), shared by every consumer polling the same delta
+RESPONSE_CACHE = OrderedDict()
+RESPONSE_CACHE_SIZE = 64
+_response_lock = threading.Lock()
+
+# Events columns as dataBall.extract_all_game_pitching_events names them. Tables always carry every column, an
+# empty delta has zero-length ones, and Arrow types are fixed where they can't be inferred from the values.
+EVENT_COLUMNS = ['Pitch Type', 'Batter', 'Pitcher', 'Outs', 'Count', 'Spin Rate', 'Result', 'Pitch Count', 'Pitch #', 'Score']
+ARROW_TYPES = {'pitcher': 'string', 'batter': 'string', 'pitch_name': 'string', 'call': 'string',
+               'Pitch Type': 'string', 'Batter': 'string', 'Pitcher': 'string', 'Outs': 'int64', 'Count': 'string',
+               'Spin Rate': 'float64', 'Result': 'string', 'Pitch Count': 'int64', 'Pitch #': 'int64', 'Score': 'string'}
+
+PITCH_COLUMNS = ['number', 'ab_number', 'inning', 'top', 'balls', 'strikes', 'outs', 'pitcher', 'batter', 'pitch_name', 'call',
+                 'px', 'pz', 'speed', 'spin', 'sz_top', 'sz_bot']
+
+api_blueprint = Blueprint('api', __name__, url_prefix='/api/games')
+
+
+def _timeline(game_pk, game_data):
+    # A game registered before its timeline was evicted gets a fresh one from the same feed
+    timeline = timelineBall.get_timeline(game_pk)
+    if timeline is None:
+        timelineBall.record_feed(game_pk, game_data)
+        timeline = timelineBall.get_timeline(game_pk)
+    return timeline
+
+
+def last_pitch(timeline):
+    """ Number of the newest pitch in a timeline, the since of a consumer's next delta. """
+    return int(timeline.columns['number'][timeline.length - 1]) if timeline.length else 0
+
+
+def timeline_columns(timeline, names, since=0):
+    """
+    Columns of the pitches after a pitch number, interned values resolved.
+
+    Args:
+        timeline (GameTimeline): The game's timeline.
+        names (list of str): Columns, see timelineBall.COLUMNS.
+        since (int): Pitch number (game_total_pitches) to start after, 0 for every pitch.
+
+    Returns:
+        dict: Column name -> NumPy array, or list for interned columns.
+    """
+    length = timeline.length
+    # Pitch numbers only grow, so the first new row is a binary search away
+    start = int(np.searchsorted(timeline.columns['number'][:length], since, side='right'))
+    columns = {}
+    for name in names:
+        column = timeline.columns[name][start:length]
+        columns[name] = [timeline.values[index] for index in column] if name in ('pitcher', 'batter', 'pitch_name', 'call') else column
+    return columns
+
+
+def game_resource(game_pk, resource, entry, since=0):
+    """
+    One resource of a game.
+
+    Args:
+        game_pk (int): Game identifier.
+        resource (str): '' for the game itself, 'matchup', 'runners' or one of TABLE_RESOURCES.
+        entry (dict): {'version', 'game_data'} from gameBall.resolve_game.
+        since (int): Pitch number the tables start after.
+
+    Returns:
+        dict: Plain values for the game, matchup and runners. Columns (name -> list or array) for the tables.
+    """
+    state = gameBall.game_state({'game_pk': game_pk, 'version': entry['version']})
+    timeline = _timeline(game_pk, entry['game_data'])
+    if resource == '':
+        return {
+            'version': entry['version'],
+            'home_team': state['home_team'],
+            'away_team': state['away_team'],
+            'last_pitch': last_pitch(timeline),
+            'resources': ['matchup', 'runners'] + list(TABLE_RESOURCES)
+        }
+    if resource == 'matchup':
+        return {
+            'batter_name': state['batter_name'],
+            'pitcher_name': state['pitcher_name'],
+            'previous_result': state['previous_result'],
+            'pitcher_names': state['pitcher_names'],
+            'strike_zone_data': state['strike_zone_data']
+        }
+    if resource == 'runners':
+        return {'runners': state['runners'], 'defenders': state['defenders']}
+    if resource == 'pitches':
+        return timeline_columns(timeline, PITCH_COLUMNS, since)
+    if resource == 'wpa':
+        columns = timeline_columns(timeline, ['number', 'home_win_prob'], since)
+        return {'number': columns['number'], 'home_win_prob': columns['home_win_prob'], 'away_win_prob': 100 - columns['home_win_prob']}
+    events = [event for event in state['events'] if (event['Pitch #'] or 0) > since]
+    return {key: [event.get(key) for event in events] for key in EVENT_COLUMNS}
+
+
+def _json_value(value):
+    # NaN isn't valid JSON, missing locations and speeds become null
+    if isinstance(value, np.ndarray):
+        return [None if isinstance(item, float) and item != item else item for item in value.tolist()]
+    return value
+
+
+def encode(payload, output_format, table, since=0, newest_pitch=0):
+    """ Encodes a resource as JSON, tables as {'since', 'last_pitch', 'columns'}, or as an Arrow IPC stream. """
+    if output_format == 'arrow':
+        import pyarrow as pa
+
+        columns = {name: pa.array(column, type=getattr(pa, ARROW_TYPES[name])() if name in ARROW_TYPES else None)
+                   for name, column in payload.items()}
+        batch = pa.table(columns)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_table(batch)
+        return sink.getvalue().to_pybytes()
+    body = {'since': since, 'last_pitch': newest_pitch, 'columns': {name: _json_value(column) for name, column in payload.items()}} if table else payload
+    return json.dumps(body, default=str).encode()
+
+
+def _output_format():
+    if request.args.get('format') in ('arrow', 'json'):
+        return request.args['format']
+    best = request.accept_mimetypes.best_match(['application/json', ARROW_MIMETYPE], default='application/json')
+    return 'arrow' if best == ARROW_MIMETYPE else 'json'
+
+
+def _error(message, status):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+@api_blueprint.route('/<int:game_pk>', defaults={'resource': ''})
+@api_blueprint.route('/<int:game_pk>/<resource>')
+def game_api(game_pk, resource):
+    """ Serves a game resource, see the module comment. """
+    if resource not in ('', 'matchup', 'runners') + TABLE_RESOURCES:
+        return _error(f"Unknown resource {resource}", 404)
+    table = resource in TABLE_RESOURCES
+    output_format = _output_format()
+    if output_format == 'arrow' and not table:
+        return _error(f"{resource or 'game'} is only served as JSON", 406)
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return _error('since must be a pitch number', 400)
+
+    if not pushBall.is_known_game(game_pk):
+        return _error(f"Unknown game {game_pk}", 404)
+    version = pushBall.ensure_polling(game_pk, validated=True)
+    entry = gameBall.resolve_game({'game_pk': game_pk, 'version': version}) if version else None
+    if entry is None:
+        return _error(f"No feed for game {game_pk}", 404)
+
+    # The feed version identifies the body for a given URL, the format is added as it's negotiated on the same URL
+    etag = f"{entry['version']}-{output_format}"
+    headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    key = (entry['version'], resource, since if table else 0, output_format)
+    with _response_lock:
+        body = RESPONSE_CACHE.get(key)
+        if body is not None:
+            RESPONSE_CACHE.move_to_end(key)
+    timeline = _timeline(game_pk, entry['game_data'])
+    if body is None:
+        body = encode(game_resource(game_pk, resource, entry, since), output_format, table, since, last_pitch(timeline))
+        with _response_lock:
+            RESPONSE_CACHE[key] = body
+            if len(RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+                RESPONSE_CACHE.popitem(last=False)
+
+    response = Response(body, mimetype=ARROW_MIMETYPE if output_format == 'arrow' else 'application/json', headers=headers)
+    response.headers['X-Game-Version'] = entry['version']
+    response.headers['X-Last-Pitch'] = str(last_pitch(timeline))
+    response.set_etag(etag)
+    return response
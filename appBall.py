@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+import dash
+from dash import Dash, html, dcc, Input, Output, State
+import apiBall, memBall, metricsBall, pushBall
+
+# One Dash app hosting every view on one server: the live game dashboard at /, the scoreboard wall of all
+# of today's games at /wall and the scatter plot maker under /scatter, /page-1 and /page-2. The pages share this process's data layer (fetchBall, cacheBall,
+# gameBall, stadiumBall), so feeds, season stats and stadium geometry are loaded once for all of them.
+
+SCATTER_PATHS = ('/scatter', '/page-1', '/page-2')
+WALL_PATHS = ('/wall',)
+
+
+def page_section(pathname):
+    if pathname in SCATTER_PATHS:
+        return 'scatter'
+    return 'wall' if pathname in WALL_PATHS else 'live'
+
+
+def create_app():
+    """
+    Builds the multi-page app. The page modules are imported here, which registers their callbacks.
+
+    Returns:
+        Dash: The app, its Flask server also serves the pushed game events and the game data API.
+    """
+    import dashBall, scatterBall, wallBall
+
+    app = Dash(__name__, suppress_callback_exceptions=True,
+               external_stylesheets=scatterBall.external_stylesheets + dashBall.external_stylesheets + wallBall.external_stylesheets)
+    app.server.register_blueprint(pushBall.push_blueprint)
+    app.server.register_blueprint(apiBall.api_blueprint)
+    metricsBall.instrument_server(app.server)
+    memBall.instrument_server(app.server)
+    app.layout = html.Div([
+        dcc.Location(id='app-url', refresh=False),
+        dcc.Store(id='app-section-store'),
+        html.Div([
+            dcc.Link('Live Game', href='/', style={'margin': '10px'}),
+            dcc.Link('Scoreboard Wall', href='/wall', style={'margin': '10px'}),
+            dcc.Link('Scatter Plot Maker', href='/scatter', style={'margin': '10px'})
+        ], style={'backgroundColor': '#111111'}),
+        html.Div(id='app-content')
+    ])
+
+    @app.callback(
+        [Output('app-content', 'children'),
+         Output('app-section-store', 'data')],
+        [Input('app-url', 'pathname')],
+        [State('app-section-store', 'data')]
+    )
+    def display_section(pathname, current_section):
+        # Moving between pages of the same view keeps its layout, the view routes its own pages
+        section = page_section(pathname)
+        if section == current_section:
+            return dash.no_update, dash.no_update
+        pages = {'live': dashBall.layout, 'wall': wallBall.layout, 'scatter': scatterBall.layout}
+        return pages[section], section
+
+    return app
+
+
+def warm_up():
+    """
+    Loads what the first visitor of each page would otherwise wait for: the season stats, the stadium
+    geometry, today's schedule and the scatter maker's default datasets.
+    Everything goes into the shared cache, so running it once before forking workers warms all of them.
+    """
+    start = time.perf_counter()
+    import dataBall, fetchBall, stadiumBall, scatterBall
+
+    stadiumBall._load_geometry()
+    try:
+        for name in dataBall.SEASON_STATS:
+            dataBall.season_stats(name)
+        fetchBall.get_game_pks_and_teams()
+        for func, args, kwargs in scatterBall.default_loads():
+            func(*args, **kwargs)
+    except Exception as e:
+        logging.error(f"Warm-up fetch failed: {e}")
+    logging.info(f"Warmed up in {time.perf_counter() - start:.1f} s")
+
+
+app = create_app()
+server = app.server
+
+
+if __name__ == '__main__':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    app.run_server(debug=True, host='0.0.0.0', port=8050)
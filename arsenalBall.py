@@ -0,0 +1,178 @@
+import math
+import threading
+from collections import OrderedDict, deque
+import densityBall, timelineBall
+
+# Running summaries of every pitcher's arsenal in a game: per pitch type the count, velocity and spin (mean, standard
+# deviation, min and max, Welford style) and call tallies. They're fed from the game's timeline (see timelineBall),
+# one pitch at a time and only for pitches not seen before, so updating costs the same on pitch 300 as on pitch 3.
+# Velocity drops are flagged against the pitcher's own first BASELINE_PITCHES pitches of the type.
+
+BASELINE_PITCHES = 10  # Pitches of a type that make up its early-game velocity baseline
+RECENT_PITCHES = 5  # Latest pitches of a type compared with the baseline
+VELOCITY_DROP_MPH = 1.5
+
+ARSENALS = OrderedDict()  # game_pk -> GameArsenal
+ARSENAL_COUNT = 32
+_arsenals_lock = threading.Lock()
+
+
+class RunningStats:
+    """ Count, mean, variance, min and max updated one value at a time (Welford's algorithm). NaNs are skipped. """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        if value is None or math.isnan(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class RecentMean:
+    """ Mean of the last size values, kept with a running sum. """
+
+    __slots__ = ('values', 'total')
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+
+    def add(self, value):
+        if value is None or math.isnan(value):
+            return
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+
+class PitchTypeSummary:
+    """ Running summary of one pitcher's pitches of one type. """
+
+    def __init__(self):
+        self.count = 0
+        self.velocity = RunningStats()
+        self.spin = RunningStats()
+        self.baseline_velocity = RunningStats()  # Stops growing at BASELINE_PITCHES
+        self.recent_velocity = RecentMean(RECENT_PITCHES)
+        self.calls = dict.fromkeys(densityBall.CALL_GROUPS, 0)
+
+    def add(self, speed, spin, call):
+        self.count += 1
+        self.velocity.add(speed)
+        self.spin.add(spin)
+        if self.baseline_velocity.count < BASELINE_PITCHES:
+            self.baseline_velocity.add(speed)
+        else:
+            self.recent_velocity.add(speed)  # Only pitches after the baseline can show a drop
+        self.calls[densityBall.call_group(call)] += 1
+
+    @property
+    def velocity_drop(self):
+        """ Baseline minus recent mean velocity, None until both are complete. """
+        if self.baseline_velocity.count < BASELINE_PITCHES or len(self.recent_velocity.values) < RECENT_PITCHES:
+            return None
+        return self.baseline_velocity.mean - self.recent_velocity.mean
+
+
+class GameArsenal:
+    """ Summaries of every pitcher of a game, keyed by lower cased pitcher name and pitch type. """
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.position = 0  # Timeline rows already added
+        self.pitchers = {}
+        self.lock = threading.Lock()
+
+    def catch_up(self):
+        """ Adds the timeline rows that arrived since the last call. """
+        with self.lock:
+            timeline = self.timeline
+            columns, values = timeline.columns, timeline.values
+            for row in range(self.position, timeline.length):
+                pitcher = values[columns['pitcher'][row]].lower().strip()
+                pitch_name = values[columns['pitch_name'][row]]
+                summary = self.pitchers.setdefault(pitcher, {}).get(pitch_name)
+                if summary is None:
+                    summary = self.pitchers[pitcher][pitch_name] = PitchTypeSummary()
+                summary.add(float(columns['speed'][row]), float(columns['spin'][row]), values[columns['call'][row]])
+            self.position = timeline.length
+
+    def summary(self, pitcher_name):
+        """
+        The arsenal of one pitcher.
+
+        Args:
+            pitcher_name (str): Pitcher's name, matched like gameBall.pitcher_pitches.
+
+        Returns:
+            list of dicts: Per pitch type, most thrown first: pitch_name, count, usage, velocity (mean, std, min, max),
+            spin (mean), whiff_rate (whiffs per swing), called_strike_rate (per pitch), baseline_velocity,
+            recent_velocity, velocity_drop and drop_flag.
+        """
+        with self.lock:
+            pitch_types = self.pitchers.get(pitcher_name.lower().strip(), {})
+            total = sum(summary.count for summary in pitch_types.values())
+            rows = []
+            for pitch_name, summary in pitch_types.items():
+                calls = summary.calls
+                swings = calls['Whiffs'] + calls['Fouls'] + calls['In Play']
+                drop = summary.velocity_drop
+                rows.append({
+                    'pitch_name': pitch_name,
+                    'count': summary.count,
+                    'usage': summary.count / total,
+                    'velocity_mean': summary.velocity.mean if summary.velocity.count else None,
+                    'velocity_std': summary.velocity.std,
+                    'velocity_min': summary.velocity.min if summary.velocity.count else None,
+                    'velocity_max': summary.velocity.max if summary.velocity.count else None,
+                    'spin_mean': summary.spin.mean if summary.spin.count else None,
+                    'whiff_rate': calls['Whiffs'] / swings if swings else None,
+                    'called_strike_rate': calls['Called Strikes'] / summary.count,
+                    'baseline_velocity': summary.baseline_velocity.mean if summary.baseline_velocity.count else None,
+                    'recent_velocity': summary.recent_velocity.mean,
+                    'velocity_drop': drop,
+                    'drop_flag': drop is not None and drop >= VELOCITY_DROP_MPH
+                })
+        return sorted(rows, key=lambda row: -row['count'])
+
+
+def game_arsenal(game_pk):
+    """
+    The game's arsenal summaries, caught up with its timeline.
+
+    Returns:
+        GameArsenal: None if the game has no timeline in this process.
+    """
+    timeline = timelineBall.get_timeline(game_pk)
+    if timeline is None:
+        return None
+    with _arsenals_lock:
+        arsenal = ARSENALS.get(game_pk)
+        if arsenal is None or arsenal.timeline is not timeline:  # A timeline rebuilt after eviction starts over
+            arsenal = ARSENALS[game_pk] = GameArsenal(timeline)
+        ARSENALS.move_to_end(game_pk)
+        if len(ARSENALS) > ARSENAL_COUNT:
+            ARSENALS.popitem(last=False)
+    arsenal.catch_up()
+    return arsenal
@@ -0,0 +1,437 @@
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pybaseball
+
+# Offline benchmarks of the extraction and figure-building hot paths. Game feeds come from gf payloads in
+# bench_fixtures (an early, a middle and a late game) and the season stats from fixture tables that replace the
+# pybaseball scrapes, so a run never touches the network:
+#
+#   python benchBall.py run                      # time everything, compare against bench_fixtures/baseline.json
+#   python benchBall.py run --save-baseline      # store this run as the new baseline
+#   python benchBall.py record 745673 late       # record a live gf payload as a fixture
+#   python benchBall.py startup --budget 1.5     # import time of the app per package, against a budget in seconds
+#
+# Every figure dict a benchmark returns is also checked once against plotly's schema (figureBall.validate_figure),
+# since the dashboard builds them without validation. run exits with status 1 when a benchmark's median got slower
+# than the baseline by more than --threshold or one of its figures is invalid, startup when importing the app takes
+# longer than --budget.
+
+FIXTURE_DIR = Path(__file__).resolve().parent / 'bench_fixtures'
+BASELINE_PATH = FIXTURE_DIR / 'baseline.json'
+GAME_FIXTURES = ['early', 'middle', 'late']
+SEASON_FIXTURES = ['batting_stats', 'pitching_stats', 'team_batting', 'team_pitching']
+
+TEAMS = ['ARI', 'ATL', 'BAL', 'BOS', 'CHC', 'CWS', 'CIN', 'CLE', 'COL', 'DET', 'HOU', 'KCR', 'LAA', 'LAD', 'MIA',
+         'MIL', 'MIN', 'NYM', 'NYY', 'OAK', 'PHI', 'PIT', 'SDP', 'SFG', 'SEA', 'STL', 'TBR', 'TEX', 'TOR', 'WSH']
+PITCH_NAMES = {'FF': 'Four-Seam Fastball', 'SI': 'Sinker', 'SL': 'Slider', 'CH': 'Changeup', 'CU': 'Curveball', 'FC': 'Cutter', 'ST': 'Sweeper'}
+CALLS = ['Ball', 'Called Strike', 'Swinging Strike', 'Foul', 'In play, out(s)', 'In play, no out', 'Ball In Dirt']
+
+
+############### FIXTURES ###############
+
+def fixture_player_name(team, role, number):
+    return f"{team} {role} {number}"
+
+
+def synthesize_season_stats(seed=0):
+    """
+    Season stat tables shaped like pybaseball's FanGraphs leaderboards: every team has 13 batters and 13 pitchers.
+
+    Returns:
+        dict: batting_stats, pitching_stats, team_batting and team_pitching DataFrames.
+    """
+    rng = np.random.default_rng(seed)
+    batting_columns = ['AVG', 'BABIP', 'BB', 'Balls', 'HR', 'OBP', 'OPS', 'PA', 'R', 'RBI', 'SLG', 'SO', 'WAR', 'wOBA', 'wRC+', 'ISO', 'K%', 'BB%', 'Strikes', 'H']
+    pitching_columns = ['AVG', 'BABIP', 'BB', 'Balls', 'HR', 'Strikes', 'ER', 'ERA', 'FIP', 'WHIP', 'H', 'xFIP', 'K/9', 'H/9', 'SIERA', 'WAR', 'BB%', 'K%', 'IP']
+
+    def table(names, teams, columns):
+        df = pd.DataFrame(rng.random((len(names), len(columns))), columns=columns)
+        df.insert(0, 'Season', 2024)
+        df.insert(0, 'Team', teams)
+        df.insert(0, 'Name', names)
+        return df
+
+    batters = [(fixture_player_name(team, 'Batter', i), team) for team in TEAMS for i in range(1, 14)]
+    pitchers = [(fixture_player_name(team, 'Pitcher', i), team) for team in TEAMS for i in range(1, 14)]
+    return {
+        'batting_stats': table([b[0] for b in batters], [b[1] for b in batters], batting_columns),
+        'pitching_stats': table([p[0] for p in pitchers], [p[1] for p in pitchers], pitching_columns),
+        'team_batting': table(TEAMS, TEAMS, batting_columns),
+        'team_pitching': table(TEAMS, TEAMS, pitching_columns)
+    }
+
+
+def synthesize_game(n_pitches, inning, seed=0, home='NYY', away='BOS'):
+    """
+    Builds a gf payload with the fields the dashboard reads, for machines that can't record a live game.
+    Starters throw up to 95 pitches before relievers take over in 20 pitch stints.
+
+    Args:
+        n_pitches (int): Pitches thrown so far by both teams.
+        inning (int): Current inning.
+
+    Returns:
+        dict: Game data shaped like fetchBall.fetch_game_data's result.
+    """
+    rnd = random.Random(seed)
+    team_names = {'NYY': 'Yankees', 'BOS': 'Red Sox'}
+    pitchers = {'home_pitchers': {}, 'away_pitchers': {}}
+    thrown = {'home_pitchers': 0, 'away_pitchers': 0}
+    batter_index = {'home_pitchers': 0, 'away_pitchers': 0}
+    for game_pitch in range(1, n_pitches + 1):
+        side = 'home_pitchers' if game_pitch % 2 else 'away_pitchers'
+        fielding, batting = (home, away) if side == 'home_pitchers' else (away, home)
+        count = thrown[side]
+        stint = 0 if count < 95 else 1 + (count - 95) // 20
+        pitcher_id = (TEAMS.index(fielding) + 1) * 100 + stint + 1
+        pitcher_count = count + 1 if stint == 0 else count - 95 - (stint - 1) * 20 + 1
+        pitch_type = rnd.choice(list(PITCH_NAMES))
+        ab_number = count // 4 + 1
+        pitchers[side].setdefault(str(pitcher_id), []).append({
+            'play_id': f'{seed}-{game_pitch}',
+            'inning': min(inning, 1 + (game_pitch - 1) * inning // max(n_pitches, 1)),
+            'ab_number': ab_number,
+            'pitcher': pitcher_id,
+            'pitcher_name': fixture_player_name(fielding, 'Pitcher', stint + 1),
+            'batter': (TEAMS.index(batting) + 1) * 100 + 50 + batter_index[side] % 9,
+            'batter_name': fixture_player_name(batting, 'Batter', batter_index[side] % 9 + 1),
+            'team_batting': batting,
+            'team_fielding': fielding,
+            'pitch_type': pitch_type,
+            'pitch_name': PITCH_NAMES[pitch_type],
+            'start_speed': round(rnd.uniform(78, 100), 1),
+            'end_speed': round(rnd.uniform(70, 91), 1),
+            'spin_rate': rnd.randint(1700, 2900),
+            'px': round(rnd.gauss(0, 0.9), 2),
+            'pz': round(rnd.gauss(2.5, 0.9), 2),
+            'sz_top': 3.4,
+            'sz_bot': 1.6,
+            'call_name': rnd.choice(CALLS),
+            'result': rnd.choice(['Ball', 'Strike', 'X']),
+            'des': 'Pitch description',
+            'balls': count % 4,
+            'strikes': count % 3,
+            'outs': (count // 4) % 3,
+            'player_total_pitches': pitcher_count,
+            'game_total_pitches': game_pitch
+        })
+        thrown[side] += 1
+        if count % 4 == 3:
+            batter_index[side] += 1
+
+    n_at_bats = max(1, n_pitches // 4)
+    wpa = [{'atBatIndex': i, 'homeTeamWinProbability': round(50 + 40 * np.sin(i / 7), 1),
+            'awayTeamWinProbability': round(50 - 40 * np.sin(i / 7), 1)} for i in range(n_at_bats)]
+    positions = ['pitcher', 'catcher', 'first', 'second', 'third', 'shortstop', 'left', 'center', 'right']
+    fielding = home if inning % 2 else away
+    play_events = [{
+        'pitchData': {'coordinates': {'pX': round(rnd.gauss(0, 0.9), 2), 'pZ': round(rnd.gauss(2.5, 0.9), 2)},
+                      'startSpeed': round(rnd.uniform(78, 100), 1), 'breaks': {'spinRate': rnd.randint(1700, 2900)},
+                      'strikeZoneTop': 3.4, 'strikeZoneBottom': 1.6},
+        'details': {'type': {'description': PITCH_NAMES['SL']}, 'call': {'description': 'Ball'}, 'description': 'Ball'},
+        'count': {'balls': i, 'strikes': 0}
+    } for i in range(3)]
+    return {
+        'game_status_code': 'I',
+        'home_team_data': {'teamName': team_names[home], 'abbreviation': home},
+        'away_team_data': {'teamName': team_names[away], 'abbreviation': away},
+        'home_pitchers': pitchers['home_pitchers'],
+        'away_pitchers': pitchers['away_pitchers'],
+        'scoreboard': {
+            'stats': {'wpa': {'gameWpa': wpa}},
+            'linescore': {
+                'currentInning': inning, 'inningHalf': 'Top', 'balls': 2, 'strikes': 1, 'outs': 1,
+                'teams': {'home': {'runs': inning // 2}, 'away': {'runs': inning // 3}},
+                'offense': {'first': {'id': 1, 'fullName': fixture_player_name(away, 'Batter', 3)},
+                            'third': {'id': 2, 'fullName': fixture_player_name(away, 'Batter', 2)}},
+                'defense': {position: {'id': 10 + i, 'fullName': fixture_player_name(fielding, 'Fielder', i + 1)} for i, position in enumerate(positions)}
+            },
+            'currentPlay': {
+                'matchup': {'batter': {'id': 1, 'fullName': fixture_player_name(away, 'Batter', 4)},
+                            'pitcher': {'id': 2, 'fullName': fixture_player_name(home, 'Pitcher', 1)}},
+                'playEvents': play_events
+            }
+        }
+    }
+
+
+def write_game_fixture(name, game_data):
+    FIXTURE_DIR.mkdir(exist_ok=True)
+    with gzip.open(FIXTURE_DIR / f'gf_{name}.json.gz', 'wt', encoding='utf-8') as outfile:
+        json.dump(game_data, outfile, separators=(',', ':'))
+
+
+def load_game_fixture(name):
+    with gzip.open(FIXTURE_DIR / f'gf_{name}.json.gz', 'rt', encoding='utf-8') as infile:
+        return json.load(infile)
+
+
+def load_season_fixture(name):
+    return pd.read_csv(FIXTURE_DIR / f'{name}.csv.gz')
+
+
+def write_synthetic_fixtures():
+    """ Writes the synthetic game and season stat fixtures. """
+    for name, (n_pitches, inning) in {'early': (30, 1), 'middle': (150, 5), 'late': (290, 9)}.items():
+        write_game_fixture(name, synthesize_game(n_pitches, inning, seed=GAME_FIXTURES.index(name)))
+    for name, df in synthesize_season_stats().items():
+        df.to_csv(FIXTURE_DIR / f'{name}.csv.gz', index=False)
+
+
+def record_game(game_pk, name):
+    """ Records the current gf payload of a live game as a fixture. """
+    import fetchBall
+
+    game_data = fetchBall.fetch_game_data.uncached(game_pk)
+    if not game_data:
+        raise SystemExit(f"Could not fetch game {game_pk}")
+    write_game_fixture(name, game_data)
+
+
+def install_season_fixtures():
+    """ Points the pybaseball loaders used by dataBall and fetchBall at the fixtures. Call before importing them. """
+    os.environ['STRIKEZONE_CACHE'] = 'memory'  # Never read real stats from a shared cache
+    tables = {name: load_season_fixture(name) for name in SEASON_FIXTURES}
+    for name, df in tables.items():
+        setattr(pybaseball, name, lambda *args, df=df, **kwargs: df.copy())
+
+
+############### TIMING ###############
+
+def time_call(func, repeat, setup=None, check=None):
+    """
+    Times func over repeat runs after one warm-up call.
+
+    Args:
+        check (callable): Called with the warm-up call's return value.
+
+    Returns:
+        dict: min_ms, median_ms, mean_ms and runs.
+    """
+    if setup:
+        setup()
+    result = func()
+    if check:
+        check(result)
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'min_ms': round(min(timings), 4), 'median_ms': round(statistics.median(timings), 4),
+            'mean_ms': round(statistics.mean(timings), 4), 'runs': repeat}
+
+
+def benchmark_cases():
+    """
+    Returns:
+        list of tuple: (name, function, setup) for every benchmark, game dependent ones once per game fixture.
+    """
+    import dataBall, stadiumBall, gameBall, clusterBall, dashBall, scatterBall, densityBall, timelineBall, arsenalBall
+
+    cases = [
+        ('dataBall.extract_team_player_stats', lambda: dataBall.extract_team_player_stats('NYY'), None),
+        ('dataBall.extract_statline', lambda: dataBall.extract_statline(fixture_player_name('NYY', 'Pitcher', 1), dataBall.player_pitching_stats,
+                                                                        dataBall.team_pitching_stats, ['K/9', 'H/9', 'BB%', 'BABIP', 'ERA', 'FIP', 'WHIP', 'SIERA', 'xFIP']), None),
+        ('stadiumBall.plot_stadium', lambda: stadiumBall.plot_stadium('yankees', panel_width=480, panel_height=540), None),
+        ('stadiumBall.plot_stadium (cold)', lambda: stadiumBall.plot_stadium('yankees', panel_width=480, panel_height=540), stadiumBall.outline_traces.cache_clear),
+    ]
+
+    stats = load_season_fixture('batting_stats')
+    stats = pd.concat([stats.assign(Season=season) for season in range(2015, 2025)], ignore_index=True)
+    stored_df = scatterBall.store_df(stats, 1)
+    scatter_args = ['OBP', 'SLG', [], 'OBP', 0, '>=', [], []]
+    cases += [
+        ('scatterBall.update_graph', lambda: scatterBall.update_graph(stored_df, *scatter_args, [], 4), None),
+        ('scatterBall.update_graph (clusters)', lambda: scatterBall.update_graph(stored_df, *scatter_args, ['CLUSTER'], 4), clusterBall.clear_cluster_cache),
+    ]
+
+    # A density grid should cost about the same for an outing and for a season of pitches
+    rng = np.random.default_rng(0)
+    for pitches in [100, 500000]:
+        plate_x, plate_z = rng.normal(0, 0.8, pitches), rng.normal(2.5, 0.8, pitches)
+        cases.append((f'densityBall.location_grid ({pitches} pitches)', lambda x=plate_x, z=plate_z: densityBall.location_grid(x, z), None))
+
+    for fixture in GAME_FIXTURES:
+        game_data = load_game_fixture(fixture)
+        game_pk = 900000 + GAME_FIXTURES.index(fixture)
+        token = {'game_pk': game_pk, 'version': gameBall.publish_game(game_pk, game_data)}
+        pitcher = fixture_player_name('NYY', 'Pitcher', 1)
+        cases += [(f'{fixture}/{name}', func, setup) for name, func, setup in [
+            ('dataBall.get_pitcher_data', lambda g=game_data: dataBall.get_pitcher_data(g), None),
+            ('dataBall.get_pitcher_data (one pitcher)', lambda g=game_data: dataBall.get_pitcher_data(g, pitcher), None),
+            ('dataBall.extract_all_game_pitching_events', lambda g=game_data: dataBall.extract_all_game_pitching_events(g), None),
+            ('gameBall.build_game_state', lambda g=game_data: gameBall.build_game_state(g), None),
+            ('dashBall.update_plot', lambda t=token: dashBall.update_plot(t, t['game_pk'], None, {'width': 1920, 'height': 1080}), None),
+            ('dashBall.update_current_zone', lambda t=token: dashBall.update_current_zone(t, None), None),
+            ('dashBall.update_strike_zone', lambda t=token: dashBall.update_strike_zone(t, pitcher, [], 'pitches', None, None), None),
+            ('dashBall.update_strike_zone (game density)', lambda t=token: dashBall.update_strike_zone(t, pitcher, [], 'game', None, None), None),
+            ('dashBall.update_win_probability_graph', lambda t=token: dashBall.update_win_probability_graph(t, None), None),
+            ('dashBall.update_graph_live', lambda t=token: dashBall.update_graph_live(0, t, ['show'], pitcher, t['game_pk'], None), None),
+            ('dashBall.update_stat_table', lambda t=token: dashBall.update_stat_table(t, pitcher), None),
+            ('dashBall.update_home_batting_stats', lambda t=token: dashBall.update_home_batting_stats(t['game_pk'], t), None),
+            ('timelineBall.GameTimeline.record', lambda g=game_data: timelineBall.GameTimeline().record(g), None),
+            ('arsenalBall.GameArsenal.catch_up', lambda t=token: arsenalBall.GameArsenal(timelineBall.get_timeline(t['game_pk'])).catch_up(), None),
+            ('dashBall.update_arsenal_table', lambda t=token: dashBall.update_arsenal_table(t, pitcher), None),
+            ('dashBall.update_timeline_views', lambda t=token: dashBall.update_timeline_views(1, t, None, {'width': 1920, 'height': 1080}), None),
+        ]]
+    return cases
+
+
+def returned_figures(result):
+    """ Figure dicts ({'data', 'layout'}) in a benchmark's return value, looking inside tuples and lists. """
+    if isinstance(result, dict):
+        return [result] if 'data' in result and 'layout' in result else []
+    if isinstance(result, (tuple, list)):
+        return [figure for item in result for figure in returned_figures(item)]
+    return []  # Patches and components aren't whole figures
+
+
+def validate_figures(result):
+    """ Runs every figure of a benchmark's return value through figureBall.validate_figure, see returned_figures. """
+    import figureBall
+
+    for figure in returned_figures(result):
+        figureBall.validate_figure(figure)
+
+
+def run_benchmarks(repeat=20, only=None):
+    """
+    Runs every benchmark whose name contains only (all if None) and validates the figures they return.
+
+    Returns:
+        dict: {'meta': {...}, 'results': {name: timing}, 'invalid': {name: validation error}}, see time_call.
+    """
+    install_season_fixtures()
+    results = {}
+    invalid = {}
+    for name, func, setup in benchmark_cases():
+        if only and only not in name:
+            continue
+
+        def check(result, name=name):
+            try:
+                validate_figures(result)
+            except ValueError as e:
+                invalid[name] = str(e)
+
+        results[name] = time_call(func, repeat, setup, check)
+    meta = {'python': platform.python_version(), 'platform': platform.platform(), 'repeat': repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'results': results, 'invalid': invalid}
+
+
+def import_profile(module='appBall'):
+    """
+    Imports module in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: total_s (the import's cumulative time) and packages, the self time of every top level package
+        in seconds, slowest first.
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=Path(__file__).resolve().parent,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise SystemExit(completed.stderr[-2000:])
+    packages = {}
+    total = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+        if name == module:
+            total = int(cumulative_us) / 1e6
+    packages = dict(sorted(((name, round(seconds, 4)) for name, seconds in packages.items()), key=lambda item: -item[1]))
+    return {'module': module, 'total_s': round(total, 4), 'packages': packages}
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compares medians against a baseline run.
+
+    Returns:
+        list of dict: name, median_ms, baseline_ms, change (relative) and regressed for every benchmark in both runs.
+    """
+    rows = []
+    for name, timing in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        change = timing['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0.0
+        rows.append({'name': name, 'median_ms': timing['median_ms'], 'baseline_ms': base['median_ms'],
+                     'change': round(change, 4), 'regressed': change > threshold})
+    return rows
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the dashboard hot paths.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run')
+    run.add_argument('--repeat', type=int, default=20)
+    run.add_argument('--only', help='Only run benchmarks whose name contains this')
+    run.add_argument('--output', help='Write the results as JSON to this file')
+    run.add_argument('--baseline', default=str(BASELINE_PATH))
+    run.add_argument('--threshold', type=float, default=0.2, help='Relative slowdown of a median counted as a regression')
+    run.add_argument('--save-baseline', action='store_true')
+    record = commands.add_parser('record')
+    record.add_argument('game_pk', type=int)
+    record.add_argument('name', choices=GAME_FIXTURES)
+    commands.add_parser('synthesize')
+    startup = commands.add_parser('startup')
+    startup.add_argument('--module', default='appBall')
+    startup.add_argument('--budget', type=float, default=1.5, help='Seconds the import may take')
+    startup.add_argument('--top', type=int, default=15)
+    startup.add_argument('--output', help='Write the profile as JSON to this file')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record_game(args.game_pk, args.name)
+    elif args.command == 'synthesize':
+        write_synthetic_fixtures()
+    elif args.command == 'startup':
+        profile = import_profile(args.module)
+        if args.output:
+            Path(args.output).write_text(json.dumps(profile, indent=2))
+        for name, seconds in list(profile['packages'].items())[:args.top]:
+            print(f"{name:<40} {seconds * 1000:>10.1f} ms")
+        print(f"import {args.module}: {profile['total_s']:.2f} s, budget {args.budget:.2f} s")
+        sys.exit(1 if profile['total_s'] > args.budget else 0)
+    else:
+        results = run_benchmarks(args.repeat, args.only)
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+        if args.save_baseline:
+            Path(args.baseline).write_text(json.dumps(results, indent=2))
+        regressions = []
+        if Path(args.baseline).exists() and not args.save_baseline:
+            baseline = json.loads(Path(args.baseline).read_text())
+            rows = compare(results, baseline, args.threshold)
+            for row in rows:
+                flag = 'REGRESSED' if row['regressed'] else ''
+                print(f"{row['name']:<62} {row['median_ms']:>10.3f} ms {row['baseline_ms']:>10.3f} ms {row['change']:>+8.1%} {flag}")
+            for name, timing in results['results'].items():
+                if name not in baseline['results']:
+                    print(f"{name:<62} {timing['median_ms']:>10.3f} ms {'':>13} {'new':>8}")
+            regressions = [row['name'] for row in rows if row['regressed']]
+        else:
+            for name, timing in results['results'].items():
+                print(f"{name:<62} {timing['median_ms']:>10.3f} ms")
+        for name, error in results['invalid'].items():
+            print(f"{name:<62} INVALID FIGURE: {error.splitlines()[0] if error else ''}")
+        sys.exit(1 if regressions or results['invalid'] else 0)
@@ -0,0 +1,246 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from pathlib import Path
+import metricsBall
+
+# Cache shared by every worker process serving the dashboards. The backend is picked from
+# STRIKEZONE_CACHE: 'memory' (default, per process), 'disk' (a directory of pickles shared by all
+# processes on the machine, STRIKEZONE_CACHE_DIR) or 'redis' (STRIKEZONE_REDIS_URL, any
+# Redis-compatible server, needs the redis package). Besides get/set, every backend has claim, an expiring lock
+# that lets one process out of all the workers take on a job, e.g. polling a game (see pushBall).
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / 'strikezone-cache'
+
+
+class MemoryCache:
+    """ Per-process cache with optional expiry. """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl if ttl else None)
+
+    def claim(self, key, owner, ttl):
+        """
+        Takes or renews an expiring lock.
+
+        Args:
+            key (str): Lock name.
+            owner (str): Identifies the claimant, its claims renew the lock.
+            ttl (float): Seconds until the lock is free again unless renewed.
+
+        Returns:
+            bool: Whether owner holds the lock.
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] != owner and (entry[1] is None or entry[1] >= now):
+                return False
+            self.entries[key] = (owner, now + ttl)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def prune(self):
+        """ Drops expired entries, which get() only removes when they're asked for again. """
+        now = time.time()
+        with self.lock:
+            for key, (value, expires) in list(self.entries.items()):
+                if expires is not None and expires < now:
+                    del self.entries[key]
+
+
+def _is_expiry(value):
+    # The first pickle of an entry in the old format is its value, which can be anything
+    return value is None or isinstance(value, float)
+
+
+class DiskCache:
+    """
+    Cache of pickle files in one directory, safe to share between processes. Writes are atomic renames.
+    Each file holds two pickles, the expiry time and the value, so expiry can be checked without loading the value.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.directory / (hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as infile:
+                expires = pickle.load(infile)
+                if not _is_expiry(expires) or (expires is not None and expires < time.time()):
+                    stale = True
+                else:
+                    stale, value = False, pickle.load(infile)
+        except OSError:
+            return None
+        except (EOFError, pickle.UnpicklingError):
+            stale = True  # Truncated, or a single pickle written before entries carried their expiry
+        if stale:
+            self.delete(key)
+            return None
+        return value
+
+    def _write(self, key, value, ttl):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as outfile:
+                pickle.dump(time.time() + ttl if ttl else None, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+            return True
+        except OSError as e:
+            logging.error(f"Failed to write cache entry {key}: {e}")
+            Path(temp_path).unlink(missing_ok=True)
+            return False
+
+    def set(self, key, value, ttl=None):
+        self._write(key, value, ttl)
+
+    def claim(self, key, owner, ttl):
+        """
+        Takes or renews an expiring lock, see MemoryCache.claim. Claims of one key are serialized with an flock on a
+        file next to the entry, so reading the current holder, dropping an expired claim and writing the new one
+        happen as one step across processes.
+        """
+        import fcntl  # POSIX only, like the multi-process servers that share a disk cache
+
+        with open(self._path(key).with_suffix('.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current = self.get(key)  # Deletes an expired lock
+                if current is not None and current != owner:
+                    return False
+                return self._write(key, owner, ttl)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self):
+        for path in self.directory.glob('*.pkl'):
+            path.unlink(missing_ok=True)
+
+    def prune(self):
+        """ Deletes the files of expired entries and of entries written before they carried their expiry. """
+        now = time.time()
+        for path in self.directory.glob('*.pkl'):
+            try:
+                with open(path, 'rb') as infile:
+                    expires = pickle.load(infile)
+            except OSError:
+                continue
+            except (EOFError, pickle.UnpicklingError):
+                expires = False
+            if not _is_expiry(expires) or (expires is not None and expires < now):
+                path.unlink(missing_ok=True)
+
+
+class RedisCache:
+    """ Cache on a Redis-compatible server. """
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=int(ttl) if ttl else None)
+
+    def claim(self, key, owner, ttl):
+        """ Takes or renews an expiring lock, see MemoryCache.claim. """
+        if self.client.set(key, pickle.dumps(owner, protocol=pickle.HIGHEST_PROTOCOL), nx=True, ex=max(1, int(ttl))):
+            return True
+        if self.get(key) != owner:
+            return False
+        self.client.expire(key, max(1, int(ttl)))
+        return True
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def clear(self):
+        self.client.flushdb()
+
+    def prune(self):
+        pass  # Redis expires keys itself
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """ Returns the process-wide cache backend, created from the environment on first use. """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = os.environ.get('STRIKEZONE_CACHE', 'memory')
+            if backend == 'disk':
+                _cache = DiskCache(os.environ.get('STRIKEZONE_CACHE_DIR', DEFAULT_CACHE_DIR))
+            elif backend == 'redis':
+                _cache = RedisCache(os.environ.get('STRIKEZONE_REDIS_URL', 'redis://localhost:6379/0'))
+            else:
+                _cache = MemoryCache()
+        return _cache
+
+
+def cached(namespace, ttl=None):
+    """
+    Decorator that caches a function's return value in the shared cache, keyed by namespace and arguments.
+    None results are not cached so failed fetches are retried on the next call.
+
+    Args:
+        namespace (str): Prefix of the cache keys, unique per function.
+        ttl (float): Optional seconds until an entry expires.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"{namespace}:{args!r}:{sorted(kwargs.items())!r}"
+            cache = get_cache()
+            value = cache.get(key)
+            metricsBall.CACHE_REQUESTS.inc(namespace=namespace, result='miss' if value is None else 'hit')
+            if value is None:
+                value = func(*args, **kwargs)
+                if value is not None:
+                    cache.set(key, value, ttl)
+            return value
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Fitted cluster assignments keyed by (dataset version, feature columns, k)
+CLUSTER_CACHE = OrderedDict()
+CLUSTER_CACHE_SIZE = 32
+_cluster_lock = threading.Lock()
+
+
+def standardize_features(df, feature_columns):
+    """
+    Standardizes the feature columns to zero mean and unit variance.
+
+    Args:
+        df (DataFrame): Data containing the feature columns.
+        feature_columns (list of str): Columns to cluster on.
+
+    Returns:
+        tuple: (index of the rows used, standardized feature matrix)
+    """
+    features = df[list(feature_columns)].apply(lambda col: col.astype(float)).dropna()
+    values = features.to_numpy()
+    if not len(values):
+        return features.index, values
+    std = values.std(axis=0)
+    std[std == 0] = 1.0  # Constant columns carry no information, leave them centered
+    return features.index, (values - values.mean(axis=0)) / std
+
+
+def fit_clusters(df, feature_columns, n_clusters, dataset_version):
+    """
+    Clusters the rows of df on the feature columns with MiniBatchKMeans.
+    Assignments are cached by (dataset_version, feature_columns, n_clusters) so only the first
+    request for a combination pays for the fit; every later call is a dictionary lookup.
+
+    Args:
+        df (DataFrame): Data to cluster.
+        feature_columns (list of str): Columns to cluster on.
+        n_clusters (int): Number of clusters.
+        dataset_version (str): Identifier of the dataset contents, e.g. a hash of the stored data.
+
+    Returns:
+        dict: Maps row index to cluster label. Rows with missing features are left out. With fewer complete rows
+        than n_clusters every row gets its own cluster, empty if there are none.
+    """
+    key = (dataset_version, tuple(feature_columns), n_clusters)
+    with _cluster_lock:
+        labels = CLUSTER_CACHE.get(key)
+        if labels is not None:
+            CLUSTER_CACHE.move_to_end(key)
+            return labels
+
+    from sklearn.cluster import MiniBatchKMeans  # Imported on first use, it's only needed once clustering is switched on
+
+    start = time.perf_counter()
+    index, features = standardize_features(df, feature_columns)
+    if not len(features):
+        labels = {}
+    else:
+        model = MiniBatchKMeans(n_clusters=min(n_clusters, len(features)), batch_size=1024, n_init=3, random_state=0)
+        labels = dict(zip(index, model.fit_predict(features).tolist()))
+    logging.info(f"Clustered {len(features)} rows on {list(feature_columns)} into {n_clusters} clusters in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    with _cluster_lock:
+        CLUSTER_CACHE[key] = labels
+        if len(CLUSTER_CACHE) > CLUSTER_CACHE_SIZE:
+            CLUSTER_CACHE.popitem(last=False)
+    return labels
+
+
+def clear_cluster_cache():
+    with _cluster_lock:
+        CLUSTER_CACHE.clear()
@@ -1,22 +1,26 @@
 import dash
-from dash import dcc, html,dash_table
+from dash import dcc, html,dash_table, Patch
 import dash_bootstrap_components as dbc
-import plotly.io as pio
 from dash.dependencies import Input, Output, State
-import plotly.graph_objects as go
+import datetime
 import numpy as py
 import pandas as pd
-import pybaseball
-import dataBall, fetchBall, tableBall, stadiumBall, runnerBall
-
-pio.templates.default = "plotly_dark"
+import dataBall, fetchBall, tableBall, stadiumBall, figureBall, gameBall, pushBall, metricsBall, memBall, statcastBall, densityBall, timelineBall, arsenalBall
 
 ############### DASH APP / HTML LAYOUT ###############
 
-pybaseball.cache.enable()
-app = dash.Dash(__name__, external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css'])
-app.layout = html.Div([
+# Callbacks are registered with dash.callback so the page runs on its own (see __main__) or inside appBall
+external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
+layout = html.Div([
     dcc.Store(id='game-data-store', storage_type='memory'),
+    dcc.Store(id='stadium-team-store', storage_type='memory'),
+    dcc.Store(id='viewport-store', storage_type='memory'),
+    dcc.Store(id='push-status-store', storage_type='memory'),
+    dcc.Store(id='strike-zone-render-store', storage_type='memory'),
+    dcc.Store(id='current-zone-render-store', storage_type='memory'),
+    dcc.Store(id='win-probability-render-store', storage_type='memory'),
+    dcc.Store(id='live-pitch-render-store', storage_type='memory'),
+    dcc.Store(id='replay-field-store', storage_type='memory'),
     dcc.Interval(id='page-load', interval=1*100, max_intervals=1),
     html.Div([
         dcc.Input(id='gamepk-input', type='text', placeholder='Enter Game PK', style={'display': 'none'}),
@@ -36,7 +40,8 @@ app.layout = html.Div([
                 style={'width': '45%', 'margin': '10px'}
             )
         ], style={'display': 'flex', 'justifyContent': 'space-around'}),
-        dcc.Interval(id='interval-component', interval=12*1000, n_intervals=0)
+        # New pitches are pushed over /events/<game_pk>, the interval is only a fallback and refreshes the schedule
+        dcc.Interval(id='interval-component', interval=60*1000, n_intervals=0)
     ], style={'text-align': 'center'}),
     html.Div([
         html.Div([
@@ -71,6 +76,28 @@ app.layout = html.Div([
             config={}
         ),
     ]),
+    html.Div([
+        html.H2('Replay'),
+        # Pitch number in the game, follows the newest pitch until moved back
+        dcc.Slider(id='timeline-slider', min=1, max=1, step=1, value=None, marks=None, updatemode='drag',
+                   tooltip={'placement': 'bottom', 'template': 'Pitch {value}'}),
+        html.Div(id='timeline-summary', style={'textAlign': 'center', 'padding': '5px'}),
+        html.Div([
+            html.Div([
+                dcc.Graph(id='replay-zone-graph', style={'width': '100%', 'margin': '0'})
+            ], style={'display': 'inline-block', 'width': '33%'}),
+            html.Div([
+                dcc.Graph(id='replay-field-graph', style={'height': '50vh', 'width': '100%', 'margin': '0'})
+            ], style={'display': 'inline-block', 'width': '33%'}),
+            html.Div([
+                dcc.Graph(id='replay-wpa-graph', style={'width': '100%', 'margin': '0'})
+            ], style={'display': 'inline-block', 'width': '33%'})
+        ])
+    ], id='timeline-container', style={'backgroundColor': '#111111', 'color': 'white'}),
+    html.Div([
+        html.H2('Arsenal'),
+        html.Div(id='arsenal-table-container', style={'padding': '10px'})
+    ], style={'backgroundColor': '#111111', 'color': 'white'}),
     html.Div([
         html.Div([
             html.H2('Home Batting Stats'),
@@ -87,6 +114,28 @@ app.layout = html.Div([
             options=[{'label': 'Show Labels', 'value': 'show'}],
             value=[],
             style={'display': 'inline-block'}
+        ),
+        dcc.Checklist(
+            id='season-overlay-toggle',
+            options=[{'label': 'Season Tendencies', 'value': 'show'}],
+            value=[],
+            style={'display': 'inline-block', 'marginLeft': '20px'}
+        ),
+        dcc.RadioItems(
+            id='strike-zone-mode',
+            options=[{'label': 'Pitches', 'value': 'pitches'},
+                     {'label': 'Game Density', 'value': 'game'},
+                     {'label': 'Pitcher Season Density', 'value': 'pitcher_season'},
+                     {'label': 'Batter Season Density', 'value': 'batter_season'}],
+            value='pitches',
+            inline=True,
+            style={'display': 'inline-block', 'marginLeft': '20px'}
+        ),
+        dcc.Dropdown(
+            id='strike-zone-filter',
+            options=densityBall.FILTER_OPTIONS,
+            placeholder='All pitches',
+            style={'width': '250px', 'display': 'inline-block', 'verticalAlign': 'middle', 'marginLeft': '20px'}
         )
     ])
 ], style={'backgroundColor': '#111111'})
@@ -117,7 +166,7 @@ color_dict = {
 ############### CALLBACKS ###############
 
 
-@app.callback(
+@dash.callback(
     [Output('home-batting-stats-table', 'data'),
      Output('home-batting-stats-table', 'columns'),
      Output('home-batting-stats-table', 'style_cell'),
@@ -127,9 +176,9 @@ color_dict = {
     [Input('gamepk-dropdown', 'value'), Input('game-data-store', 'data')]
 )
 def update_home_batting_stats(gamepk, data):
-    game_data = data['game_data'] if data else None
-    if gamepk:
-        home_win_probs, away_win_probs, home_team, away_team = dataBall.extract_win_probabilities(game_data)
+    state = gameBall.game_state(data)
+    if gamepk and state and state['home_team']:
+        home_team = state['home_team']
         team_replacements = {'AZ': 'ARI', 'WSH': 'WSN', 'TB': 'TBR', 'CWS': 'CHW', 'SF': 'SFG', 'SD': 'SDP', 'KC': 'KCR'}
         for old, new in team_replacements.items():
             home_team = home_team.replace(old, new)
@@ -140,7 +189,7 @@ def update_home_batting_stats(gamepk, data):
         return df.to_dict('records'), [{"name": str(i), "id": str(i)} for i in df.columns], {'backgroundColor': 'rgb(50, 50, 50)', 'color': 'white', 'textAlign': 'left', 'minWidth': '25px', 'width': '25px'}, {'backgroundColor': 'rgb(30, 30, 30)', 'fontWeight': 'bold', 'color': 'white'}, {'backgroundColor': 'rgb(50, 50, 50)', 'color': 'white'}, { 'width': '95%', 'overflowY': 'auto', 'margin': 'auto'}
     return [], [], {}, {}, {}, {}
 
-@app.callback(
+@dash.callback(
     [Output('away-batting-stats-table', 'data'),
      Output('away-batting-stats-table', 'columns'),
      Output('away-batting-stats-table', 'style_cell'),
@@ -150,9 +199,9 @@ def update_home_batting_stats(gamepk, data):
     [Input('gamepk-dropdown', 'value'), Input('game-data-store', 'data')]
 )
 def update_away_batting_stats(gamepk, data):
-    game_data = data['game_data'] if data else None
-    if gamepk:
-        home_win_probs, away_win_probs, home_team, away_team = dataBall.extract_win_probabilities(game_data)
+    state = gameBall.game_state(data)
+    if gamepk and state and state['away_team']:
+        away_team = state['away_team']
         team_replacements = {'AZ': 'ARI', 'WSH': 'WSN', 'TB': 'TBR', 'CWS': 'CHW', 'SF': 'SFG', 'SD': 'SDP', 'KC': 'KCR'}
         for old, new in team_replacements.items():
             away_team = away_team.replace(old, new)
@@ -165,7 +214,7 @@ def update_away_batting_stats(gamepk, data):
 
 #############Data Storage################
 # Fetch game data
-@app.callback(
+@dash.callback(
     Output('game-data-store', 'data'),
     [Input('interval-component', 'n_intervals'),
      Input('page-load', 'n_intervals'),
@@ -174,57 +223,103 @@ def update_away_batting_stats(gamepk, data):
 )
 def fetch_game_data(n_intervals, page_load, game_pk, stored_data):
     if n_intervals > 0 or page_load == 1 or game_pk:  # Fetch data if the interval component has completed an interval, the page has loaded, or a new gamepk is selected
-        game_data = fetchBall.fetch_game_data(game_pk)
-        strike_zone_data = fetchBall.fetch_strike_zone_data(game_data) if game_data else None
-        return {'game_data': game_data, 'strike_zone_data': strike_zone_data}
+        if not game_pk:
+            return dash.no_update
+        # A server side poller keeps the game's feed in the registry, the browser only gets a token for it
+        version = pushBall.ensure_polling(game_pk)
+        same_game = stored_data is not None and stored_data.get('game_pk') == game_pk
+        # Leave the store untouched when the feed hasn't changed (or the poll failed) so the
+        # figure and table callbacks downstream of it don't fire at all
+        if same_game and (version is None or version == stored_data.get('version')):
+            return dash.no_update
+        return {'game_pk': game_pk, 'version': version}
     return stored_data  # Return the stored data if no inputs triggered the callback
 
-@app.callback(
+# Subscribe to the pushed feed versions of the selected game
+dash.clientside_callback(
+    pushBall.SUBSCRIBE_CLIENTSIDE,
+    Output('push-status-store', 'data'),
+    Input('gamepk-dropdown', 'value')
+)
+
+@dash.callback(
     [Output('pitcher-dropdown', 'options'),
      Output('pitcher-dropdown', 'value')],
     [Input('game-data-store', 'data')],
     [State('pitcher-dropdown', 'value')]
 )
 def update_pitcher_dropdown(data, current_value):
-    if data:
-        game_data = data['game_data']
-        pitcher_names = dataBall.extract_pitcher_names(game_data)
+    state = gameBall.game_state(data)
+    if state:
+        pitcher_names = state['pitcher_names']
         options = [{'label': name, 'value': name} for name in pitcher_names]
         # If the current value is in the options list, keep it. Otherwise, set the value to the top option
         value = current_value if current_value in pitcher_names else options[0]['value'] if options else None
         return options, value
     return [], None
 
-@app.callback(
+@dash.callback(
     [Output('gamepk-dropdown', 'options'),
      Output('gamepk-dropdown', 'value')],
     [Input('interval-component', 'n_intervals'),
      Input('page-load', 'n_intervals')],  # Add 'page-load' as an input
-    [State('gamepk-dropdown', 'value')]
+    [State('gamepk-dropdown', 'value'),
+     State('gamepk-dropdown', 'options')]
 )
-def update_gamepk_dropdown(n_intervals, page_load, current_value):
+def update_gamepk_dropdown(n_intervals, page_load, current_value, current_options):
     if n_intervals > 0 or page_load == 1:  # Update if the interval component has completed an interval or the page has loaded
         game_info = fetchBall.get_game_pks_and_teams()
         options = [{'label': f"{info[1]} vs {info[2]}", 'value': info[0]} for info in game_info]
-        return options, options[0]['value'] if options and current_value is None else current_value
+        value = options[0]['value'] if options and current_value is None else current_value
+        if options == current_options and value == current_value:
+            return dash.no_update, dash.no_update  # Same schedule, don't retrigger the game fetch
+        return options, value
     return [], None
 
-@app.callback(
-    Output('stadium-plot', 'figure'),
+# Record the browser window size once so the stadium outline resolution can follow the panel size
+dash.clientside_callback(
+    """
+    function(n) {
+        return {'width': window.innerWidth, 'height': window.innerHeight};
+    }
+    """,
+    Output('viewport-store', 'data'),
+    Input('page-load', 'n_intervals')
+)
+
+@dash.callback(
+    [Output('stadium-plot', 'figure'),
+     Output('stadium-team-store', 'data')],
     [Input('game-data-store', 'data'),
-     Input('gamepk-dropdown', 'value'),
-     Input('interval-component', 'n_intervals')]  # Listen to 'interval-component.n_intervals'
+     Input('gamepk-dropdown', 'value')],
+    [State('stadium-team-store', 'data'),
+     State('viewport-store', 'data')]
 )
-def update_plot(stored_data, game_pk, n):
-    if stored_data and 'game_data' in stored_data:
-        runners = runnerBall.get_base_runners(stored_data['game_data'])
-        defenders = runnerBall.get_defenders(stored_data['game_data'])
-        return stadiumBall.plot_stadium(stored_data['game_data']['home_team_data']['teamName'].lower(), runners=runners,defenders=defenders, title='')
+def update_plot(stored_data, game_pk, rendered, viewport):
+    state = gameBall.game_state(stored_data)
+    if state:
+        team = state['stadium_team']
+        runners = state['runners']
+        defenders = state['defenders']
+        # The stadium panel is a quarter of the window wide and half of it tall
+        panel_width = viewport['width'] // 4 if viewport else None
+        panel_height = viewport['height'] // 2 if viewport else None
+        tolerance = stadiumBall.pick_tolerance(team, panel_width, panel_height)
+        if rendered == {'team': team, 'tolerance': tolerance}:
+            # The browser already has this ballpark, only swap the runner and defender overlays
+            n_outline = len(stadiumBall.outline_traces(team, tolerance))
+            runner_trace, defender_trace = stadiumBall.overlay_traces(runners, defenders)
+            patched_figure = Patch()
+            patched_figure['data'][n_outline] = runner_trace
+            patched_figure['data'][n_outline + 1] = defender_trace
+            return patched_figure, dash.no_update
+        figure = stadiumBall.plot_stadium(team, runners=runners,defenders=defenders, title='', panel_width=panel_width, panel_height=panel_height)
+        return figure, {'team': team, 'tolerance': tolerance}
     else:
-        return go.Figure()  # Return an empty figure if there's no data
+        return figureBall.empty_figure(), None  # Return an empty figure if there's no data
 ##########Pitcher Name Input##############
 
-@app.callback(
+@dash.callback(
     Output('pitcher-name-input', 'value'),
     Input('pitcher-dropdown', 'value')
 )
@@ -246,7 +341,7 @@ def update_pitcher_name_input(selected_pitcher):
 
 #############Stat/Event Tables###############
 
-@app.callback(
+@dash.callback(
     [Output('pitcher-table-container', 'children'),
      Output('batter-table-container', 'children'),
      Output('recent-events-container', 'children')],
@@ -254,12 +349,10 @@ def update_pitcher_name_input(selected_pitcher):
      Input('pitcher-dropdown', 'value')]
 )
 def update_stat_table(stored_data, selected_pitcher_name):
-    if stored_data:
-        game_data = stored_data['game_data']
-        current_play_data = fetchBall.fetch_current_play_data(game_data)
-
-        # Extract batter's full name
-        batter_name = current_play_data.get('matchup', {}).get('batter', {}).get('fullName', 'Unknown')
+    state = gameBall.game_state(stored_data)
+    if state:
+        # Batter's full name from the current matchup
+        batter_name = state['batter_name']
 
         # Use the selected pitcher's name from the dropdown
         pitcher_name = selected_pitcher_name
@@ -271,10 +364,8 @@ def update_stat_table(stored_data, selected_pitcher_name):
         if isinstance(batter_player_dict, str) or isinstance(pitcher_player_dict, str):  # If no stats were found
             return [], [], []
 
-        # Fetch and sort the pitching events
-        all_pitching_events = dataBall.extract_all_game_pitching_events(game_data)
-        sorted_events = sorted(all_pitching_events, key=lambda x: x['Pitch #'], reverse=True)
-        recent_events = sorted_events  # Get the three most recent events
+        # Pitching events sorted newest first, copied because the table sorts its rows in place
+        recent_events = list(state['events'])
 
         # Create tables for batter, pitcher, and recent events
         batter_table = tableBall.create_data_table(batter_player_dict, batter_league_average_dict, batter_team_average_dict, 'batter-slashline-table')
@@ -285,98 +376,205 @@ def update_stat_table(stored_data, selected_pitcher_name):
 
     return [], [], []
 
+
+@dash.callback(
+    Output('arsenal-table-container', 'children'),
+    [Input('game-data-store', 'data'),
+     Input('pitcher-dropdown', 'value')]
+)
+def update_arsenal_table(stored_data, pitcher_name):
+    # The summaries are kept up to date pitch by pitch, this only reads them
+    if not pitcher_name or gameBall.resolve_game(stored_data) is None:  # Registering the feed also records it in the timeline
+        return []
+    arsenal = arsenalBall.game_arsenal(stored_data['game_pk'])
+    if arsenal is None:
+        return []
+    return [tableBall.create_arsenal_table(arsenal.summary(pitcher_name))]
+
 #######Current AB Zone Graph#################
+# The zone and trend graphs are built once per selection. While the selection stays the same the
+# callbacks only send a Patch with the points that arrived since the last tick. The matching
+# *-render-store remembers what the browser holds as {'key': selection, 'count': points drawn},
+# the zone graphs also keep 'traces', the pitch type of each trace in order.
+
+CURRENT_ZONE_HOVERTEMPLATE = "Type: %{customdata[0]}<br>Speed: %{customdata[1]} mph<br>Spin rate: %{customdata[2]}<br>Count: %{customdata[3]}<br>Call: %{customdata[4]}<br>Batter: %{customdata[5]}"
 
-@app.callback(
-    Output('current-zone-graph', 'figure'),
-    [Input('game-data-store', 'data')]
+@dash.callback(
+    [Output('current-zone-graph', 'figure'),
+     Output('current-zone-render-store', 'data')],
+    [Input('game-data-store', 'data')],
+    [State('current-zone-render-store', 'data')]
 )
-def update_current_zone(stored_data):
-    if stored_data:
-        game_data = stored_data['game_data']
-        strike_zone_data = stored_data['strike_zone_data']
-        if game_data and strike_zone_data:
-            current_play_data = fetchBall.fetch_current_play_data(game_data)
-
-            # Extract batter's and pitcher's full name
-            batter_name = current_play_data.get('matchup', {}).get('batter', {}).get('fullName', 'Unknown')
-            pitcher_name = current_play_data.get('matchup', {}).get('pitcher', {}).get('fullName', 'Unknown')
-
-            # Rest of your code
+def update_current_zone(stored_data, rendered):
+    state = gameBall.game_state(stored_data)
+    if state:
+        strike_zone_data = state['strike_zone_data']
+        if strike_zone_data:
+            current_play_data = state['current_play']
+
+            # Batter's and pitcher's full name
+            batter_name = state['batter_name']
+            pitcher_name = state['pitcher_name']
+
             # Check if playEvents is a list
             if isinstance(current_play_data.get('playEvents'), list):
-                fig = go.Figure()
+                play_events = current_play_data['playEvents']
+                at_bat_index = current_play_data.get('atBatIndex', current_play_data.get('about', {}).get('atBatIndex'))
+                key = [stored_data['game_pk'], at_bat_index, pitcher_name, batter_name]
+                drawn = rendered['count'] if rendered and rendered['key'] == key else None
+
+                if drawn is not None and drawn <= len(play_events):
+                    if drawn == len(play_events):
+                        return dash.no_update, dash.no_update
+                    patched_figure = Patch()
+                    patched_figure['layout']['shapes'] = [strike_zone_shape(strike_zone_data)]
+                    trace_names = extend_pitch_type_traces(patched_figure, rendered['traces'], [current_zone_point(play_event, batter_name) for play_event in play_events[drawn:]], 'markers', CURRENT_ZONE_HOVERTEMPLATE)
+                    return patched_figure, {'key': key, 'count': len(play_events), 'traces': trace_names}
+
+                fig = figureBall.empty_figure()
                 draw_strike_zone(fig, strike_zone_data)
 
-                # Loop over all play events
-                for play_event in current_play_data['playEvents']:
-                    pitch_data = play_event.get('pitchData', {})
-                    coordinates = pitch_data.get('coordinates', {})
-                    pitch_type = play_event.get('details', {}).get('type', {}).get('description', 'Unknown')
-                    pitch_speed = play_event.get('pitchData', {}).get('startSpeed', 'Unknown')
-                    spin_rate = pitch_data.get('breaks', {}).get('spinRate', 'Unknown')
-                    count = play_event.get('count', {}).get('balls', 0), play_event.get('count', {}).get('strikes', 0)
-                    call = play_event.get('details', {}).get('call', {}).get('description', 'Unknown')
-                    inning = play_event.get('about', {}).get('inning', 'Unknown')
-                    
-                    px = coordinates.get('pX')
-                    pz = coordinates.get('pZ')
-
-                    color = color_dict.get(pitch_type, 'black')  # Use black for unknown pitch types
-
-                    add_trace(fig, [px], [pz], 'markers', pitch_type, None, 'y1', 
-          dict(color=color, size=15), None, 
-          f"Type: {pitch_type}<br>Speed: {pitch_speed} mph<br>Spin rate: {spin_rate}<br>Count: {count}<br>Call: {call}<br>Batter: {batter_name}")
+                # One trace per pitch type for all play events
+                traces, trace_names = pitch_type_traces([current_zone_point(play_event, batter_name) for play_event in play_events], 'markers', CURRENT_ZONE_HOVERTEMPLATE)
+                fig['data'].extend(traces)
 
                 # Set figure properties
-                set_figure_layout(fig, f"Current Pitch Location for {pitcher_name}<br>Current Batter {batter_name}", "Width (feet)", "Height (feet)")
-                return fig
-    return go.Figure()  # Return an empty figure if no data
+                set_figure_layout(fig, f"Current Pitch Location for {pitcher_name}<br>Current Batter {batter_name}", "Width (feet)", "Height (feet)", showlegend=True)
+                return fig, {'key': key, 'count': len(play_events), 'traces': trace_names}
+    return figureBall.empty_figure(), None  # Return an empty figure if no data
+
+def current_zone_point(play_event, batter_name):
+    """ Location and hover data of one event of the current at bat as (pitch type, px, pz, customdata). """
+    pitch_data = play_event.get('pitchData', {})
+    coordinates = pitch_data.get('coordinates', {})
+    pitch_type = play_event.get('details', {}).get('type', {}).get('description', 'Unknown')
+    pitch_speed = play_event.get('pitchData', {}).get('startSpeed', 'Unknown')
+    spin_rate = pitch_data.get('breaks', {}).get('spinRate', 'Unknown')
+    count = play_event.get('count', {}).get('balls', 0), play_event.get('count', {}).get('strikes', 0)
+    call = play_event.get('details', {}).get('call', {}).get('description', 'Unknown')
+
+    px = coordinates.get('pX')
+    pz = coordinates.get('pZ')
+
+    return pitch_type, px, pz, [pitch_type, pitch_speed, spin_rate, str(count), call, batter_name]
 
 #########Cumulative Zone Graph##################
 
-@app.callback(
-    Output('strike-zone-graph', 'figure'),
+@dash.callback(
+    [Output('strike-zone-graph', 'figure'),
+     Output('strike-zone-render-store', 'data')],
     [Input('game-data-store', 'data'),
-     Input('pitcher-dropdown', 'value')]
+     Input('pitcher-dropdown', 'value'),
+     Input('season-overlay-toggle', 'value'),
+     Input('strike-zone-mode', 'value'),
+     Input('strike-zone-filter', 'value')],
+    [State('strike-zone-render-store', 'data')]
 )
-def update_strike_zone(stored_data, pitcher_name):
-    if stored_data and pitcher_name:
-        game_data = stored_data['game_data']
-        strike_zone_data = stored_data['strike_zone_data']
-        if game_data and strike_zone_data:
-            pitch_locations = dataBall.get_pitcher_data(game_data, pitcher_name)
-            
-            fig = go.Figure()
+def update_strike_zone(stored_data, pitcher_name, season_overlay, zone_mode, pitch_filter, rendered):
+    state = gameBall.game_state(stored_data)
+    if state and pitcher_name:
+        strike_zone_data = state['strike_zone_data']
+        if strike_zone_data:
+            pitch_locations = gameBall.pitcher_pitches(state, pitcher_name)
+            key = [stored_data['game_pk'], pitcher_name, bool(season_overlay)]
+            drawn = rendered['count'] if rendered and rendered['key'] == key else None
+            overlay_shapes = season_tendency_shapes(state['pitcher_ids'].get(pitcher_name.lower().strip())) if season_overlay else []
+            if zone_mode and zone_mode != 'pitches':
+                # Densities are one fixed size heatmap, redrawn whole instead of patched
+                return density_figure(state, pitcher_name, pitch_locations, zone_mode, pitch_filter, strike_zone_data, overlay_shapes), None
+
+            if drawn is not None and drawn <= len(pitch_locations):
+                # Same pitcher as the figure in the browser: move the zone and append the new pitches
+                patched_figure = Patch()
+                patched_figure['layout']['shapes'] = [strike_zone_shape(strike_zone_data)] + overlay_shapes
+                trace_names = extend_pitch_type_traces(patched_figure, rendered['traces'], [strike_zone_point(location) for location in pitch_locations[drawn:]], 'markers', STRIKE_ZONE_HOVERTEMPLATE)
+                return patched_figure, {'key': key, 'count': len(pitch_locations), 'traces': trace_names}
+
+            fig = figureBall.empty_figure()
             draw_strike_zone(fig, strike_zone_data)
+            fig['layout']['shapes'].extend(overlay_shapes)
 
-            # Plot each pitch location
-            for location in pitch_locations:
-                add_trace(fig, [location['px']], [location['pz']], 'markers+text', None, None, 'y1', 
-          dict(color=color_dict.get(location['pitch_name'], 'black'), size=15), None, 
-          f"<br>Speed: {location['start_speed']} mph<br>Result: {location['result']}<br>Spin Rate: {location['spin_rate']} rpm<br>Call: {location['call']}<br>Result: {location['result']}<br>Batter: {location['batter_name']}<br>Inning: {location['inning']}<br>Pitch Type: {location['pitch_name']}")
+            # Plot the pitch locations with one trace per pitch type
+            traces, trace_names = pitch_type_traces([strike_zone_point(location) for location in pitch_locations], 'markers', STRIKE_ZONE_HOVERTEMPLATE)
+            fig['data'].extend(traces)
 
             # Set figure properties
-            set_figure_layout(fig, "Strike Zone with All Pitch Locations", "Width (feet)", "Height (feet)")
-            return fig
-    return go.Figure()  # Return an empty figure if no data
+            set_figure_layout(fig, "Strike Zone with All Pitch Locations", "Width (feet)", "Height (feet)", showlegend=True)
+            return fig, {'key': key, 'count': len(pitch_locations), 'traces': trace_names}
+    return figureBall.empty_figure(), None  # Return an empty figure if no data
+
+STRIKE_ZONE_HOVERTEMPLATE = "<br>Speed: %{customdata[0]} mph<br>Result: %{customdata[1]}<br>Spin Rate: %{customdata[2]} rpm<br>Call: %{customdata[3]}<br>Result: %{customdata[1]}<br>Batter: %{customdata[4]}<br>Inning: %{customdata[5]}<br>Pitch Type: %{customdata[6]}"
+
+def season_lookup(lookup, *args):
+    """ Calls lookup(*args, season) for this season, or last season until this one has pitches in the Statcast store. """
+    season = datetime.date.today().year
+    return lookup(*args, season) or lookup(*args, season - 1)
+
+def season_tendency_shapes(pitcher_id):
+    """
+    One ellipse per pitch type of the pitcher's season in the Statcast store (see statcastBall), centered on the
+    mean location and one standard deviation wide.
+    """
+    if pitcher_id is None:
+        return []
+    tendencies = season_lookup(statcastBall.pitch_tendencies, pitcher_id)
+    shapes = []
+    for tendency in tendencies:
+        color = color_dict.get(tendency['pitch_name'], 'white')
+        shapes.append(dict(type='circle', xref='x', yref='y', layer='below', opacity=0.4,
+                           x0=tendency['plate_x'] - tendency['plate_x_std'], x1=tendency['plate_x'] + tendency['plate_x_std'],
+                           y0=tendency['plate_z'] - tendency['plate_z_std'], y1=tendency['plate_z'] + tendency['plate_z_std'],
+                           line=dict(color=color, dash='dot', width=2),
+                           label=dict(text=f"{tendency['pitch_name']} {tendency['usage']:.0%}", font=dict(color=color, size=10))))
+    return shapes
+
+def density_figure(state, pitcher_name, pitch_locations, zone_mode, pitch_filter, strike_zone_data, overlay_shapes):
+    """
+    Strike zone with the pitch location density of the selected pitcher in this game or this season, or of the
+    pitches the current batter has seen this season.
+
+    Args:
+        state (dict): See gameBall.build_game_state.
+        pitcher_name (str): Selected pitcher.
+        pitch_locations (list of dicts): The pitcher's pitches in this game.
+        zone_mode (str): 'game', 'pitcher_season' or 'batter_season'.
+        pitch_filter (str): Filter value from densityBall.FILTER_OPTIONS, None for every pitch.
+        strike_zone_data (dict): Top and bottom of the zone.
+        overlay_shapes (list of dicts): Season tendency shapes.
+
+    Returns:
+        dict: The figure.
+    """
+    if zone_mode == 'game':
+        grid = densityBall.game_density(pitch_locations, pitch_filter)
+        title = f"{pitcher_name} Pitch Density, This Game"
+    elif zone_mode == 'pitcher_season':
+        pitcher_id = state['pitcher_ids'].get(pitcher_name.lower().strip())
+        grid = season_lookup(lambda season: densityBall.season_density(pitcher_id, season, 'pitcher', pitch_filter)) if pitcher_id else None
+        title = f"{pitcher_name} Pitch Density, Season"
+    else:
+        batter_id = state['current_play'].get('matchup', {}).get('batter', {}).get('id')
+        grid = season_lookup(lambda season: densityBall.season_density(batter_id, season, 'batter', pitch_filter)) if batter_id else None
+        title = f"{state['batter_name']} Pitches Seen, Season"
+
+    fig = figureBall.empty_figure()
+    if grid and grid['count']:
+        fig['data'].append(densityBall.heatmap_trace(grid))
+        title += f" ({grid['count']} pitches)"
+    else:
+        title += " (no pitches)"
+    draw_strike_zone(fig, strike_zone_data)
+    fig['layout']['shapes'].extend(overlay_shapes)
+    set_figure_layout(fig, title, "Width (feet)", "Height (feet)")
+    return fig
+
+def strike_zone_point(location):
+    """ Location and hover data of one pitch of the selected pitcher as (pitch type, px, pz, customdata). """
+    return location['pitch_name'], location['px'], location['pz'], [location['start_speed'], location['result'], location['spin_rate'], location['call'], location['batter_name'], location['inning'], location['pitch_name']]
 
 #########Win Probability Graph#################
 
-@app.callback(
-    Output('win-probability-graph', 'figure'),
-    Input('game-data-store', 'data')
-)
-def update_win_probability_graph(stored_data):
-    if stored_data:
-        game_data = stored_data['game_data']
-        previous_result = dataBall.extract_current_result(game_data)
-        if game_data:
-            home_win_probs, away_win_probs, home_team, away_team = dataBall.extract_win_probabilities(game_data)
-
-            if home_win_probs is not None and away_win_probs is not None:
-                fig = go.Figure()
-                team_colors = {
+team_colors = {
     'AZ': '#A71930',  # Arizona Diamondbacks
     'ATL': '#CE1141',  # Atlanta Braves
     'BAL': '#DF4601',  # Baltimore Orioles
@@ -409,111 +607,291 @@ def update_win_probability_graph(stored_data):
     'WSH': '#AB0003'   # Washington Nationals
 }
 
-                add_trace(fig, list(range(len(home_win_probs))), home_win_probs, 'lines', home_team, None, 'y1', None, dict(color=team_colors.get(home_team, 'black')))
+@dash.callback(
+    [Output('win-probability-graph', 'figure'),
+     Output('win-probability-render-store', 'data')],
+    [Input('game-data-store', 'data')],
+    [State('win-probability-render-store', 'data')]
+)
+def update_win_probability_graph(stored_data, rendered):
+    state = gameBall.game_state(stored_data)
+    if state:
+        previous_result = state['previous_result']
+        home_win_probs, away_win_probs = state['home_win_probs'], state['away_win_probs']
+        home_team, away_team = state['home_team'], state['away_team']
+
+        if home_win_probs is not None and away_win_probs is not None:
+            # Check if previous_result is None
+            if previous_result is None:
+                previous_result = 'No current at bat'
+            title = home_team+" vs "+away_team+ " Win Probability<br>Previous Result: "+previous_result
+
+            key = [stored_data['game_pk'], home_team, away_team]
+            drawn = rendered['count'] if rendered and rendered['key'] == key else None
+            if drawn is not None and drawn <= len(home_win_probs):
+                # Same game as the figure in the browser: extend both lines and refresh the title
+                patched_figure = Patch()
+                patched_figure['layout']['title']['text'] = title
+                if drawn < len(home_win_probs):
+                    new_x = list(range(drawn, len(home_win_probs)))
+                    patched_figure['data'][0]['x'].extend(new_x)
+                    patched_figure['data'][0]['y'].extend(home_win_probs[drawn:])
+                    patched_figure['data'][1]['x'].extend(new_x)
+                    patched_figure['data'][1]['y'].extend(away_win_probs[drawn:])
+                return patched_figure, {'key': key, 'count': len(home_win_probs)}
+
+            fig = figureBall.empty_figure()
+            add_trace(fig, list(range(len(home_win_probs))), home_win_probs, 'lines', home_team, None, 'y1', None, dict(color=team_colors.get(home_team, 'black')))
+
+            add_trace(fig, list(range(len(away_win_probs))), away_win_probs, 'lines', away_team, None, 'y1', None, dict(color=team_colors.get(away_team, 'black')))
+
+            fig['layout'].update(
+            title=dict(text=title),
+            yaxis=figureBall.axis_title("Win Probability"),
+            xaxis=dict(figureBall.axis_title("Time"), range=[0, None]),  # Set the minimum of x-axis to 0 and maximum to auto range
+            showlegend=True
+        )
 
-                add_trace(fig, list(range(len(away_win_probs))), away_win_probs, 'lines', away_team, None, 'y1', None, dict(color=team_colors.get(away_team, 'black')))
-                                # Check if previous_result is None
-                if previous_result is None:
-                    previous_result = 'No current at bat'
+            return fig, {'key': key, 'count': len(home_win_probs)}
 
-                fig.update_layout(
-                title=home_team+" vs "+away_team+ " Win Probability<br>Previous Result: "+previous_result,
-                yaxis_title="Win Probability",
-                xaxis_title="Time",
-                showlegend=True,
-                xaxis=dict(range=[0, None])  # Set the minimum of x-axis to 0 and maximum to auto range
-            )
+    return figureBall.empty_figure(), None  # Return an empty figure if no data
 
-                return fig
+#############Replay##################
 
-    return go.Figure()  # Return an empty figure if no data
+@dash.callback(
+    [Output('timeline-slider', 'max'),
+     Output('timeline-slider', 'marks'),
+     Output('timeline-slider', 'value')],
+    [Input('game-data-store', 'data')],
+    [State('timeline-slider', 'value'),
+     State('timeline-slider', 'max')]
+)
+def update_timeline_slider(stored_data, position, previous_max):
+    if gameBall.resolve_game(stored_data) is None:  # Registering the feed also records it in the timeline
+        return 1, None, None
+    timeline = timelineBall.get_timeline(stored_data['game_pk'])
+    if timeline is None or not timeline.length:
+        return 1, None, None
+    # Keep following the newest pitch unless the slider was moved back
+    following = position is None or position >= previous_max
+    value = timeline.length if following else min(position, timeline.length)
+    marks = {str(row + 1): str(inning) for inning, row in timeline.inning_starts().items()}
+    return timeline.length, marks, value
+
+REPLAY_ZONE_HOVERTEMPLATE = "Pitch %{customdata[0]}<br>Call: %{customdata[1]}"
+
+@dash.callback(
+    [Output('replay-zone-graph', 'figure'),
+     Output('replay-field-graph', 'figure'),
+     Output('replay-wpa-graph', 'figure'),
+     Output('timeline-summary', 'children'),
+     Output('replay-field-store', 'data')],
+    [Input('timeline-slider', 'value')],
+    [State('game-data-store', 'data'),
+     State('replay-field-store', 'data'),
+     State('viewport-store', 'data')]
+)
+def update_timeline_views(position, stored_data, rendered, viewport):
+    # Everything is read from the timeline's arrays. The feed is only resolved, once, by a worker without the
+    # game's timeline yet, dragging the slider doesn't touch the shared cache
+    timeline = timelineBall.get_timeline(stored_data['game_pk']) if stored_data else None
+    if stored_data and timeline is None and gameBall.resolve_game(stored_data) is not None:
+        timeline = timelineBall.get_timeline(stored_data['game_pk'])
+    if timeline is None or not position or position > timeline.length:
+        return figureBall.empty_figure(), figureBall.empty_figure(), figureBall.empty_figure(), '', None
+    row = position - 1
+    snapshot = timeline.snapshot(row)
+
+    # Zone: the at bat up to this pitch
+    zone_figure = figureBall.empty_figure()
+    draw_strike_zone(zone_figure, {'top': snapshot['sz_top'], 'bottom': snapshot['sz_bot']})
+    plate_x, plate_z, pitch_names, calls = timeline.at_bat_pitches(row)
+    points = [(pitch_name, x, z, [index + 1, call]) for index, (x, z, pitch_name, call) in enumerate(zip(plate_x, plate_z, pitch_names, calls))]
+    traces, _ = pitch_type_traces(points, 'markers', REPLAY_ZONE_HOVERTEMPLATE)
+    zone_figure['data'].extend(traces)
+    set_figure_layout(zone_figure, f"{snapshot['pitcher']} to {snapshot['batter']}", "Width (feet)", "Height (feet)", showlegend=True)
+
+    # Field: patch the overlays when the browser already has the ballpark, like update_plot
+    team = timeline.stadium_team
+    panel_width = viewport['width'] // 3 if viewport else None
+    panel_height = viewport['height'] // 2 if viewport else None
+    tolerance = stadiumBall.pick_tolerance(team, panel_width, panel_height)
+    if rendered == {'team': team, 'tolerance': tolerance}:
+        n_outline = len(stadiumBall.outline_traces(team, tolerance))
+        runner_trace, defender_trace = stadiumBall.overlay_traces(snapshot['runners'], snapshot['defenders'])
+        field_figure = Patch()
+        field_figure['data'][n_outline] = runner_trace
+        field_figure['data'][n_outline + 1] = defender_trace
+    else:
+        field_figure = stadiumBall.plot_stadium(team, runners=snapshot['runners'], defenders=snapshot['defenders'], title='',
+                                                panel_width=panel_width, panel_height=panel_height)
+
+    # Win probability up to this pitch
+    home_win_probs = timeline.win_probabilities(row)
+    wpa_figure = figureBall.empty_figure()
+    pitches = list(range(1, len(home_win_probs) + 1))
+    wpa_figure['data'] = [
+        figureBall.scatter_trace(pitches, home_win_probs, 'lines', timeline.home_team, line_dict=dict(color=team_colors.get(timeline.home_team, 'black'))),
+        figureBall.scatter_trace(pitches, [100 - prob for prob in home_win_probs], 'lines', timeline.away_team, line_dict=dict(color=team_colors.get(timeline.away_team, 'black')))
+    ]
+    wpa_figure['layout'].update(title=dict(text=f"Win Probability at Pitch {snapshot['number']}"), yaxis=figureBall.axis_title("Win Probability"),
+                                xaxis=dict(figureBall.axis_title("Pitch"), range=[1, timeline.length]), showlegend=True)
+
+    score = f"{timeline.away_team} {snapshot['away_score']} - {timeline.home_team} {snapshot['home_score']}" if snapshot['observed'] else 'score not recorded'
+    summary = (f"Pitch {snapshot['number']} | {'Top' if snapshot['top'] else 'Bottom'} {snapshot['inning']} | "
+               f"{snapshot['balls']}-{snapshot['strikes']}, {snapshot['outs']} out | {score} | "
+               f"{snapshot['pitcher']} to {snapshot['batter']}: {snapshot['pitch_name']} {snapshot['speed']:.1f} mph, {snapshot['call']}")
+    if not snapshot['observed']:
+        summary += " (field not recorded, the game was opened after this pitch)"
+    return zone_figure, field_figure, wpa_figure, summary, {'team': team, 'tolerance': tolerance}
 
 #############Speed/Spinrate Graph##################
 
-@app.callback(
-    Output('live-pitch-data-graph', 'figure'),
+@dash.callback(
+    [Output('live-pitch-data-graph', 'figure'),
+     Output('live-pitch-render-store', 'data')],
     [Input('fetch-button', 'n_clicks'),
-     Input('interval-component', 'n_intervals'),
+     Input('game-data-store', 'data'),
      Input('toggle-labels', 'value'),  # This takes the state of the checkbox
      Input('pitcher-dropdown', 'value')],  # Listen to 'pitcher-dropdown.value'
-    [State('gamepk-dropdown', 'value')]
+    [State('gamepk-dropdown', 'value'),
+     State('live-pitch-render-store', 'data')]
 )
-def update_graph_live(button_clicks, n_intervals, toggle_labels, pitcher_name, game_id):
+def update_graph_live(button_clicks, stored_data, toggle_labels, pitcher_name, game_id, rendered):
 
     if not game_id or not pitcher_name:
-        return go.Figure()
-
-    game_data = fetchBall.fetch_game_data(game_id)
-
-    if game_data:
-        pitching_events = dataBall.extract_pitching_events(game_data) 
-        pitch_data_df = pd.DataFrame(pitching_events)
-        filtered_data = pitch_data_df[pitch_data_df['pitcher_name'] == pitcher_name]
-    else:
-        filtered_data = pd.DataFrame()
-
-    fig = go.Figure()
-    if not filtered_data.empty:  # Check if the DataFrame is not empty
-        mode = 'markers+lines+text' if toggle_labels else 'markers+lines'  # Decide whether to include text based on toggle_labels
-        add_trace(fig, list(range(len(filtered_data))), filtered_data['start_speed'], mode, 'Pitch Speed', 
-          filtered_data.apply(lambda x: f"{x['pitch_name']}: {x['start_speed']} mph", axis=1))
-
-        add_trace(fig, list(range(len(filtered_data))), filtered_data['spin_rate'], mode, 'Spin Rate', 
-          filtered_data.apply(lambda x: f"{x['pitch_name']}: {x['spin_rate']} rpm", axis=1), 'y2')
-        
-        fig.update_layout(
-            yaxis=dict(title='Start Speed (mph)'),
-            yaxis2=dict(title='Spin Rate (rpm)', overlaying='y', side='right')
+        return figureBall.empty_figure(), None
+
+    # The game-data-store already holds the feed fetched for this tick
+    state = gameBall.game_state(stored_data)
+    filtered_data = gameBall.pitcher_pitches(state, pitcher_name) if state else []
+
+    mode = 'markers+lines+text' if toggle_labels else 'markers+lines'  # Decide whether to include text based on toggle_labels
+    key = [game_id, pitcher_name, mode]
+    drawn = rendered['count'] if rendered and rendered['key'] == key else None
+    if filtered_data and drawn and drawn <= len(filtered_data):
+        if drawn == len(filtered_data):
+            return dash.no_update, dash.no_update
+        # Same pitcher as the figure in the browser: append the new pitches to both lines
+        new_events = filtered_data[drawn:]
+        new_x = list(range(drawn, len(filtered_data)))
+        patched_figure = Patch()
+        patched_figure['data'][0]['x'].extend(new_x)
+        patched_figure['data'][0]['y'].extend([event['start_speed'] for event in new_events])
+        patched_figure['data'][0]['text'].extend([f"{event['pitch_name']}: {event['start_speed']} mph" for event in new_events])
+        patched_figure['data'][1]['x'].extend(new_x)
+        patched_figure['data'][1]['y'].extend([event['spin_rate'] for event in new_events])
+        patched_figure['data'][1]['text'].extend([f"{event['pitch_name']}: {event['spin_rate']} rpm" for event in new_events])
+        return patched_figure, {'key': key, 'count': len(filtered_data)}
+
+    fig = figureBall.empty_figure()
+    if filtered_data:  # Check if the pitcher has thrown any pitches
+        add_trace(fig, list(range(len(filtered_data))), [event['start_speed'] for event in filtered_data], mode, 'Pitch Speed',
+          [f"{event['pitch_name']}: {event['start_speed']} mph" for event in filtered_data])
+
+        add_trace(fig, list(range(len(filtered_data))), [event['spin_rate'] for event in filtered_data], mode, 'Spin Rate',
+          [f"{event['pitch_name']}: {event['spin_rate']} rpm" for event in filtered_data], 'y2')
+
+        fig['layout'].update(
+            yaxis=figureBall.axis_title('Start Speed (mph)'),
+            yaxis2=dict(figureBall.axis_title('Spin Rate (rpm)'), overlaying='y', side='right'),
+            transition={'duration': 500}
         )
-        fig.update_layout(transition={'duration': 500})
 
-    return fig
+    return fig, {'key': key, 'count': len(filtered_data)}
 
 
 #########Callback Functions################
 
 def add_trace(fig, x_data, y_data, mode, name, text_data=None, yaxis='y1', marker_dict=None, line_dict=None, hovertemplate=None):
-    trace = go.Scatter(
-        x=x_data,
-        y=y_data,
-        mode=mode,
-        name=name,
-        yaxis=yaxis
-    )
-    if text_data is not None:
-        trace['text'] = text_data
-        trace['textposition'] = 'top center'
-        trace['hoverinfo'] = 'text'
-        trace['hovertemplate'] = '%{text}<extra></extra>'
-    if marker_dict is not None:
-        trace['marker'] = marker_dict
-    if line_dict is not None:
-        trace['line'] = line_dict
-    if hovertemplate is not None:
-        trace['hovertemplate'] = hovertemplate
-    fig.add_trace(trace)
+    fig['data'].append(figureBall.scatter_trace(x_data, y_data, mode, name, text_data, yaxis, marker_dict, line_dict, hovertemplate))
+
+
+def pitch_type_traces(points, mode, hovertemplate):
+    """
+    Groups pitches into one marker trace per pitch type, colored from color_dict.
+
+    Args:
+        points (list of tuples): (pitch type, px, pz, customdata) per pitch, in the order thrown.
+        mode (str): Scatter mode of the traces.
+        hovertemplate (str): Hover template reading the per-point customdata.
+
+    Returns:
+        tuple: (list of trace dicts, list of the pitch type of each trace in order)
+    """
+    grouped = {}
+    for pitch_type, px, pz, customdata in points:
+        group = grouped.setdefault(pitch_type, ([], [], []))
+        group[0].append(px)
+        group[1].append(pz)
+        group[2].append(customdata)
+
+    traces = [figureBall.scatter_trace(
+        x_data, y_data, mode, pitch_type,
+        marker_dict=dict(color=color_dict.get(pitch_type, 'black'), size=15),  # Use black for unknown pitch types
+        hovertemplate=hovertemplate,
+        customdata=customdata
+    ) for pitch_type, (x_data, y_data, customdata) in grouped.items()]
+    return traces, list(grouped)
+
+
+def extend_pitch_type_traces(patched_figure, trace_names, points, mode, hovertemplate):
+    """
+    Adds new pitches to a figure built by pitch_type_traces through a Patch. Pitches of a type that
+    is already drawn extend its trace, new pitch types get a new trace at the end.
+
+    Args:
+        patched_figure (Patch): Patch of the figure in the browser.
+        trace_names (list of str): Pitch type of each trace in the browser's figure, in order.
+        points (list of tuples): New (pitch type, px, pz, customdata) per pitch.
+        mode (str): Scatter mode of new traces.
+        hovertemplate (str): Hover template of new traces.
+
+    Returns:
+        list of str: Pitch type of each trace after the patch is applied.
+    """
+    trace_names = list(trace_names)
+    traces, pitch_types = pitch_type_traces(points, mode, hovertemplate)
+    for trace, pitch_type in zip(traces, pitch_types):
+        if pitch_type in trace_names:
+            trace_index = trace_names.index(pitch_type)
+            patched_figure['data'][trace_index]['x'].extend(trace['x'])
+            patched_figure['data'][trace_index]['y'].extend(trace['y'])
+            patched_figure['data'][trace_index]['customdata'].extend(trace['customdata'])
+        else:
+            patched_figure['data'].append(trace)
+            trace_names.append(pitch_type)
+    return trace_names
+
+
+def strike_zone_shape(strike_zone_data):
+    """ Rectangle for the strike zone as a layout shape dict. """
+    return dict(type="rect",
+                x0=-0.7083, y0=strike_zone_data['bottom'],
+                x1=0.7083, y1=strike_zone_data['top'],
+                line=dict(color="RoyalBlue"))
+
 
-    
 def draw_strike_zone(fig, strike_zone_data):
     """ Add a rectangle for the strike zone to a figure. """
-    fig.add_shape(type="rect",
-                  x0=-0.7083, y0=strike_zone_data['bottom'],
-                  x1=0.7083, y1=strike_zone_data['top'],
-                  line=dict(color="RoyalBlue"))
+    fig['layout'].setdefault('shapes', []).append(strike_zone_shape(strike_zone_data))
 
 
-def set_figure_layout(fig, title, xaxis_title, yaxis_title):
+def set_figure_layout(fig, title, xaxis_title, yaxis_title, showlegend=False):
     """ Set layout properties for the figure. """
-    fig.update_layout(
-        title=title,
-        xaxis_title=xaxis_title,
-        yaxis_title=yaxis_title,
-        showlegend=False,
-        xaxis=dict(scaleanchor="y", scaleratio=1),
-        yaxis=dict(range=[0, 5], scaleratio=1),
-        xaxis_range=[-2.5, 2.5]
+    fig['layout'].update(
+        title=dict(text=title),
+        xaxis=dict(figureBall.axis_title(xaxis_title), scaleanchor="y", scaleratio=1, range=[-2.5, 2.5]),
+        yaxis=dict(figureBall.axis_title(yaxis_title), range=[0, 5], scaleratio=1),
+        showlegend=showlegend,
+        legend=dict(orientation="h", y=-0.2)
     )
 
 
 if __name__ == '__main__':
+    app = dash.Dash(__name__, external_stylesheets = external_stylesheets)
+    app.server.register_blueprint(pushBall.push_blueprint)
+    metricsBall.instrument_server(app.server)
+    memBall.instrument_server(app.server)
+    app.layout = layout
     app.run_server(debug=True)
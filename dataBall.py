@@ -1,22 +1,56 @@
-import pybaseball
+import logging
+import threading
 from unidecode import unidecode
-
-
-player_batting_stats = pybaseball.batting_stats(2024,qual=1)
-qualified_player_batting_stats = pybaseball.batting_stats(2024)
-player_pitching_stats = pybaseball.pitching_stats(2024,qual=1)
-qualified_player_pitching_stats = pybaseball.pitching_stats(2024)
-team_batting_stats = pybaseball.team_batting(2024)
-team_pitching_stats = pybaseball.team_pitching(2024)
+import cacheBall, fetchBall, metricsBall
+from fetchBall import SEASON_STATS_TTL
+
+def _season_loader(name):
+    """ pybaseball loader going through the shared cache, so worker processes don't each scrape the season stats. """
+    def load(*args, **kwargs):
+        return getattr(fetchBall.load_pybaseball(), name)(*args, **kwargs)
+    load.__name__ = load.__qualname__ = name
+    return cacheBall.cached(name, SEASON_STATS_TTL)(metricsBall.timed_load(name)(load))
+
+batting_stats = _season_loader('batting_stats')
+pitching_stats = _season_loader('pitching_stats')
+team_batting = _season_loader('team_batting')
+team_pitching = _season_loader('team_pitching')
+
+# Season stats the live dashboard compares players with. They're loaded on first use rather than on import,
+# so starting the app or a worker doesn't wait for the scrapes
+SEASON_STATS = {
+    'player_batting_stats': lambda: batting_stats(2024,qual=1),
+    'qualified_player_batting_stats': lambda: batting_stats(2024),
+    'player_pitching_stats': lambda: pitching_stats(2024,qual=1),
+    'qualified_player_pitching_stats': lambda: pitching_stats(2024),
+    'team_batting_stats': lambda: team_batting(2024),
+    'team_pitching_stats': lambda: team_pitching(2024)
+}
+_season_stats = {}
+_season_stats_lock = threading.Lock()
+
+def season_stats(name):
+    """ Returns one of the SEASON_STATS tables, loading it on first use. """
+    if name not in _season_stats:
+        with _season_stats_lock:
+            if name not in _season_stats:
+                _season_stats[name] = SEASON_STATS[name]()
+    return _season_stats[name]
+
+def __getattr__(name):
+    # Keeps dataBall.player_batting_stats and the other tables working as module attributes
+    if name in SEASON_STATS:
+        return season_stats(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def extract_team_player_stats(team_name):
     
     # Define the stats we care about
     stats_we_care_about = ['AVG', 'BABIP', 'BB', 'Balls', 'HR', 'OBP', 'OPS', 'PA', 'R', 'RBI', 'SLG', 'SO', 'WAR', 'wOBA', 'wRC+', 'ISO', 'K%', 'BB%']
     
-    stats = player_batting_stats
+    stats = season_stats('player_batting_stats')
     # Filter players by the specified team
-    team_players = player_batting_stats[player_batting_stats['Team'] == team_name]
+    team_players = stats[stats['Team'] == team_name]
     
     # Create a dictionary to hold each player's stats
     player_stats_dict = {}
@@ -47,22 +81,22 @@ def extract_stats(df, stats_we_care_about, team_name=None):
 # Extracts the pitching stats for a specific team
 def extract_league_pitching_team_stats(team_name=None):
     stats_we_care_about = ['AVG','BABIP','Balls','Strikes','BB','ER','ERA','FIP','WHIP','H','HR','WAR','xFIP']
-    return extract_stats(team_pitching_stats, stats_we_care_about, team_name)
+    return extract_stats(season_stats('team_pitching_stats'), stats_we_care_about, team_name)
 
 # Extracts the batting stats for a specific team
 def extract_league_batting_team_stats(team_name=None):
     stats_we_care_about = ['AVG', 'BABIP','BB','Balls','HR','OBP','OPS','PA','R','RBI','SLG','SO','WAR','wOBA']
-    return extract_stats(team_batting_stats, stats_we_care_about, team_name)
+    return extract_stats(season_stats('team_batting_stats'), stats_we_care_about, team_name)
 
 #Extracts the pitching stats for a specific player
 def extract_pitch_statline(pitcher_name):
     stats_we_care_about = ['K/9','H/9', 'BB%','BABIP', 'ERA', 'FIP', 'WHIP', 'SIERA', 'xFIP']
-    return extract_statline(pitcher_name, player_pitching_stats, team_pitching_stats, stats_we_care_about)
+    return extract_statline(pitcher_name, season_stats('player_pitching_stats'), season_stats('team_pitching_stats'), stats_we_care_about)
 
 #Extracts the batting stats for a specific player
 def extract_batter_statline(batter_name):
     stats_we_care_about = ['AVG', 'SLG', 'OBP', 'OPS', 'BABIP', 'ISO','BB%', 'K%', 'wOBA', 'wRC+']
-    return extract_statline(batter_name, player_batting_stats, team_batting_stats, stats_we_care_about)
+    return extract_statline(batter_name, season_stats('player_batting_stats'), season_stats('team_batting_stats'), stats_we_care_about)
 
 
 #Extracts the pitchers names for the drop down menu to select a pitcher
@@ -144,7 +178,8 @@ def extract_current_pitch_details(game_data):
                     pitch_info.update(pitch['pitchData'])
                     locations.append(extract_pitch_data(pitch_info))
     except KeyError:
-        print("No current at bat or incomplete data.")
+        logging.warning("No current at bat or incomplete data.")
+        metricsBall.DATA_ERRORS.inc(kind='incomplete_at_bat')
     return locations
 
 #Extracts the cumulative pitch details for the current game
@@ -155,7 +190,8 @@ def extract_pitch_details(pitches):
         if 'px' in pitch and 'pz' in pitch:
             pitch_details_list.append(extract_pitch_data(pitch))
         else:
-            print(f"Pitch without 'px' or 'pz': {pitch}")
+            logging.debug(f"Pitch without 'px' or 'pz': {pitch}")
+            metricsBall.DATA_ERRORS.inc(kind='pitch_without_location')
     return pitch_details_list
 
 
@@ -192,7 +228,8 @@ def extract_pitching_events(game_data):
         for pitcher_data in pitch_velocity_data.values():
             pitching_events.extend(extract_pitch_details(pitcher_data))
     except KeyError as e:
-        print(f"KeyError: {e}")
+        logging.error(f"Missing key {e} in the pitching events")
+        metricsBall.DATA_ERRORS.inc(kind='pitching_events')
     return pitching_events
 
 
@@ -208,7 +245,8 @@ def extract_statline(player_name, player_stats_df, team_stats_df, stats_we_care_
 
     # Check if the DataFrame is empty
     if player_stats.empty:
-        print(f"No stats found for {player_name}")
+        logging.warning(f"No stats found for {player_name}")
+        metricsBall.DATA_ERRORS.inc(kind='player_stats_missing')
         return {}, {}, {}
 
     # Get the stats we care about and store them in a dictionary
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import cacheBall, statcastBall
+
+# Pitch location density for the strike-zone graph. Locations are binned into a fixed grid over the plotted area
+# with NumPy and smoothed with a Gaussian kernel, so a heatmap costs the same to send and draw whether it
+# holds a dozen pitches or a season. Season grids come from the Statcast store: one scan per (player, season)
+# computes the grid of every filter at once and caches them together, so switching filters never rescans. The
+# current game's grid is cheap enough to bin on every refresh.
+
+X_RANGE = (-2.5, 2.5)  # The strike-zone graph's axis ranges in feet, see dashBall.set_figure_layout
+Z_RANGE = (0.0, 5.0)
+GRID_BINS = 50
+SMOOTHING_BINS = 1.5  # Standard deviation of the smoothing kernel in bins, 0 turns smoothing off
+DENSITY_TTL = 60 * 60
+
+CALL_GROUPS = ['Balls', 'Called Strikes', 'Whiffs', 'Fouls', 'In Play']
+PITCH_TYPES = ['4-Seam Fastball', 'Sinker', 'Cutter', 'Slider', 'Sweeper', 'Curveball', 'Knuckle Curve', 'Changeup', 'Splitter']
+
+# Dropdown options of the filters, an empty value means every pitch
+FILTER_OPTIONS = ([{'label': pitch_type, 'value': f'pitch:{pitch_type}'} for pitch_type in PITCH_TYPES] +
+                  [{'label': group, 'value': f'call:{group}'} for group in CALL_GROUPS])
+
+
+def call_group(call):
+    """ Groups a gf call_name ('Swinging Strike') or a Statcast description ('swinging_strike') into CALL_GROUPS. """
+    call = str(call).lower().replace('_', ' ')
+    if call.startswith('in play') or call.startswith('hit into play'):
+        return 'In Play'
+    if call.startswith('called strike'):
+        return 'Called Strikes'
+    if call.startswith('swinging strike') or call.startswith('foul tip') or call.startswith('missed bunt'):
+        return 'Whiffs'
+    if call.startswith('foul'):
+        return 'Fouls'
+    return 'Balls'
+
+
+def _kernel_matrix(bins, sigma):
+    """ Matrix applying a 1D Gaussian blur along one axis of the grid, rows normalized so no density leaks off the edges. """
+    offsets = np.arange(bins)[:, None] - np.arange(bins)[None, :]
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    return kernel / kernel.sum(axis=1, keepdims=True)
+
+
+def location_grid(plate_x, plate_z, bins=GRID_BINS, smoothing=SMOOTHING_BINS):
+    """
+    Bins pitch locations into a density grid.
+
+    Args:
+        plate_x (array-like): Horizontal locations in feet.
+        plate_z (array-like): Heights in feet.
+        bins (int): Bins along each axis.
+        smoothing (float): Standard deviation of the Gaussian smoothing in bins.
+
+    Returns:
+        dict: x and y (bin centers), z (share of the pitches per bin, rows by height as plotly's heatmap expects)
+        and count (located pitches, those off the plotted area included).
+    """
+    plate_x = np.asarray(plate_x, dtype=float)
+    plate_z = np.asarray(plate_z, dtype=float)
+    located = np.isfinite(plate_x) & np.isfinite(plate_z)
+    # The bins are uniform, so each pitch's bin is plain arithmetic and one bincount fills the grid. Same counts as
+    # np.histogram2d, which binary searches the edges, several times faster. Pitches off the plotted area are dropped.
+    x_index = np.floor((plate_x[located] - X_RANGE[0]) / (X_RANGE[1] - X_RANGE[0]) * bins).astype(np.int64)
+    z_index = np.floor((plate_z[located] - Z_RANGE[0]) / (Z_RANGE[1] - Z_RANGE[0]) * bins).astype(np.int64)
+    inside = (x_index >= 0) & (x_index < bins) & (z_index >= 0) & (z_index < bins)
+    counts = np.bincount(x_index[inside] * bins + z_index[inside], minlength=bins * bins).reshape(bins, bins).astype(float)
+    x_edges = np.linspace(X_RANGE[0], X_RANGE[1], bins + 1)
+    z_edges = np.linspace(Z_RANGE[0], Z_RANGE[1], bins + 1)
+    if smoothing:
+        kernel = _kernel_matrix(bins, smoothing)
+        counts = kernel @ counts @ kernel.T  # Separable blur along x then z, as two matrix products
+    total = counts.sum()
+    grid = counts.T / total if total else counts.T
+    return {
+        'x': np.round((x_edges[:-1] + x_edges[1:]) / 2, 3).tolist(),
+        'y': np.round((z_edges[:-1] + z_edges[1:]) / 2, 3).tolist(),
+        'z': np.round(grid, 5).tolist(),
+        'count': int(located.sum())
+    }
+
+
+def _matches(pitch_names, calls, pitch_filter):
+    """ Boolean mask of the pitches a filter keeps: None, 'pitch:<pitch name>' or 'call:<call group>'. """
+    if not pitch_filter:
+        return np.ones(len(pitch_names), dtype=bool)
+    kind, _, value = pitch_filter.partition(':')
+    if kind == 'pitch':
+        return np.asarray(pd.Series(pitch_names) == value, dtype=bool)
+    calls = pd.Series(calls)
+    groups = calls.map({call: call_group(call) for call in calls.dropna().unique()})  # Group each distinct call once
+    return np.asarray(groups == value, dtype=bool)
+
+
+def game_density(pitch_locations, pitch_filter=None):
+    """
+    Density grid of pitches from the gf feed.
+
+    Args:
+        pitch_locations (list of dicts): Pitch details from gameBall.pitcher_pitches.
+        pitch_filter (str): See _matches.
+
+    Returns:
+        dict: See location_grid.
+    """
+    pitch_names = [location['pitch_name'] for location in pitch_locations]
+    calls = [location['call'] for location in pitch_locations]
+    mask = _matches(pitch_names, calls, pitch_filter)
+    plate_x = np.array([location['px'] for location in pitch_locations], dtype=float)
+    plate_z = np.array([location['pz'] for location in pitch_locations], dtype=float)
+    return location_grid(plate_x[mask], plate_z[mask])
+
+
+@cacheBall.cached('density_grids', DENSITY_TTL)
+def season_densities(player_id, season, role='pitcher'):
+    """
+    Density grids of a player's pitches over a season in the Statcast store, for every filter.
+
+    Args:
+        player_id (int): MLBAM id.
+        season (int): Season year.
+        role (str): 'pitcher' for the pitches thrown, 'batter' for the pitches seen.
+
+    Returns:
+        dict: Filter ('' for every pitch, 'pitch:<pitch name>' or 'call:<call group>') -> grid, see location_grid.
+        Empty if the store has no pitches for the player.
+    """
+    df = statcastBall.query(['plate_x', 'plate_z', 'pitch_name', 'description'], start_date=f'{season}-01-01',
+                            end_date=f'{season}-12-31', **{role: player_id})
+    if df.empty:
+        return {}
+    plate_x, plate_z = df['plate_x'].to_numpy(dtype=float), df['plate_z'].to_numpy(dtype=float)
+    pitch_names, calls = df['pitch_name'].to_numpy(), df['description'].to_numpy()
+    filters = [''] + [f'pitch:{name}' for name in df['pitch_name'].dropna().unique()] + [f'call:{group}' for group in CALL_GROUPS]
+    grids = {}
+    for pitch_filter in filters:
+        mask = _matches(pitch_names, calls, pitch_filter)
+        grids[pitch_filter] = location_grid(plate_x[mask], plate_z[mask])
+    return grids
+
+
+def season_density(player_id, season, role='pitcher', pitch_filter=None):
+    """ One filter's grid out of season_densities, None if the player or the filter has no pitches. """
+    grid = season_densities(player_id, season, role).get(pitch_filter or '')
+    return grid if grid and grid['count'] else None
+
+
+def heatmap_trace(grid, name='Density'):
+    """ Heatmap trace dict of a location grid. """
+    return {
+        'type': 'heatmap',
+        'x': grid['x'],
+        'y': grid['y'],
+        'z': grid['z'],
+        'name': name,
+        'colorscale': 'Inferno',
+        'showscale': False,
+        'zsmooth': 'best',
+        'hovertemplate': 'x: %{x} ft<br>z: %{y} ft<br>Share: %{z:.2%}<extra></extra>'
+    }
@@ -1,9 +1,73 @@
 import json
+import logging
+import os
+import time
 import requests
 from requests import session
 import pandas as pd
-import pybaseball
-from pybaseball import get_splits,playerid_lookup
+import cacheBall, metricsBall
+
+# How long results stay in the shared cache. Game feeds expire just before the next poll so every
+# worker process polling the same game shares one upstream request per poll.
+GAME_FEED_TTL = 4
+SCHEDULE_TTL = 60
+SEASON_STATS_TTL = 6 * 60 * 60
+
+# Upstream hosts, overridable to point the dashboard at a stand-in feed (see loadBall)
+SAVANT_URL = os.environ.get('STRIKEZONE_SAVANT_URL', 'https://baseballsavant.mlb.com')
+STATSAPI_URL = os.environ.get('STRIKEZONE_STATSAPI_URL', 'http://statsapi.mlb.com')
+
+_pybaseball = None
+
+def load_pybaseball():
+    """
+    Imports pybaseball on first use and enables its cache, which every page shares and the scatter maker's
+    purge button clears. Importing it takes longer than the rest of the app, so it's left out of startup.
+    """
+    global _pybaseball
+    if _pybaseball is None:
+        import pybaseball
+        pybaseball.cache.enable()
+        _pybaseball = pybaseball
+    return _pybaseball
+
+FETCH_RETRIES = 2  # Extra attempts after a connection error or a 5xx response
+FETCH_TIMEOUT = 10
+
+_session = requests.Session()  # Reuses connections to Baseball Savant and the stats API between polls
+
+
+def fetch_url(url, endpoint, retries=FETCH_RETRIES):
+    """
+    GETs an upstream URL, retrying connection errors and server errors with a short backoff.
+    Records the time taken, the status, the bytes received and the retries in metricsBall.
+
+    Args:
+        url (str): URL to fetch.
+        endpoint (str): Name of the upstream endpoint for the metrics, e.g. 'gf'.
+        retries (int): Extra attempts.
+
+    Returns:
+        Response: The last response, or None if every attempt failed to connect.
+    """
+    start = time.perf_counter()
+    response = None
+    for attempt in range(retries + 1):
+        if attempt:
+            metricsBall.FETCH_RETRIES.inc(endpoint=endpoint)
+            time.sleep(0.5 * attempt)
+        try:
+            response = _session.get(url, timeout=FETCH_TIMEOUT)
+        except requests.RequestException as e:
+            logging.error(f"Request to {endpoint} failed: {e}")
+            response = None
+            continue
+        metricsBall.FETCH_BYTES.inc(len(response.content), endpoint=endpoint)
+        if response.status_code < 500:
+            break
+    status = response.status_code if response is not None else 'error'
+    metricsBall.FETCH_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+    return response
 
 
 
@@ -14,7 +78,8 @@ def fetch_current_play_data(game_data):
     if current_play:
         return current_play
     else:
-        print("No current play data found.")
+        logging.debug("No current play data found.")
+        metricsBall.DATA_ERRORS.inc(kind='no_current_play')
         return {}
     
 
@@ -35,12 +100,15 @@ def fetch_strike_zone_data(game_data):
     return {'top': 3.5, 'bottom': 1.5}
 
 
+@cacheBall.cached('combined_team_stats', SEASON_STATS_TTL)
+@metricsBall.timed_load('combined_team_stats')
 def fetch_combined_team_stats(year, end_year):
+    pybaseball = load_pybaseball()
     team_batting_stats = pybaseball.team_batting(year, end_year)
-    print(f"Number of columns in team_batting_stats: {len(team_batting_stats.columns)}")
+    logging.debug(f"Number of columns in team_batting_stats: {len(team_batting_stats.columns)}")
 
     team_pitching_stats = pybaseball.team_pitching(year, end_year)
-    print(f"Number of columns in team_pitching_stats: {len(team_pitching_stats.columns)}")
+    logging.debug(f"Number of columns in team_pitching_stats: {len(team_pitching_stats.columns)}")
 
     # Find overlapping columns (excluding 'Team' and 'Season')
     overlapping_columns = set(team_batting_stats.columns) & set(team_pitching_stats.columns)
@@ -52,9 +120,17 @@ def fetch_combined_team_stats(year, end_year):
     # Merge the two tables on 'Team' and 'Season'
     combined_stats = pd.merge(team_batting_stats, team_pitching_stats, on=['Team', 'Season'])
 
-    print(f"Number of columns in combined_stats: {len(combined_stats.columns)}")
+    logging.debug(f"Number of columns in combined_stats: {len(combined_stats.columns)}")
 
     return combined_stats
+@cacheBall.cached('team_pitching', SEASON_STATS_TTL)
+@metricsBall.timed_load('team_pitching')
+def fetch_team_pitching(year, end_year, qual='y'):
+    """Fetches team pitching stats for the specified year range."""
+    return load_pybaseball().team_pitching(year, end_year, qual=qual)
+
+@cacheBall.cached('stats', SEASON_STATS_TTL)
+@metricsBall.timed_load('stats')
 def fetch_stats(start_year, end_year=None, data_type='batting', ind=1,qual='y'):
     """
     Fetches baseball statistics for the specified year range and data type,
@@ -72,6 +148,7 @@ def fetch_stats(start_year, end_year=None, data_type='batting', ind=1,qual='y'):
     if end_year is None:
         end_year = start_year
 
+    pybaseball = load_pybaseball()
     if data_type == 'batting':
         player_batting_stats = pybaseball.batting_stats(start_year, end_year, ind=ind,qual=qual)
         return player_batting_stats
@@ -79,32 +156,31 @@ def fetch_stats(start_year, end_year=None, data_type='batting', ind=1,qual='y'):
         player_pitching_stats = pybaseball.pitching_stats(start_year, end_year, ind=ind,qual=qual)
         return player_pitching_stats
 
+@cacheBall.cached('game_feed', GAME_FEED_TTL)
 def fetch_game_data(game_pk):
-    """Fetches game data from Baseball Savant and exports pitcher data to JSON."""
-    url = f"https://baseballsavant.mlb.com/gf?game_pk={game_pk}"
-    session = requests.Session()  # Create a new session object
-    response = session.get(url)
+    """Fetches game data from Baseball Savant."""
+    url = f"{SAVANT_URL}/gf?game_pk={game_pk}"
+    response = fetch_url(url, 'gf')
+    if response is None:
+        return None
     if response.status_code == 200:
         try:
-            game_data = response.json()
-            # Export pitcher data to a JSON file for review
-            pitcher_data = {
-                'home_pitchers': game_data.get('home_pitchers', {}),
-                'away_pitchers': game_data.get('away_pitchers', {})
-            }
-            with open('pitcher_data.json', 'w') as outfile:
-                json.dump(pitcher_data, outfile, indent=4)
-            return game_data
+            return response.json()
         except ValueError:
-            print("Error parsing JSON")
+            logging.error(f"Error parsing the gf feed of game {game_pk}")
             return None
     else:
-        print("Failed to fetch data:", response.status_code)
+        logging.error(f"Failed to fetch game {game_pk}: {response.status_code}")
         return None
     
-def get_game_pks_and_teams():
-    url = 'http://statsapi.mlb.com/api/v1/schedule/games/?sportId=1'
-    response = requests.get(url)
+@cacheBall.cached('schedule', SCHEDULE_TTL)
+def _fetch_schedule():
+    # None on failure, which isn't cached, so the next call retries instead of showing no games for SCHEDULE_TTL
+    url = f'{STATSAPI_URL}/api/v1/schedule/games/?sportId=1'
+    response = fetch_url(url, 'schedule')
+    if response is None or response.status_code != 200:
+        logging.error(f"Failed to fetch the schedule: {response.status_code if response is not None else 'no response'}")
+        return None
     data = json.loads(response.text)
 
     game_info = []
@@ -118,20 +194,27 @@ def get_game_pks_and_teams():
     return game_info
 
 
+def get_game_pks_and_teams():
+    """Today's games as (game_pk, away team, home team), empty if the schedule couldn't be fetched."""
+    return _fetch_schedule() or []
+
+
 
 def get_bbref_id(first_name, last_name):
     """Fetches the bbref ID for a player using their first and last name."""
     try:
-        player_ids = playerid_lookup(last_name, first_name)
+        player_ids = load_pybaseball().playerid_lookup(last_name, first_name)
         bbref_id = player_ids.loc[player_ids['key_bbref'].notna(), 'key_bbref'].values[0]
         return bbref_id
     except Exception as e:
-        print(f"Failed to fetch bbref ID: {e}")
+        logging.error(f"Failed to fetch bbref ID: {e}")
+        metricsBall.DATA_ERRORS.inc(kind='bbref_lookup')
         return None
 
 def fetch_splits(player_id, year=None, player_info=False, pitching_splits=False):
     """Fetches split stats for a player using the get_splits function from pybaseball."""
     try:
+        get_splits = load_pybaseball().get_splits
         if player_info:
             split_stats, player_info_dict = get_splits(player_id, year, player_info, pitching_splits)
             return split_stats, player_info_dict
@@ -139,7 +222,8 @@ def fetch_splits(player_id, year=None, player_info=False, pitching_splits=False)
             split_stats = get_splits(player_id, year, player_info, pitching_splits)
             return split_stats
     except Exception as e:
-        print(f"Failed to fetch split stats: {e}")
+        logging.error(f"Failed to fetch split stats: {e}")
+        metricsBall.DATA_ERRORS.inc(kind='splits')
         return None
 
 def fetch_player_splits(full_name, year=None, player_info=False, pitching_splits=False):
@@ -149,6 +233,7 @@ def fetch_player_splits(full_name, year=None, player_info=False, pitching_splits
     if player_id is not None:
         return fetch_splits(player_id, year, player_info, pitching_splits)
     else:
-        print(f"Failed to fetch split stats for {full_name}")
+        logging.error(f"Failed to fetch split stats for {full_name}")
+        metricsBall.DATA_ERRORS.inc(kind='splits')
         return None
 
@@ -0,0 +1,70 @@
+from functools import lru_cache
+import plotly.io as pio
+
+# Figures for the live dashboard are built as plain dicts in the shape plotly.js expects. This skips
+# plotly's property validation, which runs on every assignment to a go.Figure. validate_figure puts a
+# figure through that validation on demand, e.g. from the benchmarks, without paying for it per tick.
+
+try:
+    import orjson  # noqa: F401
+    pio.json.config.default_engine = 'orjson'  # Dash serializes callback outputs through plotly.io.json
+except ImportError:
+    pass
+
+TEMPLATE = 'plotly_dark'  # Looked up on the first figure, setting pio.templates.default validates it at import
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    return pio.templates[name].to_plotly_json()
+
+def shared_template():
+    """ The dashboard's plotly template as a dict, converted once and shared by every figure. """
+    return _template(TEMPLATE)
+
+def empty_figure():
+    """ Figure dict without traces, equivalent to go.Figure(). """
+    return {'data': [], 'layout': {'template': shared_template()}}
+
+def scatter_trace(x_data, y_data, mode, name=None, text_data=None, yaxis='y1', marker_dict=None, line_dict=None, hovertemplate=None, customdata=None):
+    """ Scatter trace dict with the same properties dashBall.add_trace used to set on a go.Scatter. """
+    trace = {
+        'type': 'scatter',
+        'x': list(x_data),
+        'y': list(y_data),
+        'mode': mode,
+        'yaxis': 'y' if yaxis == 'y1' else yaxis
+    }
+    if name is not None:
+        trace['name'] = name
+    if text_data is not None:
+        trace['text'] = list(text_data)
+        trace['textposition'] = 'top center'
+        trace['hoverinfo'] = 'text'
+        trace['hovertemplate'] = '%{text}<extra></extra>'
+    if marker_dict is not None:
+        trace['marker'] = marker_dict
+    if line_dict is not None:
+        trace['line'] = line_dict
+    if hovertemplate is not None:
+        trace['hovertemplate'] = hovertemplate
+    if customdata is not None:
+        trace['customdata'] = customdata
+    return trace
+
+def axis_title(text):
+    return {'title': {'text': text}}
+
+def validate_figure(figure):
+    """
+    Checks a figure dict against plotly's schema.
+
+    Args:
+        figure (dict): Figure built by this module.
+
+    Returns:
+        dict: The figure as plotly would have built it. Raises ValueError on invalid properties.
+    """
+    import plotly.graph_objects as go
+
+    return go.Figure(figure).to_plotly_json()
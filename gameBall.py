@@ -0,0 +1,192 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import cacheBall, dataBall, fetchBall, runnerBall, timelineBall
+
+# The raw feeds stay on the server. GAME_REGISTRY holds the latest feed of every game keyed by game_pk and the
+# browser's game-data-store only holds {'game_pk', 'version'}, which callbacks resolve through game_state.
+# Published feeds are also written to the shared cache so other worker processes can resolve the same token.
+# Every new feed version is folded into the game's pitch by pitch timeline (see timelineBall).
+GAME_REGISTRY_TTL = 6 * 60 * 60
+GAME_REGISTRY = OrderedDict()
+GAME_REGISTRY_SIZE = 32
+_registry_lock = threading.Lock()
+
+# Derived views of a game feed, computed once per feed version and shared by every callback
+GAME_STATE_CACHE = OrderedDict()
+GAME_STATE_CACHE_SIZE = 16
+_game_state_lock = threading.Lock()
+
+
+def feed_version(game_data):
+    """
+    Content hash of the parts of a game feed the dashboard shows: the teams, the pitch logs, the linescore,
+    the current play, the WPA series and the game status. Used as the key of the derived state and to detect unchanged polls.
+    """
+    scoreboard = game_data.get('scoreboard', {})
+    meaningful = {
+        'teams': [game_data.get('home_team_data'), game_data.get('away_team_data')],
+        'home_pitchers': game_data.get('home_pitchers'),
+        'away_pitchers': game_data.get('away_pitchers'),
+        'linescore': scoreboard.get('linescore'),
+        'current_play': scoreboard.get('currentPlay'),
+        'wpa': scoreboard.get('stats', {}).get('wpa'),
+        'status': game_data.get('game_status_code', game_data.get('game_status'))
+    }
+    return hashlib.sha1(json.dumps(meaningful, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def build_game_state(game_data):
+    """
+    Walks a raw gf feed once and extracts every view the dashboard callbacks read.
+
+    Args:
+        game_data (dict): Game data from fetchBall.fetch_game_data.
+
+    Returns:
+        dict: current_play, batter_name, pitcher_name, runners, defenders, home_win_probs, away_win_probs,
+        home_team, away_team, stadium_team, previous_result, pitcher_names, pitch_log (every pitch of the game),
+        pitches_by_pitcher (pitches keyed by lower cased pitcher name), pitcher_ids (MLBAM ids keyed the same way),
+        events (newest pitch first) and strike_zone_data.
+    """
+    current_play = fetchBall.fetch_current_play_data(game_data)
+    matchup = current_play.get('matchup', {})
+    home_win_probs, away_win_probs, home_team, away_team = dataBall.extract_win_probabilities(game_data)
+
+    pitches_by_pitcher = {}
+    pitcher_ids = {}
+    for key in ['home_pitchers', 'away_pitchers']:
+        for pitcher_id, pitches in game_data.get(key, {}).items():
+            pitcher_name = pitches[0]['pitcher_name'].lower().strip()
+            pitches_by_pitcher.setdefault(pitcher_name, []).extend(dataBall.extract_pitch_details(pitches))
+            pitcher_ids[pitcher_name] = int(pitcher_id)
+
+    linescore = game_data.get('scoreboard', {}).get('linescore')
+    return {
+        'current_play': current_play,
+        'batter_name': matchup.get('batter', {}).get('fullName', 'Unknown'),
+        'pitcher_name': matchup.get('pitcher', {}).get('fullName', 'Unknown'),
+        'runners': runnerBall.get_base_runners(game_data) if linescore is not None else [],
+        'defenders': runnerBall.get_defenders(game_data) if linescore is not None else [],
+        'home_win_probs': home_win_probs,
+        'away_win_probs': away_win_probs,
+        'home_team': home_team,
+        'away_team': away_team,
+        'stadium_team': game_data.get('home_team_data', {}).get('teamName', '').lower(),
+        'previous_result': dataBall.extract_current_result(game_data),
+        'pitcher_names': dataBall.extract_pitcher_names(game_data),
+        'pitch_log': dataBall.extract_pitching_events(game_data),
+        'pitches_by_pitcher': pitches_by_pitcher,
+        'pitcher_ids': pitcher_ids,
+        'events': sorted(dataBall.extract_all_game_pitching_events(game_data), key=lambda x: x['Pitch #'], reverse=True),
+        'strike_zone_data': fetchBall.fetch_strike_zone_data(game_data)
+    }
+
+
+def publish_game(game_pk, game_data):
+    """
+    Stores the latest feed of a game in the registry.
+
+    Args:
+        game_pk (int): Game identifier.
+        game_data (dict): Game data from fetchBall.fetch_game_data.
+
+    Returns:
+        str: Version of the feed, see feed_version.
+    """
+    version = feed_version(game_data)
+    entry = {'version': version, 'game_data': game_data}
+    _register(game_pk, entry)
+    cached_entry = cacheBall.get_cache().get(f'game_registry:{game_pk}')
+    if cached_entry is None or cached_entry['version'] != version:
+        cacheBall.get_cache().set(f'game_registry:{game_pk}', entry, GAME_REGISTRY_TTL)
+    return version
+
+
+def _register(game_pk, entry):
+    with _registry_lock:
+        previous = GAME_REGISTRY.get(game_pk)
+        GAME_REGISTRY[game_pk] = entry
+        GAME_REGISTRY.move_to_end(game_pk)
+        if len(GAME_REGISTRY) > GAME_REGISTRY_SIZE:
+            GAME_REGISTRY.popitem(last=False)
+    if previous is None or previous['version'] != entry['version']:
+        timelineBall.record_feed(game_pk, entry['game_data'])
+
+
+def sync_game(game_pk):
+    """
+    Registers the latest feed any process published for a game, when it differs from the one this process holds.
+
+    Returns:
+        str: Version of the game's latest feed, None if no process has published one.
+    """
+    cached_entry = cacheBall.get_cache().get(f'game_registry:{game_pk}')
+    entry = GAME_REGISTRY.get(game_pk)
+    if cached_entry is not None and (entry is None or entry['version'] != cached_entry['version']):
+        _register(game_pk, cached_entry)
+        entry = cached_entry
+    return entry['version'] if entry else None
+
+
+def resolve_game(stored_data):
+    """
+    Looks up the feed a game-data-store token points at. A version this process hasn't seen is looked up in
+    the shared cache, a game missing from both, e.g. after a server restart, is fetched again.
+
+    Args:
+        stored_data (dict): Contents of the game-data-store, {'game_pk', 'version'}.
+
+    Returns:
+        dict: {'version', 'game_data'} of the game's latest feed, or None.
+    """
+    if not stored_data or stored_data.get('game_pk') is None:
+        return None
+    game_pk = stored_data['game_pk']
+    entry = GAME_REGISTRY.get(game_pk)
+    if entry is None or entry['version'] != stored_data.get('version'):
+        cached_entry = cacheBall.get_cache().get(f'game_registry:{game_pk}')
+        if cached_entry is not None and (entry is None or cached_entry['version'] == stored_data.get('version')):
+            _register(game_pk, cached_entry)
+            entry = cached_entry
+    if entry is None:
+        game_data = fetchBall.fetch_game_data(game_pk)
+        if not game_data:
+            return None
+        publish_game(game_pk, game_data)
+        entry = GAME_REGISTRY.get(game_pk)
+    return entry
+
+
+def game_state(stored_data):
+    """
+    Returns the derived state of the game in the game-data-store, building it only on the first call per version.
+
+    Args:
+        stored_data (dict): Contents of the game-data-store, {'game_pk', 'version'}.
+
+    Returns:
+        dict: See build_game_state. None if there is no feed for the game.
+    """
+    entry = resolve_game(stored_data)
+    if entry is None:
+        return None
+    version = entry['version']
+    with _game_state_lock:
+        state = GAME_STATE_CACHE.get(version)
+        if state is not None:
+            GAME_STATE_CACHE.move_to_end(version)
+            return state
+
+    state = build_game_state(entry['game_data'])  # Outside the lock, concurrent builds of one version are rare and identical
+    with _game_state_lock:
+        GAME_STATE_CACHE[version] = state
+        if len(GAME_STATE_CACHE) > GAME_STATE_CACHE_SIZE:
+            GAME_STATE_CACHE.popitem(last=False)
+    return state
+
+
+def pitcher_pitches(state, pitcher_name):
+    """ Pitch details of one pitcher, matched like dataBall.get_pitcher_data. """
+    return state['pitches_by_pitcher'].get(pitcher_name.lower().strip(), [])
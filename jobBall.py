@@ -0,0 +1,163 @@
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+import time
+import pandas as pd
+import cacheBall
+
+# Slow pybaseball loads run as jobs on a process pool so they never hold up a server thread. A job is a list
+# of chunks, e.g. one per season, and its progress is the share of finished chunks. Identical jobs in flight are
+# shared between requests and a job nobody waits for any more has its pending chunks cancelled.
+#
+# A job runs in the worker process that submitted it, but its status and result are mirrored into the shared cache
+# (see cacheBall) as its chunks finish. Any worker can then report on it, join it instead of starting the same load
+# again, and hand out its result. Cancelling only reaches jobs of the same process, a job another worker runs is
+# left to finish, since other requests may be waiting for it there.
+
+JOB_WORKERS = int(os.environ.get('STRIKEZONE_JOB_WORKERS', 2))
+POLL_INTERVAL_MS = 500  # How often the browser asks for the progress of a running job
+JOB_RESULT_TTL = 10 * 60  # Finished jobs are kept this long so repeated requests don't load again
+RUNNING_STATUS_TTL = 5 * 60  # The shared status of a running job is refreshed by every finished chunk, a job whose worker died expires
+
+_executor = None
+_jobs = {}  # job_id -> Job
+_jobs_lock = threading.Lock()
+
+
+class Job:
+    """ Futures of the chunks of one load and the combined result once they have all finished. """
+
+    def __init__(self, job_id, futures):
+        self.id = job_id
+        self.futures = futures
+        self.waiters = 1
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.cancelled = False  # Dropped by cancel, its chunks still running finish unseen
+        self.lock = threading.Lock()
+        for future in futures:
+            future.add_done_callback(self._chunk_done)
+
+    def _chunk_done(self, future):
+        with self.lock:
+            if self.finished_at is not None:
+                return
+            if all(f.done() for f in self.futures):
+                try:
+                    results = [f.result() for f in self.futures]
+                    self.result = results[0] if len(results) == 1 else pd.concat(results, ignore_index=True)
+                except concurrent.futures.CancelledError:
+                    self.error = 'cancelled'
+                except Exception as e:
+                    logging.error(f"Job {self.id} failed: {e}")
+                    self.error = str(e)
+                self.finished_at = time.monotonic()
+            if not self.cancelled:
+                _publish(self)  # Progress or the outcome for the other workers, under the lock so an older progress can't overwrite it
+
+    def status(self):
+        done = sum(f.done() for f in self.futures)
+        if self.finished_at is None:
+            state = 'running'
+        else:
+            state = 'error' if self.error else 'done'
+        return {'status': state, 'progress': done / len(self.futures), 'error': self.error}
+
+
+def _publish(job):
+    """ Mirrors a job's status, and its result once done, into the shared cache. """
+    cache = cacheBall.get_cache()
+    status = job.status()
+    if status['status'] == 'done':
+        cache.set(f'job_result:{job.id}', job.result, JOB_RESULT_TTL)  # Before the status, done means the result is there
+    cache.set(f'job_status:{job.id}', status, RUNNING_STATUS_TTL if status['status'] == 'running' else JOB_RESULT_TTL)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ProcessPoolExecutor(max_workers=JOB_WORKERS)
+    return _executor
+
+
+def job_key(chunks):
+    """ Identifier of a job, equal for jobs with the same chunks. """
+    described = [(func.__module__, func.__qualname__, args, sorted(kwargs.items())) for func, args, kwargs in chunks]
+    return hashlib.sha1(repr(described).encode()).hexdigest()
+
+
+def _prune():
+    now = time.monotonic()
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at is not None and now - job.finished_at > JOB_RESULT_TTL:
+            del _jobs[job_id]
+
+
+def submit(chunks, replaces=None):
+    """
+    Starts a job, or joins the identical job if one is already running or recently finished.
+
+    Args:
+        chunks (list of tuple): (function, args, kwargs) to run in the process pool. The functions must be
+            importable module-level functions and return DataFrames, which are concatenated in order.
+        replaces (str): Optional id of the job this request waited for before, it is cancelled unless it's the same job.
+
+    Returns:
+        str: Job id for job_status, job_result and cancel.
+    """
+    job_id = job_key(chunks)
+    if replaces == job_id and job_id in _jobs:
+        return job_id
+    with _jobs_lock:
+        _prune()
+        job = _jobs.get(job_id)
+        if job is not None and job.error is None:
+            job.waiters += 1
+        elif job is None and (cacheBall.get_cache().get(f'job_status:{job_id}') or {}).get('status') in ('running', 'done'):
+            pass  # Running or finished in another worker
+        else:
+            futures = [_get_executor().submit(func, *args, **kwargs) for func, args, kwargs in chunks]
+            job = _jobs[job_id] = Job(job_id, futures)
+            with job.lock:
+                if job.finished_at is None:
+                    _publish(job)
+    if replaces is not None:
+        cancel(replaces)
+    return job_id
+
+
+def job_status(job_id):
+    """
+    Returns:
+        dict: {'status': 'running' | 'done' | 'error', 'progress': share of finished chunks, 'error'},
+        or None for an unknown job. Jobs of other workers are looked up in the shared cache.
+    """
+    job = _jobs.get(job_id)
+    return job.status() if job is not None else cacheBall.get_cache().get(f'job_status:{job_id}')
+
+
+def job_result(job_id):
+    """ Combined DataFrame of a finished job, or None. """
+    job = _jobs.get(job_id)
+    return job.result if job is not None else cacheBall.get_cache().get(f'job_result:{job_id}')
+
+
+def cancel(job_id):
+    """ Stops waiting for a job. Once nobody waits for it, its chunks that haven't started are cancelled. """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return
+        job.waiters -= 1
+        if job.waiters <= 0:
+            for future in job.futures:
+                future.cancel()
+            del _jobs[job_id]
+            with job.lock:
+                # A chunk already running can't be cancelled, without this its 'running' status would make the
+                # next identical request wait for a job nobody finishes
+                job.cancelled = True
+                cacheBall.get_cache().delete(f'job_status:{job_id}')
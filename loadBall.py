@@ -0,0 +1,353 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import requests
+
+# Load tester for the live dashboard. Simulated browser sessions replay the callback requests Dash's renderer
+# sends (page load, interval ticks, pitcher and game changes) against a running app whose upstream is a local
+# stand-in feed, and the concurrency ramps up level by level. Every level reports throughput, callback latency
+# percentiles, error rate, how long a refresh takes against the tick and the server's CPU and RSS:
+#
+#   python loadBall.py run --spawn --levels 1 5 10 25 50 --output capacity.json
+#
+# --spawn starts the stand-in feed (serve-feed) and the app on it (serve-app), both offline with the benchmark
+# fixtures. Without it, point --url at an app started with STRIKEZONE_SAVANT_URL/STRIKEZONE_STATSAPI_URL set to a feed.
+
+GAME_PKS = [900001, 900002, 900003]
+
+############### STAND-IN FEED ###############
+
+def create_feed_app(step_seconds=2.0):
+    """
+    Flask app standing in for Baseball Savant's gf endpoint and the stats API schedule. Every game gains a
+    pitch every step_seconds, so polls see new feed versions the way they would during a live game.
+    """
+    from flask import Flask, jsonify, request
+    import benchBall
+
+    feed = Flask(__name__)
+    start = time.monotonic()
+    games = {}
+
+    def game(game_pk, n_pitches):
+        key = (game_pk, n_pitches)
+        if key not in games:
+            games[key] = benchBall.synthesize_game(n_pitches, min(9, 1 + n_pitches // 33), seed=game_pk)
+        return games[key]
+
+    @feed.route('/gf')
+    def gf():
+        game_pk = int(request.args['game_pk'])
+        n_pitches = min(300, 20 + int((time.monotonic() - start) / step_seconds))
+        return jsonify(game(game_pk, n_pitches))
+
+    @feed.route('/api/v1/schedule/games/')
+    def schedule():
+        teams = lambda game_pk: {'away': {'team': {'name': 'Boston Red Sox'}}, 'home': {'team': {'name': f'New York Yankees {game_pk}'}}}
+        return jsonify({'dates': [{'games': [{'gamePk': game_pk, 'teams': teams(game_pk)} for game_pk in GAME_PKS]}]})
+
+    return feed
+
+
+def serve_app(feed_url, port, workers=None, threads=None):
+    """ Serves appBall on the stand-in feed with the benchmark season stat fixtures, fully offline. """
+    os.environ['STRIKEZONE_SAVANT_URL'] = feed_url
+    os.environ['STRIKEZONE_STATSAPI_URL'] = feed_url
+    import benchBall
+    benchBall.install_season_fixtures()
+    os.environ['STRIKEZONE_CACHE'] = 'disk' if (workers or 1) > 1 else 'memory'
+    import serveBall
+    serveBall.serve(serveBall.server, '127.0.0.1', port, workers or 1, threads)
+
+
+############### SESSIONS ###############
+
+def callbacks_from_dependencies(dependencies):
+    """
+    The server side callbacks of a running app, from its /_dash-dependencies.
+
+    Args:
+        dependencies (list of dicts): The app's callback dependencies, as the renderer receives them.
+
+    Returns:
+        list of tuples: (output key, outputs, inputs, states), each of the last three a list of (id, property). Clientside
+        callbacks run in the browser and are left out, like callbacks with pattern matching ids.
+    """
+    callbacks = []
+    for dependency in dependencies:
+        if dependency.get('clientside_function') or dependency.get('no_output'):
+            continue
+        key = dependency['output']
+        outputs = [tuple(output.rsplit('.', 1)) for output in (key.strip('.').split('...') if key.startswith('..') else [key])]
+        inputs = [(item['id'], item['property']) for item in dependency['inputs']]
+        states = [(item['id'], item['property']) for item in dependency['state']]
+        if any(not isinstance(component_id, str) or component_id.startswith('{') for component_id, _ in outputs + inputs + states):
+            continue
+        callbacks.append((key, outputs, inputs, states))
+    return callbacks
+
+
+def callback_body(key, outputs, inputs, states, props, changed):
+    return {
+        'output': key,
+        'outputs': [{'id': i, 'property': p} for i, p in outputs] if len(outputs) > 1 else {'id': outputs[0][0], 'property': outputs[0][1]},
+        'inputs': [{'id': i, 'property': p, 'value': props.get((i, p))} for i, p in inputs],
+        'state': [{'id': i, 'property': p, 'value': props.get((i, p))} for i, p in states],
+        'changedPropIds': [f'{i}.{p}' for i, p in changed]
+    }
+
+
+class Session:
+    """ One simulated browser: keeps the component values it has seen and fires the callbacks they trigger. """
+
+    def __init__(self, base_url, recorder, tick_seconds, rng):
+        self.base_url = base_url.rstrip('/')
+        self.http = requests.Session()
+        self.recorder = recorder
+        self.tick_seconds = tick_seconds
+        self.rng = rng
+        self.callbacks = []  # From the app's dependencies on page load
+        self.props = {('viewport-store', 'data'): {'width': 1920, 'height': 1080}, ('toggle-labels', 'value'): [],
+                      ('season-overlay-toggle', 'value'): [], ('strike-zone-mode', 'value'): 'pitches', ('strike-zone-filter', 'value'): None,
+                      ('timeline-slider', 'max'): 1,
+                      ('fetch-button', 'n_clicks'): 0, ('interval-component', 'n_intervals'): 0}
+
+    def request(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=60, **kwargs)
+            ok = response.status_code < 400 or response.status_code == 204
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(name, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def fire(self, changed):
+        """ Fires every callback with a changed input, then the ones triggered by their outputs, like the renderer does. """
+        while changed:
+            next_changed = []
+            for key, outputs, inputs, states in self.callbacks:
+                triggered = [prop for prop in inputs if prop in changed]
+                if not triggered:
+                    continue
+                # Latencies are reported per callback, named after its first output component
+                response = self.request(outputs[0][0], 'POST', '/_dash-update-component',
+                                        json=callback_body(key, outputs, inputs, states, self.props, triggered))
+                if response is None or response.status_code == 204:
+                    continue
+                for component_id, values in response.json().get('response', {}).items():
+                    for prop, value in values.items():
+                        if isinstance(value, dict) and value.get('__dash_patch_update'):
+                            continue  # Only stores and dropdowns drive later requests, figure patches don't matter here
+                        if self.props.get((component_id, prop)) != value:
+                            self.props[(component_id, prop)] = value
+                            next_changed.append((component_id, prop))
+            changed = next_changed
+
+    def load_page(self):
+        self.request('page', 'GET', '/')
+        self.request('layout', 'GET', '/_dash-layout')
+        response = self.request('dependencies', 'GET', '/_dash-dependencies')
+        self.callbacks = callbacks_from_dependencies(response.json()) if response is not None else []
+        self.props[('page-load', 'n_intervals')] = 1
+        self.fire([('page-load', 'n_intervals')])
+
+    def tick(self):
+        self.props[('interval-component', 'n_intervals')] += 1
+        self.fire([('interval-component', 'n_intervals')])
+        # Now and then a viewer picks another pitcher or game
+        roll = self.rng.random()
+        options = self.props.get(('pitcher-dropdown', 'options')) or []
+        if roll < 0.2 and options:
+            self.props[('pitcher-dropdown', 'value')] = self.rng.choice(options)['value']
+            self.fire([('pitcher-dropdown', 'value')])
+        elif roll < 0.25:
+            self.props[('gamepk-dropdown', 'value')] = self.rng.choice(GAME_PKS)
+            self.fire([('gamepk-dropdown', 'value')])
+
+    def run(self, deadline):
+        self.load_page()
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            self.tick()
+            elapsed = time.monotonic() - start
+            self.recorder.record_tick(elapsed)
+            time.sleep(max(0.0, self.tick_seconds - elapsed))
+
+
+class Recorder:
+    """ Collects request latencies and errors of one concurrency level. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = 0
+        self.ticks = []
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors += 1
+
+    def record_tick(self, seconds):
+        with self.lock:
+            self.ticks.append(seconds)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+############### SERVER RESOURCES ###############
+
+class ResourceSampler(threading.Thread):
+    """ Samples the CPU and RSS of the server process and its workers while a level runs. """
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.cpu = []
+        self.rss = []
+        self.stopped = threading.Event()
+        try:
+            import psutil
+            self.process = psutil.Process(pid) if pid else None
+        except ImportError:
+            self.process = None
+
+    def processes(self):
+        return [self.process] + self.process.children(recursive=True)
+
+    def run(self):
+        if self.process is None:
+            return
+        for process in self.processes():
+            process.cpu_percent(None)
+        while not self.stopped.wait(self.interval):
+            try:
+                processes = self.processes()
+                self.cpu.append(sum(process.cpu_percent(None) for process in processes))
+                self.rss.append(sum(process.memory_info().rss for process in processes))
+            except Exception:
+                pass
+
+    def summary(self):
+        self.stopped.set()
+        if not self.cpu:
+            return {'cpu_percent': None, 'rss_mb': None}
+        return {'cpu_percent': round(statistics.mean(self.cpu), 1), 'rss_mb': round(max(self.rss) / 2**20, 1)}
+
+
+def run_level(url, sessions, duration, tick_seconds, server_pid=None, seed=0):
+    """
+    Runs sessions concurrent browsers for duration seconds.
+
+    Returns:
+        dict: The level's point of the capacity curve.
+    """
+    recorder = Recorder()
+    sampler = ResourceSampler(server_pid)
+    sampler.start()
+    start = time.monotonic()
+    deadline = start + duration
+    threads = [threading.Thread(target=Session(url, recorder, tick_seconds, random.Random(seed + i)).run, args=(deadline,), daemon=True)
+               for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+        time.sleep(min(0.05, tick_seconds / max(sessions, 1)))  # Spread the page loads like viewers arriving
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    callbacks = [seconds for name, values in recorder.latencies.items() if name not in ('page', 'layout', 'dependencies') for seconds in values]
+    total = sum(len(values) for values in recorder.latencies.values())
+    point = {
+        'sessions': sessions,
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2),
+        'p50_ms': round(percentile(callbacks, 50) * 1000, 2) if callbacks else None,
+        'p95_ms': round(percentile(callbacks, 95) * 1000, 2) if callbacks else None,
+        'p99_ms': round(percentile(callbacks, 99) * 1000, 2) if callbacks else None,
+        'error_rate': round(recorder.errors / total, 4) if total else None,
+        'tick_p95_s': round(percentile(recorder.ticks, 95), 3) if recorder.ticks else None,
+        'behind': bool(recorder.ticks) and percentile(recorder.ticks, 95) > tick_seconds,
+        'callbacks_p95_ms': {name: round(percentile(values, 95) * 1000, 2) for name, values in sorted(recorder.latencies.items())}
+    }
+    point.update(sampler.summary())
+    return point
+
+
+def wait_until_up(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{url} did not come up")
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    parser = argparse.ArgumentParser(description='Load test the live dashboard.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    feed = commands.add_parser('serve-feed')
+    feed.add_argument('--port', type=int, default=8070)
+    feed.add_argument('--step', type=float, default=2.0, help='Seconds between new pitches')
+    app = commands.add_parser('serve-app')
+    app.add_argument('--feed', default='http://127.0.0.1:8070')
+    app.add_argument('--port', type=int, default=8050)
+    app.add_argument('--workers', type=int)
+    app.add_argument('--threads', type=int)
+    run = commands.add_parser('run')
+    run.add_argument('--url', default='http://127.0.0.1:8050')
+    run.add_argument('--levels', type=int, nargs='+', default=[1, 5, 10, 25, 50])
+    run.add_argument('--duration', type=float, default=60, help='Seconds per level')
+    run.add_argument('--tick', type=float, default=12, help='Seconds between interval ticks')
+    run.add_argument('--server-pid', type=int, help='Process to sample CPU and RSS of')
+    run.add_argument('--spawn', action='store_true', help='Start the stand-in feed and the app first')
+    run.add_argument('--workers', type=int, default=1)
+    run.add_argument('--output', help='Write the capacity curve as JSON to this file')
+    args = parser.parse_args()
+
+    if args.command == 'serve-feed':
+        create_feed_app(args.step).run(host='127.0.0.1', port=args.port, threaded=True)
+    elif args.command == 'serve-app':
+        serve_app(args.feed, args.port, args.workers, args.threads)
+    else:
+        spawned = []
+        server_pid = args.server_pid
+        if args.spawn:
+            port = int(args.url.rsplit(':', 1)[1].strip('/'))
+            spawned.append(subprocess.Popen([sys.executable, __file__, 'serve-feed', '--port', str(port + 20)]))
+            spawned.append(subprocess.Popen([sys.executable, __file__, 'serve-app', '--feed', f'http://127.0.0.1:{port + 20}',
+                                             '--port', str(port), '--workers', str(args.workers)]))
+            server_pid = spawned[-1].pid
+        try:
+            wait_until_up(args.url)
+            curve = []
+            for level in args.levels:
+                point = run_level(args.url, level, args.duration, args.tick, server_pid)
+                curve.append(point)
+                print(f"{level:>4} sessions  {point['throughput_rps']:>8.1f} req/s  p50 {point['p50_ms']} ms  p95 {point['p95_ms']} ms  "
+                      f"p99 {point['p99_ms']} ms  errors {point['error_rate']:.2%}  tick p95 {point['tick_p95_s']} s  "
+                      f"cpu {point['cpu_percent']}%  rss {point['rss_mb']} MB{'  BEHIND' if point['behind'] else ''}")
+            result = {'url': args.url, 'tick_seconds': args.tick, 'duration_seconds': args.duration, 'curve': curve}
+            if args.output:
+                Path(args.output).write_text(json.dumps(result, indent=2))
+        finally:
+            for process in spawned:
+                process.terminate()
@@ -0,0 +1,318 @@
+import contextlib
+import gc
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from flask import Blueprint, jsonify, request
+
+# Memory diagnostics for long game days: sizes of every cache the app keeps, a periodic RSS timeline, tracemalloc
+# snapshots on demand and memory budgets. STRIKEZONE_MEMORY_BUDGET_MB caps the process RSS and
+# STRIKEZONE_CACHE_BUDGETS caps single caches in MB, e.g. 'game_states=64,datasets=256'. Over budget, the sampler
+# evicts the oldest entries, from the cheapest to rebuild first. Served at /debug/memory and /debug/memory/snapshot.
+# Snapshots slow the whole process down while they trace, so their endpoint is off unless
+# STRIKEZONE_MEMORY_SNAPSHOT_TOKEN is set and the request passes the token as an X-Debug-Token header.
+
+SAMPLE_SECONDS = float(os.environ.get('STRIKEZONE_MEMORY_SAMPLE_SECONDS', 60))
+TIMELINE_LENGTH = 24 * 60  # A day of samples at the default interval
+SNAPSHOT_SECONDS = float(os.environ.get('STRIKEZONE_MEMORY_SNAPSHOT_SECONDS', 10))
+SNAPSHOT_TOKEN = os.environ.get('STRIKEZONE_MEMORY_SNAPSHOT_TOKEN')
+MEMORY_BUDGET_MB = float(os.environ.get('STRIKEZONE_MEMORY_BUDGET_MB', 0))  # 0 means no budget
+
+
+def _parse_budgets(value):
+    budgets = {}
+    for item in filter(None, value.split(',')):
+        name, _, megabytes = item.partition('=')
+        budgets[name.strip()] = float(megabytes)
+    return budgets
+
+CACHE_BUDGETS_MB = _parse_budgets(os.environ.get('STRIKEZONE_CACHE_BUDGETS', ''))
+
+rss_timeline = deque(maxlen=TIMELINE_LENGTH)  # (unix time, rss bytes)
+_previous_snapshot = None
+_snapshot_lock = threading.Lock()  # One tracing window at a time
+_sampler = None
+_sampler_pid = None
+
+
+def rss_bytes():
+    """ Resident set size of this process. """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def deep_sizeof(obj, seen=None):
+    """ Approximate bytes held by obj and everything it references. DataFrames and arrays count their buffers. """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'columns'):
+        return int(obj.memory_usage(deep=True).sum())
+    if hasattr(obj, 'nbytes') and hasattr(obj, 'dtype'):
+        return int(obj.nbytes) if obj.base is None else sys.getsizeof(obj)  # Views and memory maps don't own their data
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+############### CACHES ###############
+
+def _module(name):
+    return sys.modules.get(name)  # Only account for modules the app has loaded
+
+
+def _ordered_dict_cache(module_name, attribute, lock=None):
+    """ Size and eviction of a module-level OrderedDict used as an LRU, oldest first, under the module's lock if any. """
+    def entries():
+        module = _module(module_name)
+        return getattr(module, attribute) if module else {}
+
+    def size():
+        return deep_sizeof(dict(entries()))
+
+    def evict(fraction):
+        module = _module(module_name)
+        if module is None:
+            return
+        cache = getattr(module, attribute)
+        with getattr(module, lock) if lock else contextlib.nullcontext():
+            for _ in range(max(1, int(len(cache) * fraction)) if cache else 0):
+                cache.popitem(last=False)
+
+    return entries, size, evict
+
+
+def _lru_cache(module_name, *functions):
+    def entries():
+        module = _module(module_name)
+        return [(name, index) for name in functions for index in range(getattr(module, name).cache_info().currsize)] if module else []
+
+    def size():
+        return None  # lru_cache doesn't expose its values, only their count
+
+    def evict(fraction):
+        module = _module(module_name)
+        if module:
+            for name in functions:
+                getattr(module, name).cache_clear()
+
+    return entries, size, evict
+
+
+def _parsed_datasets():
+    module = _module('scatterBall')
+    return module._parsed_dfs if module else {}
+
+def _job_results():
+    module = _module('jobBall')
+    return {job_id: job.result for job_id, job in dict(module._jobs).items()} if module else {}
+
+def _evict_job_results(fraction):
+    module = _module('jobBall')
+    if module:
+        with module._jobs_lock:
+            finished = sorted((job.finished_at, job_id) for job_id, job in module._jobs.items() if job.finished_at is not None)
+            for _, job_id in finished[:max(1, int(len(finished) * fraction))]:
+                del module._jobs[job_id]
+
+def _shared_cache():
+    module = _module('cacheBall')
+    cache = module._cache if module else None
+    return dict(cache.entries) if cache is not None and hasattr(cache, 'entries') else {}  # Disk and Redis hold nothing in this process
+
+def _evict_shared_cache(fraction):
+    module = _module('cacheBall')
+    if module and module._cache is not None:
+        module._cache.prune()
+        if fraction >= 1:
+            module._cache.clear()
+
+def _timelines():
+    module = _module('timelineBall')
+    return dict(module.TIMELINES) if module else {}
+
+def _season_stats():
+    module = _module('dataBall')
+    return dict(module._season_stats) if module else {}  # Only the tables loaded so far
+
+
+# name -> (entries, size in bytes, evict(fraction) or None). Listed from the cheapest to rebuild to the dearest,
+# which is the order the memory budget evicts in.
+CACHES = {
+    'game_states': _ordered_dict_cache('gameBall', 'GAME_STATE_CACHE', '_game_state_lock'),
+    'wall_summaries': _ordered_dict_cache('wallBall', 'SUMMARY_CACHE', '_summary_lock'),
+    'api_responses': _ordered_dict_cache('apiBall', 'RESPONSE_CACHE', '_response_lock'),
+    'arsenals': _ordered_dict_cache('arsenalBall', 'ARSENALS', '_arsenals_lock'),  # Rebuilt from the timeline on the next read
+    'clusters': _ordered_dict_cache('clusterBall', 'CLUSTER_CACHE', '_cluster_lock'),
+    'datasets': (_parsed_datasets, lambda: deep_sizeof(_parsed_datasets()), lambda fraction: _parsed_datasets().clear()),
+    'stadium_figures': _lru_cache('stadiumBall', 'team_geometry', 'team_outline_lods', 'outline_traces'),
+    'job_results': (_job_results, lambda: deep_sizeof(_job_results()), _evict_job_results),
+    'shared_cache': (_shared_cache, lambda: deep_sizeof(_shared_cache()), _evict_shared_cache),
+    'game_feeds': _ordered_dict_cache('gameBall', 'GAME_REGISTRY', '_registry_lock'),
+    'timelines': (_timelines, lambda: sum(timeline.nbytes for timeline in _timelines().values()),
+                  _ordered_dict_cache('timelineBall', 'TIMELINES', '_timelines_lock')[2]),  # Can't be rebuilt once the live state is gone
+    'season_stats': (_season_stats, lambda: deep_sizeof(_season_stats()), None),  # Loaded once, never evicted
+}
+
+
+def pybaseball_cache_bytes():
+    """ Size of pybaseball's on-disk cache. """
+    if 'pybaseball' not in sys.modules:
+        return 0  # Not used yet in this process, don't import it just to report on it
+    directory = Path(sys.modules['pybaseball'].cache.config.cache_directory)
+    return sum(path.stat().st_size for path in directory.rglob('*') if path.is_file()) if directory.exists() else 0
+
+
+def cache_report():
+    """
+    Returns:
+        dict: Per cache, the number of entries and the approximate bytes held, plus the pybaseball disk cache.
+    """
+    report = {}
+    for name, (entries, size, evict) in CACHES.items():
+        report[name] = {'entries': len(entries()), 'bytes': size(), 'budget_mb': CACHE_BUDGETS_MB.get(name)}
+    report['pybaseball_disk'] = {'bytes': pybaseball_cache_bytes()}
+    return report
+
+
+def enforce_budgets():
+    """
+    Evicts from caches over their own budget, then from every cache in CACHES order while the RSS is over the
+    process budget.
+
+    Returns:
+        list of str: Names of the caches evicted from.
+    """
+    evicted = []
+    for name, budget in CACHE_BUDGETS_MB.items():
+        entries, size, evict = CACHES.get(name, (None, None, None))
+        while evict and entries() and (size() or 0) > budget * 2**20:
+            evict(0.5)
+            evicted.append(name)
+    if MEMORY_BUDGET_MB and rss_bytes() > MEMORY_BUDGET_MB * 2**20:
+        for name, (entries, size, evict) in CACHES.items():
+            if evict is None or not entries():
+                continue
+            evict(1.0)
+            evicted.append(name)
+            gc.collect()
+            if rss_bytes() <= MEMORY_BUDGET_MB * 2**20:
+                break
+    if evicted:
+        logging.warning(f"Memory budget evicted from {sorted(set(evicted))}, rss now {rss_bytes() / 2**20:.0f} MB")
+    return evicted
+
+
+############### SAMPLING / SNAPSHOTS ###############
+
+class MemorySampler(threading.Thread):
+    """ Records the RSS every SAMPLE_SECONDS, prunes expired shared cache entries and enforces the budgets. """
+
+    def __init__(self, interval=SAMPLE_SECONDS):
+        super().__init__(name='memory-sampler', daemon=True)
+        self.interval = interval
+
+    def run(self):
+        while True:
+            try:
+                _evict_shared_cache(0)
+                enforce_budgets()
+                rss_timeline.append((time.time(), rss_bytes()))
+            except Exception as e:
+                logging.error(f"Memory sampling failed: {e}")
+            time.sleep(self.interval)
+
+
+def start_sampler():
+    """ Starts the sampler once per process. Threads don't survive a fork, so a forked worker starts its own. """
+    global _sampler, _sampler_pid
+    if _sampler is None or _sampler_pid != os.getpid():
+        _sampler, _sampler_pid = MemorySampler(), os.getpid()
+        _sampler.start()
+
+
+def _start_sampler_in_child():
+    # gunicorn's preload instruments the app in the master, its workers are forked after the sampler started
+    if _sampler is not None:
+        start_sampler()
+
+os.register_at_fork(after_in_child=_start_sampler_in_child)
+
+
+def snapshot(limit=25):
+    """
+    Takes a tracemalloc snapshot and compares it with the previous one. Tracing slows every allocation down, so
+    it only runs for SNAPSHOT_SECONDS while the request waits, unless it was already on (PYTHONTRACEMALLOC).
+
+    Returns:
+        dict: The top allocation sites by size and by growth since the previous snapshot. None if another snapshot
+        is running, callers don't queue up behind it.
+    """
+    if not _snapshot_lock.acquire(blocking=False):
+        return None
+    try:
+        return _snapshot(limit)
+    finally:
+        _snapshot_lock.release()
+
+
+def _snapshot(limit):
+    global _previous_snapshot
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(10)
+        time.sleep(SNAPSHOT_SECONDS)  # Only allocations made while tracing are seen
+    try:
+        current = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        traced, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    top = [{'site': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count} for stat in current.statistics('lineno')[:limit]]
+    growth = []
+    if _previous_snapshot is not None:
+        growth = [{'site': str(stat.traceback[0]), 'bytes_diff': stat.size_diff, 'count_diff': stat.count_diff}
+                  for stat in current.compare_to(_previous_snapshot, 'lineno')[:limit]]
+    _previous_snapshot = current
+    return {'traced_bytes': traced, 'peak_bytes': peak, 'top': top, 'growth': growth}
+
+
+memory_blueprint = Blueprint('memory', __name__)
+
+@memory_blueprint.route('/debug/memory')
+def memory_report():
+    return jsonify({
+        'rss_bytes': rss_bytes(),
+        'budget_mb': MEMORY_BUDGET_MB or None,
+        'caches': cache_report(),
+        'timeline': list(rss_timeline)
+    })
+
+@memory_blueprint.route('/debug/memory/snapshot')
+def memory_snapshot():
+    if not SNAPSHOT_TOKEN or not hmac.compare_digest(request.headers.get('X-Debug-Token', ''), SNAPSHOT_TOKEN):
+        return jsonify({'error': 'Not found'}), 404
+    result = snapshot(int(request.args.get('limit', 25)))
+    if result is None:
+        return jsonify({'error': 'A snapshot is already running'}), 429, {'Retry-After': str(int(SNAPSHOT_SECONDS))}
+    return jsonify(result)
+
+
+def instrument_server(server):
+    """ Adds the memory endpoints to a Dash app's Flask server and starts the sampler. """
+    server.register_blueprint(memory_blueprint)
+    start_sampler()
@@ -0,0 +1,273 @@
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from flask import Blueprint, Response, g, request
+
+# Latency and traffic metrics in Prometheus' text format, served at /metrics. Dash callbacks are timed by Flask
+# hooks around /_dash-update-component, upstream fetches by fetchBall.fetch_url, pybaseball loads by timed_load and
+# cache lookups by cacheBall.cached. Callbacks slower than STRIKEZONE_SLOW_CALL_MS are logged with their inputs.
+#
+# The values live in each process. With several worker processes (see serveBall) set PROMETHEUS_MULTIPROC_DIR, as
+# for prometheus_client's multiprocess mode, to an empty directory shared by the workers: each process then writes
+# its values to a file there every FLUSH_SECONDS, and /metrics adds up the files of every process, the ones of
+# exited workers included, so whichever worker answers a scrape the counters only grow.
+
+SLOW_CALL_MS = float(os.environ.get('STRIKEZONE_SLOW_CALL_MS', 0))  # 0 turns the slow-call log off
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+FLUSH_SECONDS = 5
+
+_metrics = []
+_process_pid = None  # Process the values were recorded in, see _check_process
+_process_lock = threading.Lock()
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _label_order(item):
+    return [str(value) for value in item[0]]  # Label values can mix types, e.g. a status of 200 or 'error'
+
+
+class Counter:
+    """ Monotonic counter with labels. """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        _check_process()
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return total + value
+
+    def samples(self, values=None):
+        if values is None:
+            with self.lock:
+                values = dict(self.values)
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in sorted(values.items(), key=_label_order)]
+
+
+class Histogram:
+    """ Histogram with cumulative buckets, a sum and a count per label set. """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        _check_process()
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            entry = self.values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    @staticmethod
+    def merge(total, entry):
+        return [a + b for a, b in zip(total, entry)]
+
+    def samples(self, values=None):
+        if values is None:
+            with self.lock:
+                values = {key: list(entry) for key, entry in self.values.items()}
+        samples = []
+        for key, entry in sorted(values.items(), key=_label_order):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', _format_labels(self.labelnames, key, [('le', bound)]), cumulative))
+            samples.append((f'{self.name}_bucket', _format_labels(self.labelnames, key, [('le', '+Inf')]), entry[-1]))
+            samples.append((f'{self.name}_sum', _format_labels(self.labelnames, key), entry[-2]))
+            samples.append((f'{self.name}_count', _format_labels(self.labelnames, key), entry[-1]))
+        return samples
+
+
+CALLBACK_SECONDS = Histogram('strikezone_callback_seconds', 'Time spent in Dash callbacks', ['callback'])
+CALLBACK_ERRORS = Counter('strikezone_callback_errors_total', 'Dash callback requests that returned an error status', ['callback'])
+FETCH_SECONDS = Histogram('strikezone_fetch_seconds', 'Time spent fetching from upstream APIs, retries included', ['endpoint', 'status'])
+FETCH_BYTES = Counter('strikezone_fetch_bytes_total', 'Bytes received from upstream APIs', ['endpoint'])
+FETCH_RETRIES = Counter('strikezone_fetch_retries_total', 'Retried upstream requests', ['endpoint'])
+PYBASEBALL_SECONDS = Histogram('strikezone_pybaseball_load_seconds', 'Time spent in pybaseball loads', ['loader'], buckets=LATENCY_BUCKETS + (60, 120))
+CACHE_REQUESTS = Counter('strikezone_cache_requests_total', 'Shared cache lookups', ['namespace', 'result'])
+DATA_ERRORS = Counter('strikezone_data_errors_total', 'Missing or malformed data met while fetching or extracting', ['kind'])
+
+
+############### MULTIPROCESS ###############
+
+def _process_path(pid):
+    return Path(MULTIPROC_DIR) / f'metrics_{pid}.json'
+
+
+def flush():
+    """ Writes this process's values to its file in MULTIPROC_DIR, atomically so a scrape never reads half a file. """
+    if not MULTIPROC_DIR or _process_pid != os.getpid():
+        return  # Nothing recorded in this process yet, a fresh worker must not overwrite its parent's file
+    state = {}
+    for metric in _metrics:
+        with metric.lock:
+            state[metric.name] = [[list(key), value] for key, value in metric.values.items()]
+    fd, temp_path = tempfile.mkstemp(dir=MULTIPROC_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as outfile:
+            json.dump(state, outfile)
+        os.replace(temp_path, _process_path(_process_pid))
+    except OSError as e:
+        logging.error(f"Failed to write the metrics of process {_process_pid}: {e}")
+        Path(temp_path).unlink(missing_ok=True)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+
+def _check_process():
+    # Starts the flusher of this process on its first metric. A worker forked from a process that already recorded
+    # values (gunicorn's preload) drops them, they're in the parent's file, and starts a flusher of its own.
+    global _process_pid
+    if not MULTIPROC_DIR or _process_pid == os.getpid():
+        return
+    with _process_lock:
+        if _process_pid == os.getpid():
+            return
+        if _process_pid is not None:
+            for metric in _metrics:
+                metric.lock = threading.Lock()  # A lock held by another thread at the fork would never be released
+                metric.values = {}
+        _process_pid = os.getpid()
+        threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def aggregate():
+    """ Values of every process that wrote to MULTIPROC_DIR, added up per metric and label set. """
+    flush()
+    totals = {metric.name: {} for metric in _metrics}
+    merges = {metric.name: metric.merge for metric in _metrics}
+    for path in Path(MULTIPROC_DIR).glob('metrics_*.json'):
+        try:
+            state = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # Being replaced
+        for name, entries in state.items():
+            if name not in totals:
+                continue
+            for key, value in entries:
+                key = tuple(key)
+                values = totals[name]
+                values[key] = merges[name](values[key], value) if key in values else value
+    return totals
+
+
+if MULTIPROC_DIR:
+    Path(MULTIPROC_DIR).mkdir(parents=True, exist_ok=True)
+    os.register_at_fork(before=flush)  # The parent's values are on disk before a worker drops its copy
+    atexit.register(flush)
+
+
+class timed:
+    """ Observes the duration of a block or function call in a histogram, e.g. @timed(PYBASEBALL_SECONDS, loader='stats'). """
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.histogram, **self.labels):  # A fresh timer per call, calls can overlap across threads
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed_load(loader):
+    """ Decorator timing a pybaseball load. """
+    return timed(PYBASEBALL_SECONDS, loader=loader)
+
+
+def render():
+    """ All metrics in Prometheus' text exposition format, of every process with MULTIPROC_DIR set. """
+    totals = aggregate() if MULTIPROC_DIR else {}
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(f'{name}{labels} {value}' for name, labels, value in metric.samples(totals.get(metric.name)))
+    return '\n'.join(lines) + '\n'
+
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+@metrics_blueprint.route('/metrics')
+def metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def _callback_start():
+    if request.path.endswith('/_dash-update-component'):
+        g.callback_start = time.perf_counter()
+
+def _callback_end(response):
+    start = g.pop('callback_start', None)
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    body = request.get_json(silent=True) or {}
+    callback = body.get('output', 'unknown')
+    CALLBACK_SECONDS.observe(duration, callback=callback)
+    if response.status_code >= 400:
+        CALLBACK_ERRORS.inc(callback=callback)
+    if SLOW_CALL_MS and duration * 1000 > SLOW_CALL_MS:
+        inputs = {f"{item.get('id')}.{item.get('property')}": item.get('value') for item in body.get('inputs', []) if isinstance(item, dict)}
+        logging.warning(f"Slow callback {callback} took {duration * 1000:.0f} ms, triggered by {body.get('changedPropIds')} "
+                        f"with inputs {json.dumps(inputs, default=str)[:2000]}")
+    return response
+
+
+def instrument_server(server):
+    """ Adds the callback timing hooks and the /metrics endpoint to a Dash app's Flask server. """
+    server.before_request(_callback_start)
+    server.after_request(_callback_end)
+    server.register_blueprint(metrics_blueprint)
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from flask import Blueprint, Response
+import cacheBall, fetchBall, gameBall
+
+# One poller thread per game fetches the feed into the gameBall registry and pushes the new
+# {'game_pk', 'version'} token to every browser subscribed to that game over server-sent events.
+# Upstream traffic scales with the number of games being watched, not the number of viewers.
+#
+# Every worker process watching a game runs a poller, but only one of them fetches: each poll the pollers claim
+# the game's lock in the shared cache (see cacheBall) and the holder fetches and publishes the feed. The others
+# pick up what it published, so upstream traffic doesn't grow with the number of workers either.
+#
+# An event stream keeps one of the worker's threads for as long as it's open. Streams are capped at
+# MAX_STREAMS per process, below the thread count, so open viewers can't starve the Dash callbacks. Browsers
+# turned away fall back to the page's polling interval and try to subscribe again later.
+
+POLL_SECONDS = 5  # How often a watched game is fetched from Baseball Savant
+IDLE_SECONDS = 120  # A poller stops after this long without subscribers or ensure_polling calls
+HEARTBEAT_SECONDS = 15  # Comment lines keep idle event streams open through proxies
+LOCK_SECONDS = 3 * POLL_SECONDS  # A poller lock outlives a few missed polls before another process takes over
+MAX_STREAMS = int(os.environ.get('STRIKEZONE_MAX_STREAMS', max(1, int(os.environ.get('STRIKEZONE_THREADS', 4)) // 2)))
+_streams = threading.BoundedSemaphore(MAX_STREAMS)
+
+push_blueprint = Blueprint('push', __name__)
+
+_pollers = {}  # game_pk -> GamePoller
+_pollers_lock = threading.Lock()
+
+
+class GamePoller(threading.Thread):
+    """ Polls one game's feed and broadcasts every new version to the subscriber queues. """
+
+    def __init__(self, game_pk):
+        super().__init__(name=f'game-poller-{game_pk}', daemon=True)
+        self.game_pk = game_pk
+        self.subscribers = set()
+        self.version = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self.first_poll = threading.Event()
+
+    def run(self):
+        while True:
+            with _pollers_lock:
+                if not self.subscribers and time.monotonic() - self.last_used > IDLE_SECONDS:
+                    del _pollers[self.game_pk]
+                    return
+            self.poll()
+            time.sleep(POLL_SECONDS)
+
+    def poll(self):
+        elected = False
+        try:
+            elected = cacheBall.get_cache().claim(f'game_poller:{self.game_pk}', _poller_owner(), LOCK_SECONDS)
+            if elected:
+                game_data = fetchBall.fetch_game_data(self.game_pk)
+                version = gameBall.publish_game(self.game_pk, game_data) if game_data else None
+            else:
+                version = gameBall.sync_game(self.game_pk)  # Published by the elected poller
+            if version is not None and version != self.version:
+                self.version = version
+                self.broadcast({'game_pk': self.game_pk, 'version': version})
+        except Exception as e:
+            logging.error(f"Error polling game {self.game_pk}: {e}")
+        finally:
+            # A process that lost the election waits for the first feed the elected one publishes
+            if elected or self.version is not None:
+                self.first_poll.set()
+
+    def broadcast(self, event):
+        with self.lock:
+            for subscriber in list(self.subscribers):
+                subscriber.put(event)
+
+    def subscribe(self):
+        subscriber = queue.Queue()
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+        self.last_used = time.monotonic()
+
+
+def _poller_owner():
+    # Worth computing on every claim, gunicorn forks the workers after this module was imported
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def is_known_game(game_pk):
+    """ Whether game_pk is on today's schedule or already registered, so requests can't start pollers for arbitrary ids. """
+    return game_pk in gameBall.GAME_REGISTRY or any(scheduled == game_pk for scheduled, _, _ in fetchBall.get_game_pks_and_teams())
+
+
+def get_poller(game_pk):
+    """ Returns the running poller of a game, starting one if needed. """
+    with _pollers_lock:
+        poller = _pollers.get(game_pk)
+        if poller is None:
+            poller = _pollers[game_pk] = GamePoller(game_pk)
+            poller.start()
+        poller.last_used = time.monotonic()
+        return poller
+
+
+def ensure_polling(game_pk, timeout=10, validated=False):
+    """
+    Makes sure a poller is watching the game and returns the latest version it has seen.
+    Waits for the first poll of a newly started poller, up to timeout seconds.
+
+    Args:
+        game_pk (int): Game identifier.
+        timeout (float): Seconds to wait for the first poll.
+        validated (bool): The caller already checked is_known_game, skip the second schedule lookup.
+
+    Returns:
+        str: Latest feed version, or None if the feed could not be fetched yet or the game isn't known, see is_known_game.
+    """
+    if not validated and not is_known_game(game_pk):
+        return None
+    poller = get_poller(game_pk)
+    poller.first_poll.wait(timeout)
+    return poller.version
+
+
+@push_blueprint.route('/events/<int:game_pk>')
+def game_events(game_pk):
+    """ Server-sent event stream of {'game_pk', 'version'} tokens for one game. """
+    if not is_known_game(game_pk):
+        return Response(f"Unknown game {game_pk}", status=404)
+    if not _streams.acquire(blocking=False):
+        return Response('Too many open event streams', status=503, headers={'Retry-After': str(RESUBSCRIBE_SECONDS)})
+    try:
+        poller = get_poller(game_pk)
+        subscriber = poller.subscribe()
+    except Exception:
+        _streams.release()
+        raise
+
+    def stream():
+        try:
+            if poller.version is not None:
+                yield f"data: {json.dumps({'game_pk': game_pk, 'version': poller.version})}\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=HEARTBEAT_SECONDS)
+                    yield f"data: {json.dumps(event)}\n\n"
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+        finally:
+            poller.unsubscribe(subscriber)
+            _streams.release()
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Opens an EventSource for the selected game and writes every pushed token into the game-data-store,
+# which triggers the same callbacks a poll would. Used as a Dash clientside callback on gamepk-dropdown.value.
+# A refused stream (e.g. MAX_STREAMS reached) leaves the page on its polling interval and is retried later.
+RESUBSCRIBE_SECONDS = 30
+SUBSCRIBE_CLIENTSIDE = """
+function(game_pk) {
+    if (window.strikezoneEvents) {
+        window.strikezoneEvents.close();
+        window.strikezoneEvents = null;
+    }
+    clearTimeout(window.strikezoneResubscribe);
+    if (!game_pk || !window.EventSource) {
+        return 'polling';
+    }
+    var subscribe = function() {
+        var events = window.strikezoneEvents = new EventSource('/events/' + game_pk);
+        events.onmessage = function(message) {
+            window.dash_clientside.set_props('game-data-store', {data: JSON.parse(message.data)});
+        };
+        events.onerror = function() {
+            if (events.readyState === EventSource.CLOSED && window.strikezoneEvents === events) {
+                window.dash_clientside.set_props('push-status-store', {data: 'polling'});
+                window.strikezoneResubscribe = setTimeout(subscribe, %d * 1000);
+            }
+        };
+    };
+    subscribe();
+    return 'subscribed';
+}
+""" % RESUBSCRIBE_SECONDS
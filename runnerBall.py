@@ -1,6 +1,5 @@
 import logging
 import fetchBall
-import plotly.graph_objects as go
 
 # Set up basic configuration for logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -1,19 +1,20 @@
 import dash
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State
 from dash import dcc
 import dash_bootstrap_components as dbc
-import plotly.express as px
 import plotly.graph_objects as go
+from plotly.colors import qualitative
 import numpy as np
 from dash.exceptions import PreventUpdate
 import pandas as pd
-import pybaseball
-from pybaseball import cache
+import hashlib
+from io import StringIO
 import fetchBall
 import tableBall
-from sklearn.cluster import KMeans
-
-cache.enable()
+import clusterBall
+import jobBall
+import metricsBall
+import memBall
 
 
 team_colors = {
@@ -50,15 +51,16 @@ team_colors = {
 }
 
 
-app = Dash(__name__, suppress_callback_exceptions=True,
-           external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Callbacks are registered with dash.callback so the page runs on its own (see __main__) or inside appBall
+external_stylesheets = [dbc.themes.BOOTSTRAP]
 
 def purge_cache():
-    cache.purge()
+    fetchBall.load_pybaseball().cache.purge()
+    clusterBall.clear_cluster_cache()
 
 
 
-@app.callback(
+@dash.callback(
     Output(component_id='purge-button', component_property='children'),
     [Input(component_id='purge-button', component_property='n_clicks')]
 )
@@ -83,51 +85,125 @@ index_page = html.Div([
 
 
 # Set the page layouts based on the URL path
-@app.callback(
+@dash.callback(
     Output('page-content', 'children'),
     [Input('url', 'pathname')]
 )
 def display_page(pathname):
-    year = 2021  # replace with the actual year
-    end_year = 2024  # replace with the actual end year
     if pathname == '/page-1':
-        df = fetchBall.fetch_stats(year, end_year, data_type='batting',qual='y')
+        df = fetchBall.fetch_stats(LAYOUT_START_YEAR, LAYOUT_END_YEAR, data_type='batting',qual='y')
         return tableBall.generate_layout(df)
     elif pathname == '/page-2':
-        df = fetchBall.fetch_stats(year, end_year, data_type='pitching',qual='y')
+        df = fetchBall.fetch_stats(LAYOUT_START_YEAR, LAYOUT_END_YEAR, data_type='pitching',qual='y')
         return tableBall.generate_layout(df)
     else:
         return index_page
 
+# Seasons whose stats columns fill the page layouts' axis dropdowns
+LAYOUT_START_YEAR = 2021
+LAYOUT_END_YEAR = 2024
+
+
+def default_loads():
+    """
+    The stats loads of the pages with their default settings: the layouts' loads and the df-store jobs for the
+    default years, qualified players and aggregated stats. Called the way the pages call them, so warming them up
+    (see appBall.warm_up) fills the same cache keys.
+
+    Returns:
+        list of tuple: (function, args, kwargs).
+    """
+    loads = [(fetchBall.fetch_stats, (LAYOUT_START_YEAR, LAYOUT_END_YEAR), {'data_type': data_type, 'qual': 'y'}) for data_type in ['batting', 'pitching']]
+    for pathname in ['/page-1', '/page-2']:
+        loads += df_load_chunks(tableBall.DEFAULT_START_YEAR, tableBall.DEFAULT_END_YEAR, 'qual', 0, pathname, [])
+    return loads
+
+
+
+def df_load_chunks(year, end_year, data_toggle_value, ind, pathname, is_team_data):
+    """
+    Splits the load behind a page into one job chunk per season, so a long year range reports progress
+    and can be cancelled between seasons. Aggregated player stats (ind 0) need the whole range in one load.
+
+    Returns:
+        list of tuple: (function, args, kwargs) chunks for jobBall.submit, or None for pages without data.
+    """
+    if pathname == '/page-1':
+        if is_team_data:
+            func, kwargs = fetchBall.fetch_combined_team_stats, {}
+        else:
+            func, kwargs = fetchBall.fetch_stats, {'data_type': 'batting', 'ind': ind, 'qual': 'y' if data_toggle_value == 'qual' else 0}
+    elif pathname == '/page-2':
+        if is_team_data:
+            func, kwargs = fetchBall.fetch_team_pitching, {'qual': 'y' if data_toggle_value == 'qual' else '0'}
+        else:
+            func, kwargs = fetchBall.fetch_stats, {'data_type': 'pitching', 'ind': ind, 'qual': 'y'}
+    else:
+        return None
+
+    if (func is fetchBall.fetch_stats and ind == 0) or end_year is None or end_year <= year:
+        return [(func, (year, end_year), kwargs)]
+    return [(func, (season, season), kwargs) for season in range(year, end_year + 1)]
+
+
+def store_df(df, ind):
+    df_json = df.to_json(date_format='iso', orient='split')
+    return {'df': df_json, 'ind': ind, 'version': hashlib.md5(df_json.encode()).hexdigest()}
 
 
-@app.callback(
-    Output('df-store', 'data'),
+@dash.callback(
+    [Output('df-store', 'data'),
+     Output('df-job-store', 'data'),
+     Output('df-job-interval', 'disabled'),
+     Output('df-job-progress', 'value'),
+     Output('df-job-progress', 'label')],
     [Input('year-dropdown', 'value'),
      Input('end-year-dropdown', 'value'),
      Input('data-toggle', 'value'),
      Input('ind-toggle', 'value'),
      Input('url', 'pathname'),
-     Input('team-toggle', 'value')]
+     Input('team-toggle', 'value'),
+     Input('df-job-interval', 'n_intervals')],
+    [State('df-job-store', 'data')]
 )
-def update_df_store(year, end_year, data_toggle_value, ind, pathname, is_team_data):
-    if ind == ['0']:
-        ind = 0
-    else:
-        ind = 1
-    if pathname == '/page-1':
-        if data_toggle_value == 'qual':
-            df = fetchBall.fetch_stats(year, end_year, data_type='batting',ind=ind,qual='y') if not is_team_data else fetchBall.fetch_combined_team_stats(year, end_year)
-        else:
-            df = fetchBall.fetch_stats(year, end_year, data_type='batting',ind=ind,qual=0) if not is_team_data else fetchBall.fetch_combined_team_stats(year, end_year)
-    elif pathname == '/page-2':
-        if data_toggle_value == 'qual':
-            df = fetchBall.fetch_stats(year, end_year,  data_type='pitching',ind=ind,qual='y') if not is_team_data else pybaseball.team_pitching(year, end_year,qual='y')
-        else:
-            df = fetchBall.fetch_stats(year, end_year,  data_type='pitching',ind=ind,qual='y') if not is_team_data else pybaseball.team_pitching(year, end_year,qual='0')
-    else:
-        return dash.no_update
-    return {'df': df.to_json(date_format='iso', orient='split'), 'ind': ind}
+def update_df_store(year, end_year, data_toggle_value, ind, pathname, is_team_data, n_intervals, stored_job):
+    # Loads run in jobBall's process pool. Changing an input starts (or joins) a job and cancels the previous one,
+    # the interval then polls the job until its result can go into the df-store.
+    if dash.callback_context.triggered_id != 'df-job-interval':
+        ind = 0 if ind == ['0'] else 1
+        chunks = df_load_chunks(year, end_year, data_toggle_value, ind, pathname, is_team_data)
+        if chunks is None:
+            if stored_job:
+                jobBall.cancel(stored_job['job_id'])
+            return dash.no_update, None, True, 0, ''
+        job_id = jobBall.submit(chunks, replaces=stored_job['job_id'] if stored_job else None)
+        stored_job = {'job_id': job_id, 'ind': ind}
+    elif not stored_job:
+        raise PreventUpdate
+
+    status = jobBall.job_status(stored_job['job_id'])
+    if status is None or status['status'] == 'error':
+        return dash.no_update, None, True, 0, 'Failed to load stats'
+    if status['status'] == 'running':
+        progress = round(status['progress'] * 100)
+        return dash.no_update, stored_job, False, progress, f'Loading {progress}%'
+    df = jobBall.job_result(stored_job['job_id'])
+    if df is None:  # Expired from the shared cache since the job finished
+        return dash.no_update, None, True, 0, 'Failed to load stats'
+    return store_df(df, stored_job['ind']), None, True, 100, ''
+
+
+# Parsed copies of the stored dataframes keyed by dataset version, so presentational changes skip the JSON parse
+_parsed_dfs = {}
+
+def read_stored_df(stored_data):
+    version = stored_data.get('version')
+    if version is None:
+        return pd.read_json(StringIO(stored_data['df']), orient='split')
+    if version not in _parsed_dfs:
+        _parsed_dfs.clear()
+        _parsed_dfs[version] = pd.read_json(StringIO(stored_data['df']), orient='split')
+    return _parsed_dfs[version].copy()
 
 
 def filter_dataframe(df, qualifier_column_name, qualifier_value, comparison_operator):
@@ -156,7 +232,7 @@ def add_traces(fig, df, xaxis_column_name, yaxis_column_name, ind):
                 showlegend=True  # Show legend entry for each team
             ))
 
-@app.callback(
+@dash.callback(
     Output('scatter-plot', 'figure'),
     [Input('df-store', 'data'),  # Use the data from the dcc.Store component
      Input('xaxis-column', 'value'),
@@ -166,16 +242,26 @@ def add_traces(fig, df, xaxis_column_name, yaxis_column_name, ind):
      Input('qualifier-value', 'value'),
      Input('comparison-operator', 'value'),
      Input('invert-x-axis', 'value'),
-     Input('invert-y-axis', 'value')]
+     Input('invert-y-axis', 'value'),
+     Input('cluster-toggle', 'value'),
+     Input('cluster-count', 'value')]
 )
-def update_graph(stored_data, xaxis_column_name, yaxis_column_name, name_toggle_values, qualifier_column_name, qualifier_value, comparison_operator, invert_x_axis, invert_y_axis):
-    df = pd.read_json(stored_data['df'], orient='split')
+def update_graph(stored_data, xaxis_column_name, yaxis_column_name, name_toggle_values, qualifier_column_name, qualifier_value, comparison_operator, invert_x_axis, invert_y_axis, cluster_toggle, n_clusters):
+    if not stored_data:
+        raise PreventUpdate  # The first load is still running
+    df = read_stored_df(stored_data)
     ind = stored_data['ind']
     fig = go.Figure()
-    cluster_colors = {0: 'red', 1: 'green', 2: 'blue'}
+    cluster_colors = qualitative.Plotly
 
-    #df, cluster_labels, cluster_names = create_clusters(df, [xaxis_column_name, yaxis_column_name], n_clusters=6)
-    #df['Cluster'] = cluster_labels  # Add cluster labels to the dataframe
+    # Cluster on the full dataset so the assignments only depend on the data version, the axes and k
+    show_clusters = bool(cluster_toggle and 'CLUSTER' in cluster_toggle and n_clusters)
+    if show_clusters:
+        cluster_labels = clusterBall.fit_clusters(df, [xaxis_column_name, yaxis_column_name], int(n_clusters), stored_data.get('version'))
+        show_clusters = bool(cluster_labels)  # No row has both axes, plot by team rather than drop everything
+    if show_clusters:
+        df['Cluster'] = df.index.map(cluster_labels)
+        df = df[df['Cluster'].notna()]
 
     # Apply filtering based on user inputs
     comparison_operators = {
@@ -188,19 +274,25 @@ def update_graph(stored_data, xaxis_column_name, yaxis_column_name, name_toggle_
     df = df[comparison_operators[comparison_operator](df[qualifier_column_name])]
 
    
-    # Group data by team and create a trace for each group
-    grouped = df.groupby('Team')
-    for team, team_data in grouped:
-        if not team_data.empty:
+    # Group data by team (or by cluster) and create a trace for each group
+    grouped = df.groupby('Cluster' if show_clusters else 'Team')
+    for group, group_data in grouped:
+        if not group_data.empty:
+            if show_clusters:
+                name = f"Cluster {int(group) + 1}"
+                color = cluster_colors[int(group) % len(cluster_colors)]
+            else:
+                name = group
+                color = team_colors.get(group, '#999999')  # Default color if team not in dictionary
             fig.add_trace(go.Scatter(
-    x=team_data[xaxis_column_name],
-    y=team_data[yaxis_column_name],
+    x=group_data[xaxis_column_name],
+    y=group_data[yaxis_column_name],
     mode='markers+text',
-text = team_data.apply(lambda row: f"{row['Name']} ({row['Season']})" if 'Name' in team_data.columns and ind == 1 else (row['Name'] if 'Name' in team_data.columns else f"{row['Team']} ({row['Season']})"), axis=1),    textposition='top center',
-    marker=dict(size=12, color=team_colors.get(team, '#999999')),  # Default color if team not in dictionary
-    name=team,
-    legendgroup=team,  # Grouping for toggle
-    showlegend=True  # Show legend entry for each team
+text = group_data.apply(lambda row: f"{row['Name']} ({row['Season']})" if 'Name' in group_data.columns and ind == 1 else (row['Name'] if 'Name' in group_data.columns else f"{row['Team']} ({row['Season']})"), axis=1),    textposition='top center',
+    marker=dict(size=12, color=color),
+    name=name,
+    legendgroup=name,  # Grouping for toggle
+    showlegend=True  # Show legend entry for each team or cluster
 ))
 
     # Calculate and display means
@@ -294,11 +386,11 @@ text = team_data.apply(lambda row: f"{row['Name']} ({row['Season']})" if 'Name'
     
     # Update layout
     fig.update_layout(
-        title='Player Stats by Team',
+        title='Player Stats by Cluster' if show_clusters else 'Player Stats by Team',
         template='plotly_dark',
         xaxis_title=xaxis_column_name,
         yaxis_title=yaxis_column_name,
-        legend_title="Teams",
+        legend_title="Clusters" if show_clusters else "Teams",
         legend=dict(orientation="h", x=0, y=1.1),  # Horizontal legend outside the plot
         xaxis_autorange='reversed' if 'invert' in invert_x_axis else None,  # Invert x axis if Checklist is checked
         yaxis_autorange='reversed' if 'invert' in invert_y_axis else None  # Invert y axis if Checklist is checked
@@ -308,14 +400,15 @@ text = team_data.apply(lambda row: f"{row['Name']} ({row['Season']})" if 'Name'
 
 
 
-@app.callback(
+@dash.callback(
     Output('yaxis-options-store', 'data'),
     [Input('df-store', 'data'),
      Input('xaxis-column', 'value')]
 )
 def update_yaxis_options_store(stored_data, selected_xaxis):
-    df_json = stored_data['df']  # Extract 'df' from the stored data
-    df = pd.read_json(df_json, orient='split')
+    if not stored_data:
+        raise PreventUpdate
+    df = read_stored_df(stored_data)
 
     # Ensure only numeric columns are considered for correlation
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
@@ -329,7 +422,7 @@ def update_yaxis_options_store(stored_data, selected_xaxis):
     # Return sorted options based on correlation
     return [{'label': col, 'value': col} for col in sorted_columns]
 
-@app.callback(
+@dash.callback(
     Output('yaxis-column', 'options'),
     [Input('yaxis-options-store', 'data')]
 )
@@ -337,15 +430,22 @@ def update_yaxis_options(options):
     return options
 
 
-# Define the app layout
-app.layout = html.Div([
+# Define the page layout
+layout = html.Div([
     dcc.Location(id='url', refresh=False),
+    dbc.Progress(id='df-job-progress', value=0, label='', striped=True, animated=True),
     html.Div(id='page-content'),
     dcc.Store(id='df-store'),
+    dcc.Store(id='df-job-store'),
+    dcc.Interval(id='df-job-interval', interval=jobBall.POLL_INTERVAL_MS, disabled=True),
     dcc.Store(id='yaxis-options-store')
 ])
 
 
 
 if __name__ == '__main__':
+    app = Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=external_stylesheets)
+    app.layout = layout
+    metricsBall.instrument_server(app.server)
+    memBall.instrument_server(app.server)
     app.run_server(debug=True,host= '0.0.0.0',port=8051)
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import tempfile
+
+# Production entry point for the dashboards (appBall hosts every page). Debug, dev tools and the reloader
+# are off, and the app is served by gunicorn with several worker processes and threads:
+#
+#   python serveBall.py --workers 4 --threads 8 --port 8050
+#   gunicorn -w 4 -k gthread --threads 8 --preload serveBall:server
+#
+# Worker processes share one cache (see cacheBall), so the game feeds, season stats and datasets are only
+# fetched once whatever the number of workers. The shared cache defaults to disk here, set STRIKEZONE_CACHE=redis
+# and STRIKEZONE_REDIS_URL to share it between machines. The workers' metrics are added up through
+# PROMETHEUS_MULTIPROC_DIR (see metricsBall), a fresh directory per server unless it's set.
+
+os.environ.setdefault('STRIKEZONE_CACHE', 'disk')
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='strikezone-metrics-')
+
+import appBall
+
+appBall.app.enable_dev_tools(debug=False)
+
+# WSGI app object
+server = appBall.server
+
+
+def serve(server, host='0.0.0.0', port=8050, workers=None, threads=None):
+    """
+    Serves a WSGI app with gunicorn, falling back to waitress (threads only) and then to Flask's
+    threaded server where gunicorn isn't available, e.g. on Windows.
+
+    Args:
+        server (Flask): WSGI app to serve.
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        workers (int): Worker processes, defaults to STRIKEZONE_WORKERS or the number of cores.
+        threads (int): Threads per worker, defaults to STRIKEZONE_THREADS or 4.
+    """
+    workers = workers or int(os.environ.get('STRIKEZONE_WORKERS', os.cpu_count() or 1))
+    threads = threads or int(os.environ.get('STRIKEZONE_THREADS', 4))
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class StandaloneApplication(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f'{host}:{port}')
+                self.cfg.set('workers', workers)
+                self.cfg.set('threads', threads)
+                self.cfg.set('worker_class', 'gthread')
+                self.cfg.set('preload_app', True)
+                self.cfg.set('timeout', 120)  # Season stats can take a while to load on a cold cache
+
+            def load(self):
+                return server
+
+        logging.info(f"Serving on {host}:{port} with gunicorn, {workers} workers x {threads} threads")
+        StandaloneApplication().run()
+        return
+
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+
+    if waitress is not None:
+        logging.info(f"gunicorn not installed, serving on {host}:{port} with waitress, {threads} threads")
+        waitress.serve(server, host=host, port=port, threads=threads)
+    else:
+        logging.warning(f"gunicorn and waitress not installed, serving on {host}:{port} with Flask's threaded server")
+        server.run(host=host, port=port, threaded=True, debug=False)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Serve the Strikezone dashboards in production mode.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int)
+    args = parser.parse_args()
+
+    appBall.warm_up()  # Before gunicorn forks, so every worker starts with a warm shared cache
+    serve(server, args.host, args.port, args.workers, args.threads)
@@ -1,127 +1,322 @@
-import pandas as pd
+import hashlib
+import json
+import logging
 from pathlib import Path
-from functools import partial
-import plotly.graph_objects as go
+from functools import lru_cache
+import numpy as np
+import figureBall
 import runnerBall
 
-def _transform_coordinate(coord, center, scale, sign):
-    return sign * ((coord - center) * scale + center)
-
 def transform_coordinates(coords, scale, x_center=125, y_center=199):
-    x_transform = partial(_transform_coordinate, center=x_center, scale=scale, sign=+1)
-    y_transform = partial(_transform_coordinate, center=y_center, scale=scale, sign=-1)
-    coords['x'] = coords['x'].apply(x_transform)
-    coords['y'] = coords['y'].apply(y_transform)
+    """ Scales the MLBAM x/y columns of coords around the given center and flips y so home plate sits at the bottom. """
+    coords['x'] = (coords['x'] - x_center) * scale + x_center
+    coords['y'] = -((coords['y'] - y_center) * scale + y_center)
     return coords
 
-# Assuming CUR_PATH is the directory where your mlbstadiums.csv file is located
-CUR_PATH = Path('.')  # Modify this path as necessary
+# The stadium outlines ship next to this module as mlbstadiums.csv. build_geometry_asset turns the csv into
+# a flat array of transformed vertices (mlbstadiums.npy) plus a json index of per-team, per-segment offsets.
+# The index records a hash of the csv it was built from. File times can't tell whether the asset is stale, a
+# checkout sets them in any order, so the asset is only rebuilt when the csv's contents changed.
+STADIUM_DIR = Path(__file__).resolve().parent
+STADIUM_CSV_PATH = STADIUM_DIR / 'mlbstadiums.csv'
+GEOMETRY_PATH = STADIUM_DIR / 'mlbstadiums.npy'
+GEOMETRY_INDEX_PATH = STADIUM_DIR / 'mlbstadiums_index.json'
 STADIUM_SCALE = 2.495 / 2.33
-stadium_coords = pd.read_csv(Path(CUR_PATH, 'mlbstadiums.csv'), index_col=0)
-STADIUM_COORDS = transform_coordinates(stadium_coords, scale=STADIUM_SCALE)
 
-import plotly.graph_objects as go
+def build_geometry_asset(csv_path=STADIUM_CSV_PATH, geometry_path=GEOMETRY_PATH, index_path=GEOMETRY_INDEX_PATH):
+    """
+    One-time build step that transforms every stadium vertex and writes the compact geometry asset.
 
-def plot_stadium(team, runners=None,defenders=None, title=None, width=None, height=None):
+    Args:
+        csv_path (Path): Source csv with team, x, y and segment columns.
+        geometry_path (Path): Destination of the (n, 2) float array of transformed vertices.
+        index_path (Path): Destination of the json index, {'csv_sha256': hash of the csv, 'teams': team -> segment -> [start, stop] rows}.
     """
-    Plot the outline of the specified team's stadium with base runners using transformed MLBAM coordinates with Plotly.
-    Hovering over any point will display its x/y coordinates.
-    
+    import pandas as pd  # Only needed when (re)building the asset
+
+    coords = pd.read_csv(csv_path, usecols=['team', 'x', 'y', 'segment'])
+    coords = transform_coordinates(coords, scale=STADIUM_SCALE)
+
+    vertices = []
+    index = {}
+    offset = 0
+    for (team, segment), segment_verts in coords.groupby(['team', 'segment'], sort=False):
+        vertices.append(segment_verts[['x', 'y']].to_numpy(dtype=np.float64))
+        index.setdefault(team, {})[segment] = [offset, offset + len(segment_verts)]
+        offset += len(segment_verts)
+
+    np.save(geometry_path, np.concatenate(vertices))
+    with open(index_path, 'w') as outfile:
+        json.dump({'csv_sha256': csv_sha256(csv_path), 'teams': index}, outfile)
+
+def csv_sha256(csv_path=STADIUM_CSV_PATH):
+    """ Hash of the stadium csv's contents. """
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_index():
+    if not GEOMETRY_PATH.exists() or not GEOMETRY_INDEX_PATH.exists():
+        return None
+    with open(GEOMETRY_INDEX_PATH) as infile:
+        return json.load(infile)
+
+@lru_cache(maxsize=None)
+def _load_geometry():
+    """ Memory-maps the geometry asset, building it first if it is missing or was built from a different csv. """
+    index = _read_index()
+    if index is None or index.get('csv_sha256') != csv_sha256():
+        try:
+            build_geometry_asset()
+            index = _read_index()
+        except (OSError, ImportError) as e:
+            # E.g. a read-only install without pandas, an outdated asset still draws the fields
+            if index is None:
+                raise
+            logging.warning(f"Stadium geometry is out of date with {STADIUM_CSV_PATH.name} and couldn't be rebuilt: {e}")
+    return np.load(GEOMETRY_PATH, mmap_mode='r'), index['teams']
+
+@lru_cache(maxsize=None)
+def team_geometry(team):
+    """
+    Loads the outline of one team's stadium on first use.
+
     Args:
-        team (str): Team whose stadium will be plotted.
-        runners (list of dicts): List containing dictionaries with 'name' and 'base' ('1B', '2B', '3B').
-        title (str): Optional title of plot.
-        width (int): Optional width of plot in browser units.
-        height (int): Optional height of plot in browser units.
-    
+        team (str): Team name as used in mlbstadiums.csv, e.g. 'yankees'.
+
     Returns:
-        Plotly graph object.
+        dict: Maps segment name to a (x, y) tuple of numpy arrays. Empty if the team is unknown.
     """
-    # Hardcoded base coordinates
-    base_coords = {
-        'first': (155, -172),  # These are example coordinates
-        'second': (125, -145),
-        'third': (95, -172)
-    }
+    vertices, index = _load_geometry()
+    return {segment: (np.array(vertices[start:stop, 0]), np.array(vertices[start:stop, 1]))
+            for segment, (start, stop) in index.get(team.lower(), {}).items()}
 
+# Hardcoded base coordinates
+BASE_COORDS = {
+    'first': (155, -172),  # These are example coordinates
+    'second': (125, -145),
+    'third': (95, -172)
+}
 
-    position_coords = {
+POSITION_COORDS = {
     #'pitcher': (125, -172),  # These are example coordinates
     'shortstop': (105, -155),
     'catcher': (125, -205),
     'first': (155, -172),
     'second': (125, -145),
     'third': (95, -172),
-    
+
     'left': (55, -90),
     'center': (125, -70),
     'right': (180, -90)
 }
 
-    coords = STADIUM_COORDS[STADIUM_COORDS['team'] == team.lower()]
-    fig = go.Figure()
-
-    # Plot segments of the stadium
-    segments = set(coords['segment'])
-    for segment in segments:
-        segment_verts = coords[coords['segment'] == segment]
-        fig.add_trace(go.Scatter(
-            x=segment_verts['x'], 
-            y=segment_verts['y'], 
-            fill="toself",
-            mode='lines',
-            line=dict(color='grey', width=2),
-            hoverinfo='none'  # Disable hover info for the outline to keep it clean
-        ))
-
-    # Add base runners to the plot with hover text
-    if runners:
-        for runner in runners:
-            base_position = runner['base']
-            if base_position in base_coords:
-                coord = base_coords[base_position]
-                text_position = 'bottom center' if base_position in ['first', 'third'] else 'top center'
-                fig.add_trace(go.Scatter(
-                    x=[coord[0]],
-                    y=[coord[1]],
-                    mode='markers+text',
-                    text=[runner['name']],
-                    textposition=text_position,
-                    textfont=dict(size=8),
-                    marker=dict(size=10, color='blue'),
-                    hovertemplate=f"Runner: {runner['name']}<br>x: %{{x}}<br>y: %{{y}}<extra></extra>"
-                ))
-
-    # Add defenders to the plot with hover text
-    if defenders:
-        for defender in defenders:
-            position = defender['position']
-            if position in position_coords:
-                # Check if a runner is at the same base as the defender
-                if runners and any(runner['base'] == position for runner in runners):
-                    continue  # Skip this defender
-                coord = position_coords[position]
-                text_position = 'bottom center' if position in ['catcher', 'first', 'third','shortstop'] else 'top center'
-                fig.add_trace(go.Scatter(
-                    x=[coord[0]],
-                    y=[coord[1]],
-                    mode='markers+text',
-                    text=[f"{defender['name']}"],  # Add position to label
-                    textposition=text_position,
-                    textfont=dict(size=8),
-                    marker=dict(size=8, color='red'),
-                    hovertemplate=f"Defender: {defender['name']}<br>Position: {position}<br>x: %{{x}}<br>y: %{{y}}<extra></extra>"
-                ))
-
-    # Enhance hover experience
-    fig.update_layout(
-        title=team if title is None else title,
-        xaxis=dict(showgrid=False, zeroline=False, ticks='', showticklabels=False),
-        yaxis=dict(showgrid=False, zeroline=False, ticks='', showticklabels=False, scaleanchor="x", scaleratio=1),
-        hovermode='closest',
-        width=width,
-        height=height,
-        showlegend=False  # Hide the legend
-    )
-
-    return fig
+
+# Douglas-Peucker tolerances (in stadium units) of the precomputed outline resolutions, finest first
+LOD_TOLERANCES = (0.0, 0.25, 0.5, 1.0, 2.0)
+
+def simplify_polyline(x, y, tolerance):
+    """
+    Simplifies a polyline with the Douglas-Peucker algorithm.
+
+    Args:
+        x (ndarray): x coordinates of the vertices.
+        y (ndarray): y coordinates of the vertices.
+        tolerance (float): Largest distance a dropped vertex may lie from the simplified line.
+
+    Returns:
+        tuple: (x, y) arrays of the kept vertices. The first and last vertex are always kept.
+    """
+    n = len(x)
+    if n < 3 or tolerance <= 0:
+        return x, y
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = np.hypot(dx, dy)
+        # Distance to the chord, or to the end point when the segment closes on itself
+        distances = np.abs(dx * py - dy * px) / length if length > 0 else np.hypot(px, py)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return x[keep], y[keep]
+
+@lru_cache(maxsize=None)
+def team_outline_lods(team):
+    """
+    Precomputes every outline resolution in LOD_TOLERANCES for one team on first use.
+
+    Args:
+        team (str): Team whose stadium outline will be simplified.
+
+    Returns:
+        dict: Maps tolerance to a list of simplified (x, y) segments.
+    """
+    geometry = team_geometry(team)
+    return {tolerance: [simplify_polyline(x, y, tolerance) for x, y in geometry.values()] for tolerance in LOD_TOLERANCES}
+
+def pick_tolerance(team, panel_width=None, panel_height=None):
+    """
+    Picks the coarsest outline resolution that still looks exact at the given panel size,
+    i.e. no dropped vertex is further than one screen pixel from the 2px wide outline.
+
+    Args:
+        team (str): Team whose stadium will be drawn.
+        panel_width (int): Optional width of the plot panel in pixels.
+        panel_height (int): Optional height of the plot panel in pixels.
+
+    Returns:
+        float: One of LOD_TOLERANCES. The finest resolution when the panel size is unknown.
+    """
+    panel_pixels = min(size for size in (panel_width, panel_height, float('inf')) if size)
+    geometry = team_geometry(team)
+    if panel_pixels == float('inf') or not geometry:
+        return LOD_TOLERANCES[0]
+    extent = max(max(x.max() - x.min(), y.max() - y.min()) for x, y in geometry.values())
+    pixel = extent / panel_pixels
+    return max(tolerance for tolerance in LOD_TOLERANCES if tolerance <= pixel)
+
+@lru_cache(maxsize=None)
+def outline_traces(team, tolerance=0.0):
+    """
+    Builds the outline of the specified team's stadium once per resolution and caches it as plain trace dicts.
+    All segments share one style, so they are packed into a single trace with None separating the segments.
+    The outline never changes during a game, so every later call is a dictionary lookup.
+
+    Args:
+        team (str): Team whose stadium outline will be built.
+        tolerance (float): One of LOD_TOLERANCES.
+
+    Returns:
+        tuple of dicts: The packed outline trace, or nothing if the team is unknown.
+    """
+    segments = team_outline_lods(team).get(tolerance, [])
+    if not segments:
+        return ()
+    x, y = [], []
+    for segment_x, segment_y in segments:
+        if x:
+            x.append(None)
+            y.append(None)
+        x.extend(np.round(segment_x, 2).tolist())
+        y.extend(np.round(segment_y, 2).tolist())
+    return ({
+        'type': 'scatter',
+        'x': x,
+        'y': y,
+        'fill': 'toself',  # Each None-delimited segment is filled on its own
+        'mode': 'lines',
+        'line': {'color': 'grey', 'width': 2},
+        'hoverinfo': 'none'  # Disable hover info for the outline to keep it clean
+    },)
+
+
+def overlay_traces(runners=None, defenders=None):
+    """
+    Builds the runner and defender overlays as exactly two trace dicts (runners first, then defenders)
+    so they can be swapped into an existing stadium figure without touching the outline.
+
+    Args:
+        runners (list of dicts): List containing dictionaries with 'name' and 'base' ('first', 'second', 'third').
+        defenders (list of dicts): List containing dictionaries with 'name' and 'position'.
+
+    Returns:
+        list of dicts: [runner trace, defender trace]
+    """
+    runner_x, runner_y, runner_names, runner_text_positions = [], [], [], []
+    for runner in runners or []:
+        base_position = runner['base']
+        if base_position in BASE_COORDS:
+            coord = BASE_COORDS[base_position]
+            runner_x.append(coord[0])
+            runner_y.append(coord[1])
+            runner_names.append(runner['name'])
+            runner_text_positions.append('bottom center' if base_position in ['first', 'third'] else 'top center')
+
+    occupied_bases = {runner['base'] for runner in runners or []}
+    defender_x, defender_y, defender_names, defender_positions, defender_text_positions = [], [], [], [], []
+    for defender in defenders or []:
+        position = defender['position']
+        # Skip defenders standing on a base that a runner occupies
+        if position in POSITION_COORDS and position not in occupied_bases:
+            coord = POSITION_COORDS[position]
+            defender_x.append(coord[0])
+            defender_y.append(coord[1])
+            defender_names.append(defender['name'])
+            defender_positions.append(position)
+            defender_text_positions.append('bottom center' if position in ['catcher', 'first', 'third', 'shortstop'] else 'top center')
+
+    runner_trace = {
+        'type': 'scatter',
+        'x': runner_x,
+        'y': runner_y,
+        'mode': 'markers+text',
+        'text': runner_names,
+        'textposition': runner_text_positions,
+        'textfont': {'size': 8},
+        'marker': {'size': 10, 'color': 'blue'},
+        'hovertemplate': "Runner: %{text}<br>x: %{x}<br>y: %{y}<extra></extra>"
+    }
+    defender_trace = {
+        'type': 'scatter',
+        'x': defender_x,
+        'y': defender_y,
+        'mode': 'markers+text',
+        'text': defender_names,
+        'customdata': defender_positions,
+        'textposition': defender_text_positions,
+        'textfont': {'size': 8},
+        'marker': {'size': 8, 'color': 'red'},
+        'hovertemplate': "Defender: %{text}<br>Position: %{customdata}<br>x: %{x}<br>y: %{y}<extra></extra>"
+    }
+    return [runner_trace, defender_trace]
+
+
+def plot_stadium(team, runners=None,defenders=None, title=None, width=None, height=None, panel_width=None, panel_height=None):
+    """
+    Plot the outline of the specified team's stadium with base runners using transformed MLBAM coordinates with Plotly.
+    The outline comes from the per-team cache in outline_traces at the resolution that suits the panel,
+    only the overlays are built per call.
+
+    Args:
+        team (str): Team whose stadium will be plotted.
+        runners (list of dicts): List containing dictionaries with 'name' and 'base' ('first', 'second', 'third').
+        defenders (list of dicts): List containing dictionaries with 'name' and 'position'.
+        title (str): Optional title of plot.
+        width (int): Optional width of plot in browser units.
+        height (int): Optional height of plot in browser units.
+        panel_width (int): Optional width in pixels of the panel the plot is drawn in, used to pick the outline resolution.
+        panel_height (int): Optional height in pixels of the panel the plot is drawn in, used to pick the outline resolution.
+
+    Returns:
+        dict: Plotly figure dict. The last two traces are the runner and defender overlays.
+    """
+    tolerance = pick_tolerance(team, panel_width or width, panel_height or height)
+    return {
+        'data': list(outline_traces(team, tolerance)) + overlay_traces(runners, defenders),
+        'layout': {
+            'template': figureBall.shared_template(),
+            'title': {'text': team if title is None else title},
+            'xaxis': {'showgrid': False, 'zeroline': False, 'ticks': '', 'showticklabels': False},
+            'yaxis': {'showgrid': False, 'zeroline': False, 'ticks': '', 'showticklabels': False, 'scaleanchor': 'x', 'scaleratio': 1},
+            'hovermode': 'closest',  # Enhance hover experience
+            'width': width,
+            'height': height,
+            'showlegend': False  # Hide the legend
+        }
+    }
+
+
+if __name__ == '__main__':
+    build_geometry_asset()
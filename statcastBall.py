@@ -0,0 +1,324 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+import pandas as pd
+import cacheBall, fetchBall, metricsBall
+
+# Season-scale pitch context from Statcast. ingest pulls pybaseball.statcast into a Parquet dataset partitioned
+# by day (STORE_DIR/game_date=YYYY-MM-DD/part-0.parquet) and only ever fetches days it hasn't stored yet. Reads go
+# through pyarrow.dataset, so only the requested columns are decoded and the date range and pitcher/batter filters
+# are pushed down: days outside the range aren't opened and row groups without the player are skipped.
+# Pitch tendencies need to answer quickly while a game is on, faster than even a pruned scan of a season, so
+# ingest also keeps per-season summaries (STORE_DIR/_tendencies/season=YYYY.parquet) of the count, sums and sums
+# of squares of every pitcher's locations by pitch type and day, which pitch_tendencies adds up.
+#
+#   python statcastBall.py ingest --start 2024-03-20            # everything up to yesterday that isn't stored yet
+#   python statcastBall.py tendencies 543037 2024
+
+STORE_DIR = Path(os.environ.get('STRIKEZONE_STATCAST_DIR', Path(__file__).resolve().parent / 'statcast_store'))
+MANIFEST_NAME = '_ingested.json'  # Days already pulled, off days included. pyarrow skips files starting with _
+SUMMARY_DIR_NAME = '_tendencies'
+INGEST_CHUNK_DAYS = 7  # Days per pybaseball.statcast request
+ROW_GROUP_SIZE = 512  # Rows are sorted by pitcher, small row groups let a pitcher filter skip most of a day
+TENDENCIES_TTL = 60 * 60
+
+# Columns kept from pybaseball.statcast. A fixed schema keeps every day's file compatible, whatever columns
+# happen to be all null on that day.
+STRING_COLUMNS = ['player_name', 'pitch_type', 'pitch_name', 'description', 'events', 'stand', 'p_throws', 'home_team', 'away_team']
+INTEGER_COLUMNS = ['game_pk', 'pitcher', 'batter', 'inning', 'balls', 'strikes', 'outs_when_up', 'at_bat_number', 'pitch_number']
+FLOAT_COLUMNS = ['release_speed', 'release_spin_rate', 'plate_x', 'plate_z', 'pfx_x', 'pfx_z', 'sz_top', 'sz_bot']
+STORE_COLUMNS = STRING_COLUMNS + INTEGER_COLUMNS + FLOAT_COLUMNS
+
+_datasets = {}  # store directory -> (manifest mtime, pyarrow dataset)
+_datasets_lock = threading.Lock()
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([(name, pa.string()) for name in STRING_COLUMNS] +
+                     [(name, pa.int64()) for name in INTEGER_COLUMNS] +
+                     [(name, pa.float64()) for name in FLOAT_COLUMNS])
+
+
+############### INGESTION ###############
+
+def ingested_days(store_dir=STORE_DIR):
+    """ Days already in the store, as ISO date strings. """
+    manifest = Path(store_dir) / MANIFEST_NAME
+    return set(json.loads(manifest.read_text())) if manifest.exists() else set()
+
+
+def _write_manifest(days, store_dir):
+    manifest = Path(store_dir) / MANIFEST_NAME
+    temporary = manifest.with_suffix('.tmp')
+    temporary.write_text(json.dumps(sorted(days)))
+    os.replace(temporary, manifest)
+
+
+def write_day(df, day, store_dir=STORE_DIR):
+    """
+    Writes one day of pitches as its partition, replacing the day if it was stored before.
+
+    Args:
+        df (DataFrame): Statcast rows of that day.
+        day (str): ISO date.
+        store_dir (Path): Root of the dataset.
+
+    Returns:
+        DataFrame: The day's location sums by pitcher and pitch type, see update_summaries.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.reindex(columns=STORE_COLUMNS)
+    for name in STRING_COLUMNS:
+        df[name] = df[name].astype('string')
+    for name in INTEGER_COLUMNS:
+        df[name] = pd.to_numeric(df[name], errors='coerce').astype('Int64')
+    for name in FLOAT_COLUMNS:
+        df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+    df = df.sort_values(['pitcher', 'batter'], kind='stable')
+
+    partition = Path(store_dir) / f'game_date={day}'
+    partition.mkdir(parents=True, exist_ok=True)
+    temporary = partition / '.part-0.parquet.tmp'  # Dot files are invisible to readers until the rename
+    pq.write_table(pa.Table.from_pandas(df, schema=_schema(), preserve_index=False), temporary,
+                   row_group_size=ROW_GROUP_SIZE, compression='zstd')
+    os.replace(temporary, partition / 'part-0.parquet')
+
+    located = df.dropna(subset=['pitch_name', 'plate_x', 'plate_z']).assign(
+        plate_x_sq=lambda rows: rows['plate_x'] ** 2, plate_z_sq=lambda rows: rows['plate_z'] ** 2)
+    summary = located.groupby(['pitcher', 'pitch_name']).agg(
+        count=('plate_x', 'size'), sum_x=('plate_x', 'sum'), sum_z=('plate_z', 'sum'), sum_x_sq=('plate_x_sq', 'sum'),
+        sum_z_sq=('plate_z_sq', 'sum'), sum_speed=('release_speed', 'sum'), speed_count=('release_speed', 'count')).reset_index()
+    summary['game_date'] = day
+    return summary
+
+
+def write_days(df, store_dir=STORE_DIR):
+    """
+    Writes Statcast rows spanning any number of days, one partition per day, and updates the season summaries.
+
+    Returns:
+        int: Number of pitches written.
+    """
+    if df is None or df.empty:
+        return 0
+    days = pd.to_datetime(df['game_date']).dt.strftime('%Y-%m-%d')
+    summaries = [write_day(rows, day, store_dir) for day, rows in df.groupby(days)]
+    update_summaries(pd.concat(summaries, ignore_index=True), store_dir)
+    reset_dataset(store_dir)
+    return len(df)
+
+
+def _summary_path(season, store_dir):
+    return Path(store_dir) / SUMMARY_DIR_NAME / f'season={season}.parquet'
+
+
+def update_summaries(day_summaries, store_dir=STORE_DIR):
+    """
+    Merges day summaries from write_day into the season summaries. Days already summarized are replaced.
+
+    Args:
+        day_summaries (DataFrame): pitcher, pitch_name, game_date and the sums of write_day.
+        store_dir (Path): Root of the dataset.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    for season, new_rows in day_summaries.groupby(day_summaries['game_date'].str[:4]):
+        path = _summary_path(season, store_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            existing = pq.read_table(path).to_pandas()
+            new_rows = pd.concat([existing[~existing['game_date'].isin(new_rows['game_date'])], new_rows], ignore_index=True)
+        new_rows = new_rows.sort_values(['pitcher', 'game_date'], kind='stable')
+        temporary = path.with_name(f'.{path.name}.tmp')
+        pq.write_table(pa.Table.from_pandas(new_rows, preserve_index=False), temporary, row_group_size=4096)
+        os.replace(temporary, path)
+
+
+def _missing_runs(start, end, ingested):
+    """ Consecutive days between start and end that aren't stored, in runs of at most INGEST_CHUNK_DAYS. """
+    runs, run = [], []
+    day = start
+    while day <= end:
+        if day.isoformat() in ingested:
+            if run:
+                runs.append(run)
+            run = []
+        else:
+            run.append(day)
+            if len(run) == INGEST_CHUNK_DAYS:
+                runs.append(run)
+                run = []
+        day += datetime.timedelta(days=1)
+    if run:
+        runs.append(run)
+    return runs
+
+
+def ingest(start_date, end_date=None, store_dir=STORE_DIR):
+    """
+    Pulls the days between start_date and end_date that aren't in the store yet. Today is never stored since its
+    games aren't complete.
+
+    Args:
+        start_date (str): First ISO date.
+        end_date (str): Last ISO date, defaults to yesterday.
+        store_dir (Path): Root of the dataset.
+
+    Returns:
+        int: Number of pitches written.
+    """
+    store_dir = Path(store_dir)
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    start = datetime.date.fromisoformat(start_date)
+    end = min(datetime.date.fromisoformat(end_date), yesterday) if end_date else yesterday
+    ingested = ingested_days(store_dir)
+    written = 0
+
+    for run in _missing_runs(start, end, ingested):
+        with metricsBall.timed(metricsBall.PYBASEBALL_SECONDS, loader='statcast'):
+            df = fetchBall.load_pybaseball().statcast(start_dt=run[0].isoformat(), end_dt=run[-1].isoformat(), verbose=False)
+        written += write_days(df, store_dir)
+        ingested.update(day.isoformat() for day in run)
+        _write_manifest(ingested, store_dir)  # After every run, an interrupted ingest resumes where it stopped
+        logging.info(f"Stored Statcast {run[0]} to {run[-1]}: {0 if df is None else len(df)} pitches")
+
+    return written
+
+
+############### QUERIES ###############
+
+def _manifest_mtime(store_dir):
+    try:
+        return (store_dir / MANIFEST_NAME).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def dataset(store_dir=STORE_DIR):
+    """
+    The store as a pyarrow dataset, None if the store is empty. File discovery runs again only when the manifest
+    changed, which every ingest rewrites, so days another process ingested are picked up.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    store_dir = Path(store_dir)
+    if not store_dir.exists():
+        return None
+    mtime = _manifest_mtime(store_dir)
+    with _datasets_lock:
+        cached = _datasets.get(store_dir)
+        if cached is None or cached[0] != mtime:
+            partitioning = ds.partitioning(pa.schema([('game_date', pa.string())]), flavor='hive')
+            cached = _datasets[store_dir] = (mtime, ds.dataset(store_dir, format='parquet', partitioning=partitioning,
+                                                               schema=_schema().append(pa.field('game_date', pa.string()))))
+        return cached[1]
+
+
+def reset_dataset(store_dir=STORE_DIR):
+    with _datasets_lock:
+        _datasets.pop(Path(store_dir), None)
+
+
+def _ids(value):
+    return [int(item) for item in value] if isinstance(value, (list, tuple, set)) else [int(value)]
+
+
+def query(columns=None, pitcher=None, batter=None, start_date=None, end_date=None, store_dir=STORE_DIR):
+    """
+    Reads pitches from the store.
+
+    Args:
+        columns (list of str): Columns to read, out of STORE_COLUMNS and game_date. Defaults to all of them.
+        pitcher (int or list of int): MLBAM id(s) of the pitcher(s).
+        batter (int or list of int): MLBAM id(s) of the batter(s).
+        start_date (str): First ISO date, inclusive.
+        end_date (str): Last ISO date, inclusive.
+        store_dir (Path): Root of the dataset.
+
+    Returns:
+        DataFrame: Matching pitches, empty if the store has none.
+    """
+    import pyarrow.dataset as ds
+
+    columns = list(columns) if columns else STORE_COLUMNS + ['game_date']
+    store = dataset(store_dir)
+    if store is None:
+        return pd.DataFrame(columns=columns)
+
+    conditions = []
+    if start_date:
+        conditions.append(ds.field('game_date') >= start_date)  # ISO dates compare like dates as strings
+    if end_date:
+        conditions.append(ds.field('game_date') <= end_date)
+    if pitcher is not None:
+        conditions.append(ds.field('pitcher').isin(_ids(pitcher)))
+    if batter is not None:
+        conditions.append(ds.field('batter').isin(_ids(batter)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return store.to_table(columns=columns, filter=expression).to_pandas()
+
+
+@cacheBall.cached('statcast_tendencies', TENDENCIES_TTL)
+def pitch_tendencies(pitcher, season, store_dir=STORE_DIR):
+    """
+    Location tendencies of a pitcher by pitch type over a season, from the season summary.
+
+    Args:
+        pitcher (int): MLBAM id of the pitcher.
+        season (int): Season year.
+        store_dir (Path): Root of the dataset.
+
+    Returns:
+        list of dicts: pitch_name, count, usage (share of the pitcher's pitches), plate_x and plate_z (mean location),
+        plate_x_std, plate_z_std and release_speed (mean), most used pitch first. Empty if the store has no pitches.
+    """
+    import pyarrow.parquet as pq
+
+    path = _summary_path(season, store_dir)
+    if not path.exists():
+        return []
+    rows = pq.read_table(path, filters=[('pitcher', '=', int(pitcher))]).to_pandas()
+    if rows.empty:
+        return []
+    sums = rows.groupby('pitch_name')[['count', 'sum_x', 'sum_z', 'sum_x_sq', 'sum_z_sq', 'sum_speed', 'speed_count']].sum()
+    count = sums['count']
+    tendencies = pd.DataFrame({
+        'count': count,
+        'usage': count / count.sum(),
+        'plate_x': sums['sum_x'] / count,
+        'plate_z': sums['sum_z'] / count,
+        # Sample standard deviation from the sums, clipped at 0 against rounding
+        'plate_x_std': ((sums['sum_x_sq'] - sums['sum_x'] ** 2 / count) / (count - 1)).clip(lower=0) ** 0.5,
+        'plate_z_std': ((sums['sum_z_sq'] - sums['sum_z'] ** 2 / count) / (count - 1)).clip(lower=0) ** 0.5,
+        'release_speed': sums['sum_speed'] / sums['speed_count']
+    }).fillna(0).sort_values('count', ascending=False).reset_index()
+    return [{key: (value.item() if hasattr(value, 'item') else value) for key, value in row.items()} for row in tendencies.to_dict('records')]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Statcast pitch store.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest')
+    ingest_parser.add_argument('--start', required=True, help='First ISO date')
+    ingest_parser.add_argument('--end', help='Last ISO date, defaults to yesterday')
+    tendencies_parser = commands.add_parser('tendencies')
+    tendencies_parser.add_argument('pitcher', type=int)
+    tendencies_parser.add_argument('season', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        print(f"{ingest(args.start, args.end)} pitches written to {STORE_DIR}")
+    else:
+        print(pd.DataFrame(pitch_tendencies.uncached(args.pitcher, args.season)).to_string(index=False))
@@ -3,6 +3,10 @@ from dash import dcc
 import dash_bootstrap_components as dbc
 import numpy as np
 
+# Year range the stats pages load by default, also warmed up by appBall.warm_up through scatterBall.default_loads
+DEFAULT_START_YEAR = 2022
+DEFAULT_END_YEAR = 2024
+
 #Creates a table for the player stats compared to league and team averages
 
 def create_data_table(player_dict, league_avg_dict, team_avg_dict, table_id):
@@ -80,12 +84,12 @@ def generate_layout(dataframe):
                 dcc.Dropdown(
                     id='year-dropdown',
                     options=[{'label': i, 'value': i} for i in range(1900, 2025)],
-                    value=2022
+                    value=DEFAULT_START_YEAR
                 ),
                 dcc.Dropdown(
                     id='end-year-dropdown',
                     options=[{'label': i, 'value': i} for i in range(1900, 2025)],
-                    value=2024
+                    value=DEFAULT_END_YEAR
                 ),
                 dcc.Checklist(
     id='team-toggle',
@@ -102,7 +106,20 @@ def generate_layout(dataframe):
         {'label': 'Aggregate Data', 'value': '0'}  # If checked, '0' will be passed as ind
     ],
     value=['0']  # Default to aggregated stats; remove '0' to default to individual stats
-)
+),
+                dcc.Checklist(
+                    id='cluster-toggle',
+                    options=[{'label': 'Color by cluster', 'value': 'CLUSTER'}],
+                    value=[]
+                ),
+                dcc.Input(
+                    id='cluster-count',
+                    type='number',
+                    min=2,
+                    max=12,
+                    step=1,
+                    value=4
+                )
             ], xs=12, sm=12, md=4, lg=3, xl=3),
             dbc.Col([
                 dcc.Graph(
@@ -194,3 +211,38 @@ def create_events_table(events):
             'rule': 'scrollbar-width: none; -ms-overflow-style: none;'
         }]
     )
+
+#Creates the arsenal table of a pitcher from arsenalBall.GameArsenal.summary, velocity drops highlighted
+
+def create_arsenal_table(arsenal):
+    def number(value, digits=1):
+        return '' if value is None else round(value, digits)
+
+    def percent(value):
+        return '' if value is None else f"{value:.0%}"
+
+    data = [{
+        'Pitch': row['pitch_name'],
+        '#': row['count'],
+        'Usage': percent(row['usage']),
+        'Velo': number(row['velocity_mean']),
+        'Max': number(row['velocity_max']),
+        'SD': number(row['velocity_std']),
+        'Spin': '' if row['spin_mean'] is None else int(round(row['spin_mean'])),
+        'Whiff %': percent(row['whiff_rate']),
+        'CStr %': percent(row['called_strike_rate']),
+        'Early Velo': number(row['baseline_velocity']),
+        'Recent Velo': number(row['recent_velocity']),
+        'Drop': number(row['velocity_drop']),
+        'flag': 'drop' if row['drop_flag'] else ''
+    } for row in arsenal]
+    columns = [{"name": i, "id": i} for i in ['Pitch', '#', 'Usage', 'Velo', 'Max', 'SD', 'Spin', 'Whiff %', 'CStr %', 'Early Velo', 'Recent Velo', 'Drop']]
+    return dash_table.DataTable(
+        id='arsenal-table',
+        columns=columns,
+        data=data,
+        style_cell={'backgroundColor': 'rgb(50, 50, 50)', 'color': 'white', 'textAlign': 'left'},
+        style_header={'backgroundColor': 'rgb(30, 30, 30)', 'fontWeight': 'bold', 'color': 'white'},
+        style_table={'backgroundColor': 'rgb(50, 50, 50)', 'width': '95%', 'margin': 'auto'},
+        style_data_conditional=[{'if': {'filter_query': '{flag} = "drop"'}, 'backgroundColor': 'rgb(120, 30, 30)'}],
+    )
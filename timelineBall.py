@@ -0,0 +1,223 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Pitch by pitch game state for replays. Every game the registry sees gets a GameTimeline holding one snapshot per
+# pitch in parallel NumPy columns: count, outs, inning, score, runners, defense, pitcher, batter, location and the
+# home win probability. Feeds are folded in as they arrive and only pitches not seen before are parsed, so seeking to
+# any pitch is an array lookup and never touches the feed again.
+#
+# The pitch logs carry the count, inning, players and location of every pitch. Runners, defense and score only exist
+# for the live moment of a feed, so they're recorded on the newest pitch of each feed and carried over to pitches
+# that arrived in the same feed. Pitches from before the game was first seen have them marked as not observed.
+
+TIMELINES = OrderedDict()  # game_pk -> GameTimeline
+TIMELINE_COUNT = 32
+_timelines_lock = threading.Lock()
+
+RUNNER_BASES = ['first', 'second', 'third']
+DEFENSE_POSITIONS = ['pitcher', 'catcher', 'first', 'second', 'third', 'shortstop', 'left', 'center', 'right']
+
+# Column -> dtype. Strings and groups of players are stored as indices into the timeline's interned values.
+COLUMNS = {
+    'number': np.int32,  # game_total_pitches
+    'ab_number': np.int16,
+    'ab_start': np.int32,  # Row of the first pitch of the at bat
+    'inning': np.int16,
+    'top': np.bool_,  # Top of the inning, the home team pitching
+    'balls': np.int8,
+    'strikes': np.int8,
+    'outs': np.int8,
+    'home_score': np.int16,  # -1 when not observed
+    'away_score': np.int16,
+    'runners': np.int32,  # Interned tuple of (name, base)
+    'defense': np.int32,  # Interned tuple of (name, position)
+    'observed': np.bool_,  # Whether runners, defense and score were seen live for this pitch
+    'pitcher': np.int32,  # Interned name
+    'batter': np.int32,
+    'pitch_name': np.int32,
+    'call': np.int32,
+    'px': np.float32,
+    'pz': np.float32,
+    'speed': np.float32,
+    'spin': np.float32,
+    'sz_top': np.float32,
+    'sz_bot': np.float32,
+    'home_win_prob': np.float32,
+}
+INITIAL_CAPACITY = 256
+
+
+def _float(value, default=np.nan):
+    return default if value is None else value
+
+
+class GameTimeline:
+    """ Snapshots of one game, one row per pitch in pitch order. """
+
+    def __init__(self):
+        self.length = 0
+        self.columns = {name: np.zeros(INITIAL_CAPACITY, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.values = []  # Interned strings and tuples, shared by every interned column
+        self._value_index = {}
+        self.home_team = ''
+        self.away_team = ''
+        self.stadium_team = ''
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def _intern(self, value):
+        index = self._value_index.get(value)
+        if index is None:
+            index = self._value_index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def _grow(self, needed):
+        capacity = len(self.columns['number'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.length] = column[:self.length]
+            self.columns[name] = grown
+
+    def record(self, game_data):
+        """
+        Appends the pitches of a feed that aren't in the timeline yet.
+
+        Args:
+            game_data (dict): Game data from fetchBall.fetch_game_data.
+
+        Returns:
+            int: Number of pitches appended.
+        """
+        with self.lock:
+            last_number = int(self.columns['number'][self.length - 1]) if self.length else 0
+            new_pitches = [(pitch, key == 'home_pitchers') for key in ['home_pitchers', 'away_pitchers'] for pitches in game_data.get(key, {}).values()
+                           for pitch in pitches if pitch.get('game_total_pitches', 0) > last_number]
+            if not new_pitches:
+                return 0
+            new_pitches.sort(key=lambda item: item[0]['game_total_pitches'])
+
+            self.home_team = game_data.get('home_team_data', {}).get('abbreviation', self.home_team)
+            self.away_team = game_data.get('away_team_data', {}).get('abbreviation', self.away_team)
+            self.stadium_team = game_data.get('home_team_data', {}).get('teamName', self.stadium_team).lower()
+            scoreboard = game_data.get('scoreboard', {})
+            win_probs = {wpa.get('atBatIndex'): wpa['homeTeamWinProbability'] for wpa in scoreboard.get('stats', {}).get('wpa', {}).get('gameWpa', [])}
+
+            # Live state of this feed for its newest pitch, what the previous row knew for the others
+            linescore = scoreboard.get('linescore')
+            if linescore is not None:
+                offense, defense = linescore.get('offense', {}), linescore.get('defense', {})
+                live = (self._intern(tuple((offense[base]['fullName'], base) for base in RUNNER_BASES if offense.get(base))),
+                        self._intern(tuple((defense[position]['fullName'], position) for position in DEFENSE_POSITIONS if defense.get(position))),
+                        linescore.get('teams', {}).get('home', {}).get('runs', 0), linescore.get('teams', {}).get('away', {}).get('runs', 0))
+            else:
+                live = None
+            if self.length:
+                carried = tuple(int(self.columns[name][self.length - 1]) for name in ['runners', 'defense', 'home_score', 'away_score'])
+                carried_observed = bool(self.columns['observed'][self.length - 1])
+            else:
+                carried, carried_observed = (self._intern(()), self._intern(()), -1, -1), False
+
+            self._grow(self.length + len(new_pitches))
+            columns = self.columns
+            for offset, (pitch, home_pitching) in enumerate(new_pitches):
+                row = self.length + offset
+                ab_number = pitch.get('ab_number', 0)
+                same_at_bat = row > 0 and columns['ab_number'][row - 1] == ab_number
+                newest = offset == len(new_pitches) - 1 and live is not None
+                runners, defense, home_score, away_score = live if newest else carried
+
+                columns['number'][row] = pitch['game_total_pitches']
+                columns['ab_number'][row] = ab_number
+                columns['ab_start'][row] = columns['ab_start'][row - 1] if same_at_bat else row
+                columns['inning'][row] = pitch.get('inning', 0)
+                columns['top'][row] = home_pitching
+                columns['balls'][row] = pitch.get('balls', 0)
+                columns['strikes'][row] = pitch.get('strikes', 0)
+                columns['outs'][row] = pitch.get('outs', 0)
+                columns['home_score'][row] = home_score
+                columns['away_score'][row] = away_score
+                columns['runners'][row] = runners
+                columns['defense'][row] = defense
+                columns['observed'][row] = newest or carried_observed
+                columns['pitcher'][row] = self._intern(pitch.get('pitcher_name', ''))
+                columns['batter'][row] = self._intern(pitch.get('batter_name', ''))
+                columns['pitch_name'][row] = self._intern(pitch.get('pitch_name', ''))
+                columns['call'][row] = self._intern(pitch.get('call_name', ''))
+                columns['px'][row] = _float(pitch.get('px'))
+                columns['pz'][row] = _float(pitch.get('pz'))
+                columns['speed'][row] = _float(pitch.get('start_speed'))
+                columns['spin'][row] = _float(pitch.get('spin_rate'))
+                columns['sz_top'][row] = _float(pitch.get('sz_top'), 3.5)
+                columns['sz_bot'][row] = _float(pitch.get('sz_bot'), 1.5)
+                # Win probability going into the at bat, i.e. after the previous one
+                columns['home_win_prob'][row] = win_probs.get(ab_number - 2, 50.0) if ab_number > 1 else 50.0
+            self.length += len(new_pitches)
+            return len(new_pitches)
+
+    def snapshot(self, row):
+        """
+        State of the game at one pitch.
+
+        Args:
+            row (int): Position of the pitch in the timeline, 0 for the first pitch.
+
+        Returns:
+            dict: Every column at that row, interned values resolved. runners and defenders are lists of dicts
+            shaped like runnerBall.get_base_runners and get_defenders.
+        """
+        if not 0 <= row < self.length:
+            raise IndexError(f"Pitch {row} is outside the timeline of {self.length} pitches")
+        snapshot = {name: column[row].item() for name, column in self.columns.items()}
+        for name in ['pitcher', 'batter', 'pitch_name', 'call']:
+            snapshot[name] = self.values[snapshot[name]]
+        snapshot['runners'] = [{'name': name, 'base': base} for name, base in self.values[snapshot['runners']]]
+        snapshot['defenders'] = [{'name': name, 'position': position} for name, position in self.values[snapshot.pop('defense')]]
+        return snapshot
+
+    def at_bat_pitches(self, row):
+        """ Location, pitch type and call of the pitches of the at bat up to row, as (px, pz, pitch names, calls). """
+        start = int(self.columns['ab_start'][row])
+        return (self.columns['px'][start:row + 1].tolist(), self.columns['pz'][start:row + 1].tolist(),
+                [self.values[index] for index in self.columns['pitch_name'][start:row + 1]],
+                [self.values[index] for index in self.columns['call'][start:row + 1]])
+
+    def win_probabilities(self, row):
+        """ Home win probability of every pitch up to row. """
+        return self.columns['home_win_prob'][:row + 1].tolist()
+
+    def inning_starts(self):
+        """ Row of the first pitch of each inning, keyed by inning. """
+        innings = self.columns['inning'][:self.length]
+        starts = np.flatnonzero(np.r_[True, innings[1:] != innings[:-1]]) if self.length else []
+        return {int(innings[row]): int(row) for row in starts}
+
+
+def record_feed(game_pk, game_data):
+    """
+    Folds a feed into the game's timeline, creating it on the game's first feed.
+
+    Returns:
+        int: Number of pitches appended.
+    """
+    with _timelines_lock:
+        timeline = TIMELINES.get(game_pk)
+        if timeline is None:
+            timeline = TIMELINES[game_pk] = GameTimeline()
+        TIMELINES.move_to_end(game_pk)
+        if len(TIMELINES) > TIMELINE_COUNT:
+            TIMELINES.popitem(last=False)
+    return timeline.record(game_data)
+
+
+def get_timeline(game_pk):
+    """ The game's timeline, None if no feed of the game has been seen by this process. """
+    return TIMELINES.get(game_pk)
@@ -0,0 +1,214 @@
+import logging
+import threading
+from collections import OrderedDict
+import dash
+from dash import dcc, html, Patch
+from dash.dependencies import Input, Output, State
+import fetchBall, figureBall, gameBall, pushBall, runnerBall, metricsBall, memBall
+
+# Scoreboard wall: every game on today's schedule as a compact tile. One interval drives one callback, which
+# reads the feeds the game pollers keep (see pushBall), summarizes each game server-side (once per feed version)
+# and patches only the tiles whose game changed, so 15 games cost one request per refresh instead of 15 callback
+# chains, and any number of walls share one upstream fetch per game and poll.
+
+REFRESH_MS = 5 * 1000
+SPARKLINE_POINTS = 60  # The WPA series is downsampled to this many points per tile
+
+# Summaries keyed by feed version, shared by every client of the wall
+SUMMARY_CACHE = OrderedDict()
+SUMMARY_CACHE_SIZE = 64
+_summary_lock = threading.Lock()
+
+BASES = ['first', 'second', 'third']
+
+
+def _downsample(values, points=SPARKLINE_POINTS):
+    if len(values) <= points:
+        return list(values)
+    step = (len(values) - 1) / (points - 1)
+    return [values[round(index * step)] for index in range(points)]
+
+
+def game_summary(game_data):
+    """
+    Compact view of a game for its tile.
+
+    Args:
+        game_data (dict): Game data from fetchBall.fetch_game_data.
+
+    Returns:
+        dict: away_team, home_team, away_runs, home_runs, inning (e.g. 'Top 5'), balls, strikes, outs, bases
+        (occupied bases out of BASES), pitcher, status and wpa (downsampled home win probabilities).
+    """
+    scoreboard = game_data.get('scoreboard', {})
+    linescore = scoreboard.get('linescore') or {}
+    teams = linescore.get('teams', {})
+    current_play = fetchBall.fetch_current_play_data(game_data) if scoreboard.get('currentPlay') else {}
+    runners = runnerBall.get_base_runners(game_data) if scoreboard.get('linescore') is not None else []
+    wpa = scoreboard.get('stats', {}).get('wpa', {}).get('gameWpa', [])
+    inning = linescore.get('currentInning')
+    return {
+        'away_team': game_data.get('away_team_data', {}).get('abbreviation', ''),
+        'home_team': game_data.get('home_team_data', {}).get('abbreviation', ''),
+        'away_runs': teams.get('away', {}).get('runs', 0),
+        'home_runs': teams.get('home', {}).get('runs', 0),
+        'inning': f"{linescore.get('inningHalf', '')} {inning}".strip() if inning else '',
+        'balls': linescore.get('balls', 0),
+        'strikes': linescore.get('strikes', 0),
+        'outs': linescore.get('outs', 0),
+        'bases': [runner['base'] for runner in runners],
+        'pitcher': current_play.get('matchup', {}).get('pitcher', {}).get('fullName', ''),
+        'status': game_data.get('game_status_code', game_data.get('game_status', '')),
+        'wpa': _downsample([point['homeTeamWinProbability'] for point in wpa])
+    }
+
+
+def _summary(game_pk, version):
+    with _summary_lock:
+        summary = SUMMARY_CACHE.get(version)
+        if summary is not None:
+            SUMMARY_CACHE.move_to_end(version)
+            return version, summary
+    entry = gameBall.resolve_game({'game_pk': game_pk, 'version': version})
+    if entry is None:
+        return None
+    summary = game_summary(entry['game_data'])
+    with _summary_lock:
+        SUMMARY_CACHE[entry['version']] = summary
+        if len(SUMMARY_CACHE) > SUMMARY_CACHE_SIZE:
+            SUMMARY_CACHE.popitem(last=False)
+    return entry['version'], summary
+
+
+def game_summaries(game_pks):
+    """
+    Summaries of the latest feeds the games' pollers published, starting a poller for games nobody watches yet.
+    Nothing is fetched here, a game without a feed yet shows up on a later refresh.
+
+    Args:
+        game_pks (list of int): Games on the wall.
+
+    Returns:
+        dict: game_pk -> (feed version, summary), or None for games without a feed yet.
+    """
+    results = {}
+    for game_pk in game_pks:
+        version = pushBall.get_poller(game_pk).version
+        try:
+            results[game_pk] = _summary(game_pk, version) if version else None
+        except Exception as e:
+            logging.error(f"Failed to summarize game {game_pk} for the wall: {e}")
+            results[game_pk] = None
+    return results
+
+
+############### TILES ###############
+
+def sparkline(wpa):
+    """ Home win probability sparkline, without axes or interaction. Skips the shared template, which would be most of the tile's payload. """
+    figure = {'data': [figureBall.scatter_trace(list(range(len(wpa))), wpa, 'lines', line_dict={'color': '#1f77b4', 'width': 2})], 'layout': {}}
+    figure['layout'].update(
+        height=60,
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False, range=[0, 100]),
+        shapes=[dict(type='line', xref='paper', x0=0, x1=1, y0=50, y1=50, line=dict(color='gray', width=1, dash='dot'))],
+        showlegend=False
+    )
+    return figure
+
+
+def _diamond(bases):
+    def style(base):
+        return {'display': 'inline-block', 'width': '10px', 'height': '10px', 'margin': '2px', 'transform': 'rotate(45deg)',
+                'border': '1px solid white', 'backgroundColor': 'gold' if base in bases else 'transparent'}
+
+    return html.Div([
+        html.Div(html.Div(style=style('second'))),
+        html.Div([html.Div(style=style('third')), html.Div(style={'display': 'inline-block', 'width': '14px'}), html.Div(style=style('first'))])
+    ], style={'textAlign': 'center', 'lineHeight': '10px'})
+
+
+def render_tile(game_pk, away_team, home_team, summary):
+    """
+    One game's tile.
+
+    Args:
+        game_pk (int): Game identifier.
+        away_team (str): Away team name from the schedule, used until the feed is available.
+        home_team (str): Home team name from the schedule.
+        summary (dict): See game_summary, None if the game has no feed yet.
+
+    Returns:
+        html.Div: The tile.
+    """
+    tile_style = {'width': '300px', 'margin': '6px', 'padding': '8px', 'border': '1px solid #444', 'borderRadius': '6px',
+                  'backgroundColor': '#1e1e1e', 'color': 'white', 'fontSize': '14px'}
+    if summary is None:
+        return html.Div([html.Div(f"{away_team} @ {home_team}"), html.Div('No feed yet', style={'color': 'gray'})], title=f"Game {game_pk}", style=tile_style)
+
+    return html.Div([
+        html.Div([
+            html.Div([
+                html.Div(f"{summary['away_team'] or away_team}  {summary['away_runs']}"),
+                html.Div(f"{summary['home_team'] or home_team}  {summary['home_runs']}")
+            ], style={'fontSize': '20px', 'fontWeight': 'bold'}),
+            _diamond(summary['bases']),
+            html.Div([
+                html.Div(summary['inning'] or summary['status']),
+                html.Div(f"{summary['balls']}-{summary['strikes']}, {summary['outs']} out")
+            ], style={'textAlign': 'right'})
+        ], style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'center'}),
+        html.Div(f"P: {summary['pitcher']}", style={'color': '#bbbbbb'}),
+        dcc.Graph(figure=sparkline(summary['wpa']), config={'staticPlot': True}, style={'height': '60px'})
+    ], title=f"Game {game_pk}", style=tile_style)
+
+
+############### DASH APP / HTML LAYOUT ###############
+
+external_stylesheets = []
+layout = html.Div([
+    dcc.Store(id='wall-store', storage_type='memory'),
+    dcc.Interval(id='wall-interval', interval=REFRESH_MS, n_intervals=0),
+    html.Div(id='wall-grid', children=[], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'center'})
+], style={'backgroundColor': '#111111', 'minHeight': '100vh'})
+
+
+############### CALLBACKS ###############
+
+@dash.callback(
+    [Output('wall-grid', 'children'),
+     Output('wall-store', 'data')],
+    [Input('wall-interval', 'n_intervals')],
+    [State('wall-store', 'data')]
+)
+def update_wall(n_intervals, rendered):
+    # rendered holds the game_pks in tile order and the feed version each tile shows
+    schedule = fetchBall.get_game_pks_and_teams()
+    game_pks = [game_pk for game_pk, _, _ in schedule]
+    results = game_summaries(game_pks)
+    versions = {str(game_pk): result[0] if result else None for game_pk, result in results.items()}
+
+    if not rendered or rendered['order'] != game_pks:
+        # New schedule or first load: draw every tile
+        tiles = [render_tile(game_pk, away, home, results[game_pk] and results[game_pk][1]) for game_pk, away, home in schedule]
+        return tiles, {'order': game_pks, 'versions': versions}
+
+    changed = [index for index, game_pk in enumerate(game_pks) if versions[str(game_pk)] != rendered['versions'].get(str(game_pk))]
+    if not changed:
+        return dash.no_update, dash.no_update
+    patched_grid = Patch()
+    for index in changed:
+        game_pk, away, home = schedule[index]
+        patched_grid[index] = render_tile(game_pk, away, home, results[game_pk] and results[game_pk][1])
+    return patched_grid, {'order': game_pks, 'versions': versions}
+
+
+if __name__ == '__main__':
+    app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+    metricsBall.instrument_server(app.server)
+    memBall.instrument_server(app.server)
+    app.layout = layout
+    app.run_server(debug=True)